@@ -1 +1,8 @@
-from .agent import root_agent
\ No newline at end of file
+# `root_agent` is resolved on first access so that data modules
+# (backend.columnar, backend.store, ...) can be imported by the pipeline
+# without pulling in google-adk.
+def __getattr__(name):
+    if name == "root_agent":
+        from .agent import root_agent
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
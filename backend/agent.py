@@ -1,28 +1,149 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search, AgentTool, ToolContext
-from .tools import get_top_funds, get_fund_analysis, get_partner_info, get_visualization_data
+from .tools import get_top_funds, search_funds, find_similar_funds, get_fund_analysis, score_portfolio, get_partner_info, get_visualization_data, get_profile_recommendations
+from .orchestration import fan_out
+from .router import fast_path_callback
+from .cache import RESPONSE_CACHE, SEARCH_TTL, ANALYST_TTL, make_key
+from .store import get_snapshot
+from .query import PROFILE_TYPES, resolve_fund_type, resolve_fund_types
+from .tracing import traced, span, payload_size, llm_call_started, llm_call_finished
+from .profiles import PROFILES, coerce_field, restore_profile, user_id_of
+from .encoding import COMPACT_NOTE, compact, encode
+import functools
+import inspect
 import os
 
 # --- 0. MEMORY & STATE TOOLS ---
-def manage_user_profile(action: str, key: str, value: str = None, tool_context: ToolContext = None) -> str:
+# Profiles outlive the session: saves go to session state and the profile
+# store (see profiles.py); restore_profile() puts them back in new sessions.
+@traced()
+def manage_user_profile(action: str, key: str, value: str = "", tool_context: ToolContext = None) -> str:
     """
     Manages user memory/preferences.
     Args:
         action: 'save' to store info, 'read' to get info.
-        key: The category (e.g., 'risk_profile').
+        key: The category (e.g., 'risk_profile', 'target_return', 'horizon_years', 'language').
         value: The information to save (only for 'save').
     """
     if not tool_context: return "Error: No tool context available."
     session_state = tool_context.state
+    user_id = user_id_of(tool_context)
 
     if action == 'save':
         if not value: return "Error: Value required."
+        try:
+            value = coerce_field(key, value)
+        except ValueError as e:
+            return f"Error: {e}"
         session_state[key] = value
+        if user_id is not None:
+            PROFILES.set(user_id, key, value)
         return f"Saved {key}: {value}"
     elif action == 'read':
+        if key not in session_state and user_id is not None:
+            stored = PROFILES.get(user_id)
+            if key in stored:
+                session_state[key] = stored[key]
         return f"User {key}: {session_state.get(key, 'Unknown')}"
     return "Invalid action."
 
+# --- RISK GATE ---
+# Every tool that lists funds to the user checks the saved profile itself: it
+# comes from session state (AgentTool copies it into sub-agent sessions), never
+# from the model.
+NEEDS_PROFILE = {"status": "needs_profile", "message": "Ask the user to choose: Conservative, Moderate, Balanced, Aggressive."}
+
+def saved_profile(tool_context):
+    """(profile, allowed type codes or None) from session state."""
+    profile = str(tool_context.state.get('risk_profile', 'Unknown')) if tool_context else 'Unknown'
+    return profile, PROFILE_TYPES.get(profile.strip().upper())
+
+def profile_gate(func):
+    """
+    Sub-agent version of a fund-listing tool: fund_type(s) are limited to what the
+    saved profile allows and risk_profile is always the saved one (so the model
+    is not offered that argument).
+    """
+    sig = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, tool_context=None, **kwargs):
+        profile, allowed = saved_profile(tool_context)
+        if not allowed:
+            return dict(NEEDS_PROFILE)
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        call = bound.arguments
+        if 'fund_type' in call:
+            code = resolve_fund_type(call['fund_type'])
+            if code and code not in allowed:
+                return {"status": "blocked", "risk_profile": profile, "requested": [code], "allowed": allowed}
+        excluded = []
+        if 'fund_types' in call:
+            requested, unknown = resolve_fund_types(call['fund_types'])
+            if not unknown:  # Unknown names are left for the tool to report.
+                permitted = [t for t in requested if t in allowed]
+                if not permitted:
+                    return {"status": "blocked", "risk_profile": profile, "requested": requested, "allowed": allowed}
+                excluded = [t for t in requested if t not in allowed]
+                call['fund_types'] = ", ".join(permitted)
+        if 'risk_profile' in call:
+            call['risk_profile'] = profile
+        result = func(**call)
+        if excluded and isinstance(result, dict) and "error" not in result:
+            result["excluded_types"] = excluded
+        return result
+
+    params = [p for name, p in sig.parameters.items() if name != 'risk_profile'] + [
+        inspect.Parameter("tool_context", inspect.Parameter.KEYWORD_ONLY, default=None)]
+    wrapper.__signature__ = sig.replace(parameters=params)
+    return wrapper
+
+# --- TRACED / CACHED SUB-AGENT CALLS ---
+# Model calls of every agent become 'llm' spans carrying token counts.
+LLM_SPAN_CALLBACKS = dict(before_model_callback=llm_call_started, after_model_callback=llm_call_finished)
+
+class TracedAgentTool(AgentTool):
+    """AgentTool that runs each sub-agent call inside an 'agent' span (timing, request/response size)."""
+
+    async def run_async(self, *, args, tool_context):
+        with span(self.name, kind="agent", **{"request.bytes": payload_size(args.get('request', ''))}) as s:
+            result = await self._invoke(args, tool_context, s)
+            s.set("payload.bytes", payload_size(result))
+            return result
+
+    async def _invoke(self, args, tool_context, s):
+        return await super().run_async(args=args, tool_context=tool_context)
+
+
+class CachedAgentTool(TracedAgentTool):
+    """
+    AgentTool whose answers are cached in RESPONSE_CACHE.
+    The key is the normalized request, the data snapshot version and any
+    session-state fields listed in `state_keys` (e.g. the risk profile).
+    """
+
+    def __init__(self, agent, namespace: str, ttl: float, state_keys=(), **kwargs):
+        super().__init__(agent=agent, **kwargs)
+        self._namespace = namespace
+        self._ttl = ttl
+        self._state_keys = tuple(state_keys)
+
+    def _cache_key(self, args, tool_context):
+        state = [str(tool_context.state.get(k, '')) for k in self._state_keys]
+        return make_key(args.get('request', ''), get_snapshot().version, *state)
+
+    async def _invoke(self, args, tool_context, s):
+        key = self._cache_key(args, tool_context)
+        cached = RESPONSE_CACHE.get(self._namespace, key)
+        s.set("cache.hit", cached is not None)
+        if cached is not None:
+            return cached
+        result = await super()._invoke(args, tool_context, s)
+        if result:
+            RESPONSE_CACHE.set(self._namespace, key, result, self._ttl)
+        return result
+
 # --- SPECIALIST AGENTS ---
 
 # 1. DATABASE AGENT (Logic for Risk Profile Enforcement)
@@ -32,11 +153,23 @@ db_agent = Agent(
     description="Useful for finding top funds and rankings.",
     instruction="""
     You are the Database Specialist.
-    - Your ONLY job is to fetch fund data using 'get_top_funds'.
+    - Your ONLY job is to fetch fund data using 'get_top_funds' or 'search_funds'.
     - CRITICAL: Extract the specific category (e.g., 'Saham', 'Pasar Uang'). 
       Do NOT pass "Reksadana" to the tool.
-    """,
-    tools=[get_top_funds] 
+    - Use 'get_top_funds(fund_type, n)' for a plain top list of ONE category.
+    - Use 'search_funds' ONCE for multi-category or conditional requests instead of
+      calling 'get_top_funds' several times, e.g. "top 10 PU/PT/CP funds under 5% volatility":
+      search_funds(fund_types='PU, PT, CP', n=10, filters='vol_ret_36m<0.05', sort_by='score_0_100 desc').
+      Filter columns: age_months, crowding_score, vol_ret_36m, ret_3m, ret_6m, value_added,
+      flows_ann_36m_avg, flow_vol_ann_36m_std, cost_of_uniqueness, score_0_100, rank.
+    - Use 'find_similar_funds(fund_name, n, fund_types, safer)' for "funds like X" or alternatives
+      to a fund the user's profile does not allow (with safer=True).
+    - Every tool only returns categories the user's saved risk profile allows. 'blocked' means the
+      category is not allowed for that profile and 'needs_profile' means no profile is saved: report it, do not retry.
+    """ + COMPACT_NOTE,
+    tools=[compact(profile_gate(get_top_funds)), compact(profile_gate(search_funds)),
+           compact(profile_gate(find_similar_funds))],
+    **LLM_SPAN_CALLBACKS,
 )
 
 # 2. SEARCH AGENT
@@ -45,9 +178,12 @@ search_agent = Agent(
     model="gemini-2.5-flash",
     description="Useful for finding real-time market news, definitions, or facts not in the database.",
     instruction="You are the Market Researcher. Use google_search for external info.",
-    tools=[google_search]
+    tools=[google_search],
+    **LLM_SPAN_CALLBACKS,
 )
 
+search_tool = CachedAgentTool(agent=search_agent, namespace="search", ttl=SEARCH_TTL)
+
 # 3. ANALYST AGENT
 analyst_agent = Agent(
     name="analyst_agent",
@@ -55,18 +191,25 @@ analyst_agent = Agent(
     description="Useful for deep analysis, explaining 'Why', or crowding/nuance analysis.",
     instruction="""
     You are a Senior Quantitative Analyst.
-    - Use 'get_fund_analysis' to get the raw weights and scores.
+    - Use 'get_fund_analysis' to get the score, percentile within its category and the feature attribution.
+    - When the user lists several funds they hold or watch ("how do these rank?"), call 'score_portfolio' ONCE
+      with all names (and their weights if given) instead of 'get_fund_analysis' per fund.
+      Its 'portfolio' block has the weighted score, crowding and volatility; 'not_found' lists names to clarify
+      and 'ambiguous' maps a name to the funds it could mean: ask which one instead of guessing.
     - If you see a term you don't know, consult 'search_agent'.
-    - Explain the data by connecting 'Feature Weight' to 'Fund Value'.
+    - Explain the data using 'top_drivers': each contribution = feature weight (its 'weight', or 'meta' weights) x how far the
+      fund's value is above (+) or below (-) its category average, in standard deviations. 'contributions' lists every feature.
     - In addition to the key features most related to the fund performance, you must explain the crowding score to a nuance of the fund's underlying.
+    - If a fund looks crowded or too volatile for the user, offer alternatives from 'find_similar_funds' with safer=True.
     - For the crowding score analysis, you may back it up with information on the fund's current top holding by consulting to 'search_agent'
     - You may also analyse and assume the user risk profile based on the context input by the user, but if you need more information, you may ask further info to the user
     
-    IMPORTANT: 'historical_alpha_top_vs_rest' is NOT a confidence score.
+    IMPORTANT: the OOS alpha of a fund's type ('historical_alpha_top_vs_rest' or 'meta' oos_alpha) is NOT a confidence score.
     It represents the **Historical Excess Return (Alpha)** of our top recommendations vs the market.
     You do not have to tell this to the user, just keep in your mind when trying to explain.
-    """,
-    tools=[get_fund_analysis, AgentTool(agent=search_agent)]
+    """ + COMPACT_NOTE,
+    tools=[compact(get_fund_analysis), compact(score_portfolio), compact(profile_gate(find_similar_funds)), search_tool],
+    **LLM_SPAN_CALLBACKS,
 )
 
 # 4. CHANNEL AGENT (New!)
@@ -78,9 +221,10 @@ channel_agent = Agent(
     You are the Channel Partner Guide.
     - Use 'get_partner_info' to find promos, sales, and benefits for Bibit, Bareksa, or Banks.
     - Guide the user on how to buy via these partners.
-    - If user asks about "ongoing sales", check the partner info tools first, then 'google_search' if needed.
-    """,
-    tools=[get_partner_info, google_search]
+    - If user asks about "ongoing sales", check the partner info tools first, then 'search_agent' if needed.
+    """ + COMPACT_NOTE,
+    tools=[compact(get_partner_info), search_tool],
+    **LLM_SPAN_CALLBACKS,
 )
 
 # 5. VISUALIZATION AGENT (New!)
@@ -92,11 +236,95 @@ viz_agent = Agent(
     You are the Data Visualization Expert.
     - If user wants to see "Performance stats" or "Top 10% vs Rest", call 'get_visualization_data(viz_type='performance_comparison')'.
     - If user wants "Head to Head" of specific funds, call 'get_visualization_data(viz_type='head_to_head', fund_names='...')'.
+    - For trends over time use viz_type='rank_history' (with fund_names), 'alpha_history', or 'rank_movers'
+      (biggest rank changes in the latest update). Pass as_of='YYYY-MM-DD' to see the data as it was on a past date.
+    - Names listed in 'not_found' or 'ambiguous' (with the funds they could mean) were left out: say so and ask.
     - Output the data clearly and describe the chart to the user.
-    """,
-    tools=[get_visualization_data]
+    """ + COMPACT_NOTE,
+    tools=[compact(get_visualization_data)],
+    **LLM_SPAN_CALLBACKS,
 )
 
+# --- PARALLEL FAN-OUT (Recommendation turns) ---
+db_tool = TracedAgentTool(agent=db_agent)
+viz_tool = TracedAgentTool(agent=viz_agent)
+analyst_tool = CachedAgentTool(agent=analyst_agent, namespace="analyst", ttl=ANALYST_TTL, state_keys=("risk_profile",))
+
+@traced()
+async def prepare_recommendation(request: str, fund_types: str = "", include_analysis: bool = False, tool_context: ToolContext = None) -> dict:
+    """
+    One-shot context for a recommendation turn. Checks the risk profile, then asks
+    db_agent (fund list), viz_agent (performance_comparison alpha chart) and,
+    optionally, analyst_agent AT THE SAME TIME and returns all results together.
+    Args:
+        request: The user's recommendation request, in their words.
+        fund_types: Requested categories, comma-separated (e.g. 'Saham' or 'PU, PT'); empty = all allowed.
+        include_analysis: Also run analyst_agent on the request.
+    """
+    if not tool_context: return {"error": "No tool context available."}
+
+    # Profile read is an in-memory state lookup: gate before spending LLM calls.
+    profile, allowed = saved_profile(tool_context)
+    if not allowed:
+        return dict(NEEDS_PROFILE)
+
+    requested, unknown = resolve_fund_types(fund_types)
+    if not requested:
+        return {"status": "not_found", "unknown_types": unknown,
+                "message": "Ask which category: Saham, Pasar Uang, Pendapatan Tetap or Campuran."}
+    permitted = [t for t in requested if t in allowed]
+    if not permitted:
+        return {"status": "blocked", "risk_profile": profile, "requested": requested, "allowed": allowed}
+
+    branches = {
+        "db": db_tool.run_async(
+            args={"request": f"{request}\nOnly these categories: {', '.join(permitted)}."},
+            tool_context=tool_context,
+        ),
+        "viz": viz_tool.run_async(
+            args={"request": "Show performance_comparison (Top 10% vs Rest alpha)."},
+            tool_context=tool_context,
+        ),
+    }
+    if include_analysis:
+        branches["analyst"] = analyst_tool.run_async(
+            args={"request": f"{request}\nUser risk profile: {profile}."},
+            tool_context=tool_context,
+        )
+
+    merged = await fan_out(branches)
+    results = merged["results"]
+    return {
+        "status": "success",
+        "risk_profile": profile,
+        "allowed_types": permitted,
+        "unknown_types": unknown,
+        "funds": results.get("db"),
+        "performance_comparison": results.get("viz"),
+        "analysis": results.get("analyst"),
+        "errors": merged["errors"],
+        "timings_ms": merged["timings_ms"],
+    }
+
+@traced()
+def recommend_funds(fund_types: str = "", page: int = 1, page_size: int = 10, tool_context: ToolContext = None) -> dict:
+    """
+    The user's best funds in ONE call: a single ranking across every category their
+    saved risk profile allows (precomputed, paginated), with each category's OOS alpha.
+    Args:
+        fund_types: Optional narrower categories, comma-separated (e.g. 'PT, CP'); empty = everything allowed.
+        page: Page number, starting at 1 (use 2, 3, ... for "show me more").
+        page_size: Funds per page.
+    """
+    if not tool_context: return {"error": "No tool context available."}
+
+    # The gate lives here, not in the prompt: the profile comes from state, never from the model.
+    profile, allowed = saved_profile(tool_context)
+    if not allowed:
+        return dict(NEEDS_PROFILE)
+    return encode("get_profile_recommendations",
+                  get_profile_recommendations(profile, fund_types or "All", page, page_size), tool_context)
+
 # --- ROOT AGENT ---
 root_agent = Agent(
     name="indo_fund_advisor",
@@ -111,33 +339,52 @@ root_agent = Agent(
     - If user says "I am Conservative/Aggressive", SAVE it using 'manage_user_profile(action='save', ...)' immediately.
     - The user may express some of their behavior or preference like risk appetite, and target return (but you should educate if it does not makes sense),
       you consult with "analyst_agent" to analyse and assume what could be the risk profile and recommend the funds accordingly.
-    - Everytime you give or list mutual fund recommendation, please also consult with "viz_agent" to show 'performance_comparison', Returns the Alpha (OOS Reliability) stats. This shows how much better the Top 10% mutual funds are compared to the Rest 90%.
+    - Everytime you give or list mutual fund recommendation, please also show 'performance_comparison' from "viz_agent" ('prepare_recommendation' already fetches it; 'recommend_funds' rows carry it as oos_alpha), Returns the Alpha (OOS Reliability) stats. This shows how much better the Top 10% mutual funds are compared to the Rest 90%.
       In addition to alpha, also show the recommended funds stats againts the average of the rest 90% 
 
     STEP 2: GATEKEEPING (RISK CHECK)
-    - If user asks for a recommendation ("Best Fund", "Top Saham"):
-      1. Call `manage_user_profile(action='read', key='risk_profile')`.
-      2. If 'Unknown' -> ASK user to choose: Conservative, Moderate, Balanced, Aggressive. STOP.
-      3. If 'Known' -> CHECK if the request matches the profile:
-         - Conservative: Only 'Pasar Uang' (PU) allowed.
-         - Moderate: Only 'PU' & 'Pendapatan Tetap' (PT) allowed.
-         - Balanced: 'PU', 'PT', 'Campuran' (CP) allowed.
-         - Aggressive: All allowed.
-      4. If BLOCKED -> Refuse politely ("Based on your Conservative profile, I cannot recommend Saham.").
-      5. If ALLOWED -> Call `db_agent`.
+    - The risk gate is enforced by the tools themselves (recommend_funds, prepare_recommendation and
+      every db_agent tool), from the user's saved profile. Never recommend funds from any other source.
+      Allowed categories per profile:
+      Conservative -> Pasar Uang (PU) only. Moderate -> PU, Pendapatan Tetap (PT).
+      Balanced -> PU, PT, Campuran (CP). Aggressive -> PU, PT, CP, Saham (SH).
+    - General requests ("best funds for me", "what should I buy", "show me more"):
+      Call `recommend_funds(page=...)` ONCE. It returns one ranking across every category the profile
+      allows (with each category's OOS alpha), so do NOT call db_agent once per category.
+    - Specific requests ("Top Saham", "low-volatility bond funds", "why these?"):
+      Call `prepare_recommendation(request=..., fund_types=...)` ONCE. It runs db_agent and
+      viz_agent (performance_comparison) in parallel and returns both, so do NOT call them separately.
+      Set include_analysis=True when the user also asks "why".
+    - What they return:
+      'needs_profile' -> ASK user to choose: Conservative, Moderate, Balanced, Aggressive. STOP.
+      'not_found' -> the category was not recognised: ASK which one (Saham, Pasar Uang, Pendapatan Tetap, Campuran).
+      'unknown_types' not empty -> mention those names were not recognised as categories.
+      'blocked' -> Refuse politely ("Based on your Conservative profile, I cannot recommend Saham.").
+                   If the user named a specific fund, ask 'db_agent' to run find_similar_funds for it with safer=True
+                   (the saved profile is applied); otherwise offer `recommend_funds` for what the profile allows.
+      'excluded_types' not empty -> say those categories were left out because of the profile.
 
     STEP 3: ROUTING (Non-Recommendation Requests)
     - 'search_agent': Market News.
-    - 'analyst_agent': Deep Analysis ("Why is X good?").
+    - 'analyst_agent': Deep Analysis ("Why is X good?"), and reviews of a list of funds the user holds.
     - 'channel_agent': Buying info, Promos.
     - 'viz_agent': Charts, Stats.
-    """,
+    """ + COMPACT_NOTE,
     tools=[
-        AgentTool(agent=db_agent), 
-        AgentTool(agent=search_agent),
-        AgentTool(agent=analyst_agent),
-        AgentTool(agent=channel_agent),
-        AgentTool(agent=viz_agent),
+        recommend_funds,
+        prepare_recommendation,
+        db_tool, 
+        search_tool,
+        analyst_tool,
+        TracedAgentTool(agent=channel_agent),
+        viz_tool,
         manage_user_profile # Root keeps this to be the Gatekeeper
-    ] 
+    ],
+    # Structured requests ("top saham", "A vs B", "promo Bibit") are answered
+    # from the tools directly, without an LLM call (see router.py).
+    # fast_path_callback runs first: when it answers, there is no model call to trace.
+    before_model_callback=[fast_path_callback, llm_call_started],
+    after_model_callback=llm_call_finished,
+    # A returning user's stored profile is in state before the gate or fast path looks.
+    before_agent_callback=restore_profile,
 )
\ No newline at end of file
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# --- Per-fund feature attribution ---
+# contribution(feature) = weight x z-score of the fund's value within its MFType.
+# Positive = the feature lifts the fund above its category peers, negative = drags.
+# Built by the pipeline (data/fund_analysis.csv, same row order as
+# funds_master_clean.csv); the fund store recomputes it if the file is missing.
+
+ANALYSIS_FILE = "fund_analysis.csv"
+CONTRIB_PREFIX = "contrib_"
+TOP_K = 3
+
+
+def compute_analysis(master, weights, top_k=TOP_K):
+    features = [f for f in weights if f in master.columns]
+    out = pd.DataFrame({"mfName": master["mfName"].to_numpy(), "MFType": master["MFType"].to_numpy()})
+    if master.empty:
+        return out
+
+    values = master[features].astype(float)
+    groups = values.groupby(master["MFType"].to_numpy())
+    std = groups.transform("std", ddof=0).replace(0, np.nan)
+    z = ((values - groups.transform("mean")) / std).fillna(0.0)
+    contrib = z.to_numpy() * np.array([weights[f] for f in features])
+
+    for i, f in enumerate(features):
+        out[f"{CONTRIB_PREFIX}{f}"] = contrib[:, i]
+    type_groups = master.groupby("MFType")["score_0_100"]
+    out["pct_in_type"] = (type_groups.rank(pct=True, method="max") * 100).round(1).to_numpy()
+    out["n_in_type"] = type_groups.transform("size").to_numpy()
+
+    order = np.argsort(-np.abs(contrib), axis=1, kind="stable")[:, :top_k]
+    names = np.array(features, dtype=object)
+    for k in range(min(top_k, len(features))):
+        out[f"driver_{k + 1}"] = names[order[:, k]]
+    return out
+
+
+class AnalysisTable:
+    """Array view over the analysis frame; payloads are built by row position."""
+
+    def __init__(self, analysis, master, weights):
+        self.features = [c[len(CONTRIB_PREFIX):] for c in analysis.columns if c.startswith(CONTRIB_PREFIX)]
+        self.contrib = analysis[[CONTRIB_PREFIX + f for f in self.features]].to_numpy(dtype=np.float64)
+        self.values = master[self.features].to_numpy(dtype=np.float64)
+        self.pct = analysis["pct_in_type"].to_numpy(dtype=np.float64)
+        self.n_in_type = analysis["n_in_type"].to_numpy()
+        self.drivers = analysis[[c for c in analysis.columns if c.startswith("driver_")]].to_numpy(dtype=object)
+        self.col = {f: i for i, f in enumerate(self.features)}
+        self.weights = dict(weights)
+
+    def payload(self, pos, round_fn):
+        """Compact, ready-to-explain attribution for the fund at row `pos`."""
+        drivers = []
+        for feature in self.drivers[pos]:
+            i = self.col[feature]
+            drivers.append({
+                "feature": feature,
+                "weight": round_fn(self.weights.get(feature, 0)),
+                "value": round_fn(self.values[pos, i]),
+                "contribution": round_fn(self.contrib[pos, i]),
+            })
+        return {
+            "percentile_in_type": float(self.pct[pos]),
+            "funds_in_type": int(self.n_in_type[pos]),
+            "top_drivers": drivers,
+            "contributions": {f: round_fn(self.contrib[pos, i]) for f, i in self.col.items()},
+        }
+
+
+def _aligned(analysis, master):
+    return (
+        analysis is not None and len(analysis) == len(master) and len(master) > 0
+        and (analysis["mfName"].to_numpy() == master["mfName"].to_numpy()).all()
+    )
+
+def get_analysis_table(snapshot):
+    """Precomputed table when it matches the master frame, else computed now (once per snapshot)."""
+    def build(snap):
+        analysis = snap.analysis
+        if not _aligned(analysis, snap.master):
+            analysis = compute_analysis(snap.master, snap.weights)
+        return AnalysisTable(analysis, snap.master, snap.weights)
+    return snapshot.derived('analysis', build)
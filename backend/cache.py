@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+# --- 1. SETTINGS ---
+CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # 'memory' or 'sqlite'
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".cache", "responses.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+ANALYST_TTL = float(os.getenv("ANALYST_CACHE_TTL", str(24 * 3600)))
+
+_PUNCT = re.compile(r"[^\w%]+", re.UNICODE)
+
+
+def normalize_query(text) -> str:
+    """Case/punctuation/whitespace-insensitive form of a query."""
+    return " ".join(_PUNCT.sub(" ", str(text).lower()).split())
+
+def make_key(*parts) -> str:
+    raw = "\x1f".join(normalize_query(p) if isinstance(p, str) else json.dumps(p, sort_keys=True) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# --- 2. BACKENDS ---
+# A backend stores bytes with an absolute expiry and evicts least-recently-used
+# entries once the total stored size exceeds max_bytes.
+
+class MemoryBackend:
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (blob, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None, False
+            blob, expires = item
+            if expires < time.time():
+                self._drop(key)
+                return None, True
+            self._data.move_to_end(key)
+            return blob, False
+
+    def set(self, key, blob, ttl):
+        evicted = 0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if len(blob) > self.max_bytes:
+                return 0
+            self._data[key] = (blob, time.time() + ttl)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                evicted += 1
+        return evicted
+
+    def _drop(self, key):
+        blob, _ = self._data.pop(key)
+        self._bytes -= len(blob)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def usage(self):
+        return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class SqliteBackend:
+    """On-disk backend (WAL) so cached answers survive restarts and are shared by workers."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache(last_access)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, False
+        now = time.time()
+        if row[1] < now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None, True
+        conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+        return bytes(row[0]), False
+
+    def set(self, key, blob, ttl):
+        if len(blob) > self.max_bytes:
+            return 0
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), now + ttl, now),
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            for old_key, size in conn.execute("SELECT key, size FROM cache ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM cache WHERE key = ?", (old_key,))
+                total -= size
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+    def usage(self):
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "path": self.path}
+
+
+def make_backend(kind=CACHE_BACKEND):
+    if kind == "sqlite":
+        return SqliteBackend()
+    return MemoryBackend()
+
+
+# --- 3. CACHE ---
+class ResponseCache:
+    """JSON-value cache on a pluggable backend, with per-namespace hit/miss counters."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or make_backend()
+        self.stats = Counter()
+
+    def get(self, namespace, key):
+        blob, expired = self.backend.get(f"{namespace}:{key}")
+        if blob is None:
+            self.stats[f"{namespace}.misses"] += 1
+            if expired:
+                self.stats[f"{namespace}.expired"] += 1
+            return None
+        self.stats[f"{namespace}.hits"] += 1
+        return json.loads(blob)
+
+    def set(self, namespace, key, value, ttl):
+        blob = json.dumps(value, ensure_ascii=False).encode()
+        self.stats[f"{namespace}.evictions"] += self.backend.set(f"{namespace}:{key}", blob, ttl)
+
+    def metrics(self):
+        namespaces = sorted({k.split(".")[0] for k in self.stats})
+        out = {}
+        for ns in namespaces:
+            hits, misses = self.stats[f"{ns}.hits"], self.stats[f"{ns}.misses"]
+            out[ns] = {
+                "hits": hits,
+                "misses": misses,
+                "expired": self.stats[f"{ns}.expired"],
+                "evictions": self.stats[f"{ns}.evictions"],
+                "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            }
+        return {"namespaces": out, "backend": self.backend.usage()}
+
+
+RESPONSE_CACHE = ResponseCache()
+
+def cache_metrics():
+    return RESPONSE_CACHE.metrics()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Memory-mapped columnar bundle ---
+# A frame is stored as up to three .npy files plus a small JSON header:
+#   <name>.f64.npy  float64 columns, shape (n_cols, n_rows): each column contiguous
+#   <name>.i64.npy  int64 columns, same layout
+#   <name>.str.npy  fixed-width unicode string table (mfName, MFType, ...)
+#   <name>.meta.json column order/kinds and the sha1 of the CSV it mirrors
+# np.load(mmap_mode='r') maps the files read-only, so every worker process
+# shares the same page-cache pages and nothing is parsed on load.
+# The (n_cols, n_rows) layout is pandas' own block layout, so the DataFrame
+# built in read_bundle wraps the mapped memory without copying.
+
+COLUMNAR_DIR = "columnar"
+FORMAT_VERSION = 1
+
+
+def _paths(directory, name):
+    base = os.path.join(directory, name)
+    return {kind: f"{base}.{kind}.npy" for kind in ("f64", "i64", "str")} | {"meta": f"{base}.meta.json"}
+
+def meta_path(directory, name):
+    return _paths(directory, name)["meta"]
+
+def sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _save_atomic(path, array):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+def write_bundle(df, directory, name, source_sha1=None):
+    """Writes `df` as a bundle. `source_sha1` ties it to the CSV it was built with."""
+    os.makedirs(directory, exist_ok=True)
+    paths = _paths(directory, name)
+    kinds = {}
+    groups = {"f64": [], "i64": [], "str": []}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_integer_dtype(dtype) and not df[col].isna().any():
+            kind = "i64"
+        elif pd.api.types.is_numeric_dtype(dtype):
+            kind = "f64"
+        else:
+            kind = "str"
+        kinds[col] = kind
+        groups[kind].append(col)
+
+    n = len(df)
+    if groups["f64"]:
+        _save_atomic(paths["f64"], df[groups["f64"]].to_numpy(dtype=np.float64).T)
+    if groups["i64"]:
+        _save_atomic(paths["i64"], df[groups["i64"]].to_numpy(dtype=np.int64).T)
+    if groups["str"]:
+        _save_atomic(paths["str"], df[groups["str"]].fillna("").astype(str).to_numpy(dtype=str).T)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "rows": n,
+        "columns": list(df.columns),
+        "kinds": kinds,
+        "groups": groups,
+        "source_sha1": source_sha1,
+    }
+    tmp = f"{paths['meta']}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, paths["meta"])
+    return meta
+
+
+def read_meta(directory, name):
+    path = meta_path(directory, name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        meta = json.load(f)
+    return meta if meta.get("format") == FORMAT_VERSION else None
+
+def read_bundle(directory, name, meta=None):
+    """Maps a bundle back into a DataFrame whose numeric columns are zero-copy views."""
+    meta = meta or read_meta(directory, name)
+    if meta is None:
+        return None
+    paths = _paths(directory, name)
+    groups = meta["groups"]
+
+    parts = []
+    for kind in ("f64", "i64"):
+        if groups[kind]:
+            mapped = np.load(paths[kind], mmap_mode='r')
+            parts.append(pd.DataFrame(mapped.T, columns=groups[kind], copy=False))
+    df = pd.concat(parts, axis=1) if parts else pd.DataFrame(index=range(meta["rows"]))
+
+    if groups["str"]:
+        strings = np.load(paths["str"], mmap_mode='r')
+        for i, col in enumerate(groups["str"]):
+            df[col] = strings[i].astype(object)
+    return df[meta["columns"]]
+
+
+def load_frame(directory, name, csv_path, source_sha1=None):
+    """
+    The bundle when it mirrors the current CSV, else the CSV itself.
+    Returns (frame, "columnar" | "csv").
+    """
+    meta = read_meta(directory, name)
+    if meta is not None and os.path.exists(csv_path):
+        source_sha1 = source_sha1 or sha1_file(csv_path)
+        if meta.get("source_sha1") == source_sha1:
+            try:
+                return read_bundle(directory, name, meta), "columnar"
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Columnar bundle '{name}' unreadable, using CSV: {e}")
+    if not os.path.exists(csv_path):
+        return pd.DataFrame(), "csv"
+    return pd.read_csv(csv_path), "csv"
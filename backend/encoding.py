@@ -0,0 +1,241 @@
+import functools
+import inspect
+import json
+import math
+import os
+from collections import Counter, defaultdict
+
+from .query import smart_round_array
+from .store import get_snapshot
+from .tracing import span
+
+# --- Compact tool payloads for the LLM ---
+# Tool results go to Gemini as input tokens, so what agents receive is re-encoded:
+#   - lists of same-shaped rows (and dicts of same-shaped records) become
+#     {"cols": [...], "rows": [[...], ...]}: keys are sent once, not per row;
+#   - static metadata (feature weights, OOS alpha per type) is sent once per
+#     agent invocation as "meta", then only referenced as "meta_ref": <version>,
+#     but only when that is smaller than leaving those fields inline (one fund's
+#     drivers carry a few weights; the whole meta block carries all of them);
+#   - every tool has a token budget; the longest table is cut to fit, with a
+#     "truncated" note.
+# The HTTP endpoints keep the plain dicts (they call tools.py directly).
+
+PAYLOAD_ENCODING = os.getenv("PAYLOAD_ENCODING", "compact")  # 'compact' or 'off'
+BYTES_PER_TOKEN = 4  # Rough size of a Gemini token in JSON text; budgets are estimates.
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PAYLOAD_TOKEN_BUDGET", "1500"))
+TOKEN_BUDGETS = {
+    "get_top_funds": 600,
+    "search_funds": 2500,
+    "get_fund_analysis": 800,
+    "score_portfolio": 3000,
+    "find_similar_funds": 1200,
+    "get_profile_recommendations": 1500,
+    "get_partner_info": 400,
+    "get_visualization_data": 1500,
+}
+
+# Told to every agent that receives compact payloads.
+COMPACT_NOTE = """
+    Tool results may be compact: a table is {"cols": [...], "rows": [[...]]} (one row per item, values in
+    column order). "meta" holds values left out of the rows: the model's feature weights and/or OOS alpha per
+    fund type; later results of the same tool say "meta_ref" instead, meaning the same values as the "meta"
+    you already received. "truncated" means
+    more rows exist than were sent.
+"""
+
+PAYLOAD_STATS = defaultdict(Counter)
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode())
+
+def estimate_tokens(n_bytes):
+    return math.ceil(n_bytes / BYTES_PER_TOKEN)
+
+
+# --- 1. TABLES ---
+def _same_keys(records):
+    if len(records) < 2 or not all(isinstance(r, dict) for r in records):
+        return None
+    keys = list(records[0])
+    return keys if all(list(r) == keys for r in records) else None
+
+def tabulate(value):
+    """Recursively turns same-shaped row lists / record dicts into {"cols", "rows"} tables."""
+    if isinstance(value, list):
+        keys = _same_keys(value)
+        if keys:
+            return {"cols": keys, "rows": [[tabulate(r[k]) for k in keys] for r in value]}
+        return [tabulate(v) for v in value]
+    if isinstance(value, dict):
+        keys = _same_keys(list(value.values()))
+        if keys and "key" not in keys:
+            return {"cols": ["key"] + keys,
+                    "rows": [[name] + [tabulate(r[k]) for k in keys] for name, r in value.items()]}
+        return {k: tabulate(v) for k, v in value.items()}
+    return value
+
+
+# --- 2. STATIC METADATA ---
+def _drop_driver_weights(result):
+    data = result.get("analysis_data")
+    if isinstance(data, dict):
+        result["analysis_data"] = dict(data, top_drivers=[
+            {k: v for k, v in d.items() if k != "weight"} for d in data.get("top_drivers", [])])
+    result.pop("historical_alpha_top_vs_rest", None)
+    return result
+
+def _drop_row_alpha(result):
+    if isinstance(result.get("data"), list):
+        result["data"] = [{k: v for k, v in r.items() if k != "oos_alpha"} for r in result["data"]]
+    return result
+
+# Tool -> (strips the fields a "meta" block carries, the meta fields it needs).
+STATIC_FIELDS = {
+    "get_fund_analysis": (_drop_driver_weights, ("weights", "oos_alpha")),
+    "get_profile_recommendations": (_drop_row_alpha, ("oos_alpha", "oos_window")),
+}
+
+def _rounded(mapping):
+    return dict(zip(mapping, smart_round_array(list(mapping.values())).tolist()))
+
+def _meta(snap, names):
+    values = {"weights": lambda: _rounded(snap.weights), "oos_alpha": lambda: _rounded(snap.oos),
+              "oos_window": lambda: snap.oos_window}
+    return {"version": snap.version, **{name: values[name]() for name in names}}
+
+def _seen_versions(tool_context):
+    """
+    Meta blocks (version:fields) already sent to this agent in this invocation. Sub-agents get a
+    fresh session and invocation per call (AgentTool) but a copy of the parent's
+    state, so the record is per agent and invocation.
+    """
+    key = f"_payload_meta:{tool_context.agent_name}"
+    invocation_id = tool_context.invocation_id
+    record = tool_context.state.get(key) or {}
+    return key, invocation_id, list(record.get("versions", [])) if record.get("invocation") == invocation_id else []
+
+
+# --- 3. BUDGET ---
+def _tables(value, path=()):
+    """(path, row count) of every table / list in the payload."""
+    if isinstance(value, dict):
+        if "cols" in value and "rows" in value:
+            yield path + ("rows",), len(value["rows"])
+        for k, v in value.items():
+            if not (k == "rows" and "cols" in value):
+                yield from _tables(v, path + (k,))
+    elif isinstance(value, list) and value and not isinstance(value[0], (str, int, float)):
+        yield path, len(value)
+
+def _get(value, path):
+    for k in path:
+        value = value[k]
+    return value
+
+def _set(value, path, new):
+    for k in path[:-1]:
+        value = value[k]
+    value[path[-1]] = new
+
+def fit_budget(payload, budget_tokens):
+    """Cuts the longest table until the payload fits `budget_tokens` (keeps at least one row)."""
+    budget = budget_tokens * BYTES_PER_TOKEN
+    notes = {}
+    while _size(payload) > budget:
+        tables = [(n, p) for p, n in _tables(payload) if n > 1]
+        if not tables:
+            break
+        n, path = max(tables)
+        rows = _get(payload, path)
+        name = ".".join(str(k) for k in path if k != "rows") or "result"
+        notes[name] = {"shown": n, "total": notes.get(name, {}).get("total", n)}
+        payload["truncated"] = notes  # Counted in the size while searching.
+        # Largest row count that fits, by binary search on this table alone.
+        lo, hi = 1, n - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            _set(payload, path, rows[:mid])
+            notes[name]["shown"] = mid
+            if _size(payload) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        _set(payload, path, rows[:lo])
+        notes[name]["shown"] = lo
+    return payload
+
+
+# --- 4. ENCODER ---
+def encode(tool_name, result, tool_context=None):
+    """Compact form of a tool result for the LLM; stats go to PAYLOAD_STATS and an 'encode' span."""
+    if PAYLOAD_ENCODING == "off" or not isinstance(result, dict) or "error" in result:
+        return result
+    with span(f"encode {tool_name}", kind="encode", tool=tool_name) as s:
+        raw_bytes = _size(result)
+        payload = dict(result)
+        if payload.get("status") == "success":
+            del payload["status"]
+
+        static = STATIC_FIELDS.get(tool_name)
+        if static is not None and result.get("status", "success") == "success":
+            strip, names = static
+            snap = get_snapshot()
+            tag = f"{snap.version}:{'+'.join(names)}"
+            seen = []
+            if tool_context is not None:
+                key, invocation_id, seen = _seen_versions(tool_context)
+            stripped = strip(dict(payload))
+            if tag in seen:
+                payload = dict(stripped, meta_ref=snap.version)
+            else:
+                with_meta = dict(stripped, meta=_meta(snap, names))
+                if _size(tabulate(with_meta)) < _size(tabulate(payload)):
+                    payload = with_meta
+                    if tool_context is not None:
+                        tool_context.state[key] = {"invocation": invocation_id, "versions": seen[-3:] + [tag]}
+
+        payload = fit_budget(tabulate(payload), TOKEN_BUDGETS.get(tool_name, DEFAULT_TOKEN_BUDGET))
+        sent_bytes = _size(payload)
+
+        stats = PAYLOAD_STATS[tool_name]
+        stats["calls"] += 1
+        stats["raw_bytes"] += raw_bytes
+        stats["sent_bytes"] += sent_bytes
+        stats["truncated"] += "truncated" in payload
+        s.set("payload.raw_bytes", raw_bytes)
+        s.set("payload.bytes", sent_bytes)
+        s.set("payload.saved_bytes", raw_bytes - sent_bytes)
+        s.set("payload.saved_tokens", estimate_tokens(raw_bytes) - estimate_tokens(sent_bytes))
+        return payload
+
+
+def compact(func):
+    """
+    Agent-facing version of a tools.py function: same declaration for the
+    model, result passed through encode(). ADK injects tool_context (by name,
+    so google-adk is not imported here: the server loads it on first use).
+    """
+    sig = inspect.signature(func)
+    takes_context = "tool_context" in sig.parameters
+
+    @functools.wraps(func)
+    def wrapper(*args, tool_context=None, **kwargs):
+        if takes_context:
+            kwargs["tool_context"] = tool_context
+        return encode(func.__name__, func(*args, **kwargs), tool_context)
+
+    if not takes_context:
+        params = list(sig.parameters.values()) + [
+            inspect.Parameter("tool_context", inspect.Parameter.KEYWORD_ONLY, default=None)]
+        wrapper.__signature__ = sig.replace(parameters=params)
+    return wrapper
+
+
+def payload_metrics():
+    """Per-tool totals: calls, raw vs sent bytes, estimated tokens saved."""
+    return {
+        tool: {**stats, "saved_tokens": estimate_tokens(stats["raw_bytes"]) - estimate_tokens(stats["sent_bytes"])}
+        for tool, stats in PAYLOAD_STATS.items()
+    }
@@ -0,0 +1,329 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# --- Historical snapshot store ---
+# Every pipeline run whose scored output differs from the last recorded one
+# appends an immutable, date-partitioned snapshot:
+#
+#   data/history/date=2026-10-17/<snapshot_id>.funds.csv   mfName, MFType, score_0_100, rank
+#   data/history/date=2026-10-17/<snapshot_id>.oos.csv     MFType, window, alpha
+#
+# plus rows appended (never rewritten) to three consolidated files, so reads
+# never rescan the partitions:
+#
+#   catalog.csv    one row per snapshot, with its row range in panel.csv
+#   panel.csv      every fund of every snapshot + rank/score change vs the previous snapshot
+#   oos_panel.csv  OOS alpha per type and window, per snapshot
+
+HISTORY_DIR = "history"
+CATALOG_FILE = "catalog.csv"
+PANEL_FILE = "panel.csv"
+OOS_PANEL_FILE = "oos_panel.csv"
+
+FUND_COLUMNS = ["mfName", "MFType", "score_0_100", "rank"]
+OOS_PREFIX = "outofsample"
+# Which OOS column is "current": OOS_COLUMN if set, else the newest 'outofsample_*' column.
+OOS_COLUMN = os.getenv("OOS_COLUMN", "")
+
+
+def pick_oos_column(columns):
+    columns = list(columns)
+    if OOS_COLUMN:
+        return OOS_COLUMN if OOS_COLUMN in columns else None
+    windows = [c for c in columns if c.startswith(OOS_PREFIX)]
+    return windows[-1] if windows else None
+
+def oos_long(oos_df):
+    """oos_reliability.csv (one column per window) -> rows of (MFType, window, alpha)."""
+    windows = [c for c in oos_df.columns if c != 'MFType']
+    if 'MFType' not in oos_df.columns or not windows:
+        return pd.DataFrame(columns=["MFType", "window", "alpha"])
+    return oos_df.melt(id_vars="MFType", value_vars=windows, var_name="window", value_name="alpha")
+
+def parse_date(value):
+    """'2026-10-17' / date / None (today) -> date. Raises ValueError on bad input."""
+    if value is None or value == "":
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+# --- 1. WRITER (pipeline side) ---
+def _fund_chunks(master, chunksize):
+    """FUND_COLUMNS of a scored frame, or of a funds_master_clean CSV read `chunksize` rows at a time."""
+    if isinstance(master, pd.DataFrame):
+        yield master[FUND_COLUMNS].reset_index(drop=True)
+        return
+    for chunk in pd.read_csv(master, usecols=FUND_COLUMNS, chunksize=chunksize, float_precision='round_trip',
+                             dtype={"mfName": "str", "MFType": "str"}):
+        yield chunk[FUND_COLUMNS]
+
+def _content_hash(chunks, oos):
+    # Header once, then rows: the same bytes as one to_csv of the whole frame.
+    h = hashlib.sha1()
+    for i, funds in enumerate(chunks):
+        h.update(funds.to_csv(index=False, header=i == 0).encode())
+    h.update(oos.to_csv(index=False).encode())
+    return h.hexdigest()
+
+def _fund_keys(funds):
+    return funds["mfName"].astype(str) + "\x1f" + funds["MFType"].astype(str)
+
+def _previous_funds(path, chunksize):
+    """rank / score_0_100 of a snapshot's funds file, keyed by name + type (first row wins)."""
+    prev = pd.concat([chunk.set_index(_fund_keys(chunk))[["rank", "score_0_100"]]
+                      for chunk in pd.read_csv(path, chunksize=chunksize or 100_000)])
+    return prev[~prev.index.duplicated()]
+
+def _append_csv(df, path):
+    df.to_csv(path, mode='a', index=False, header=not os.path.exists(path))
+
+def _truncate_rows(path, rows):
+    """
+    Cuts a CSV back to its header + first `rows` rows: drops rows appended by a
+    run that failed before its catalog row was written.
+    """
+    if not os.path.exists(path):
+        return
+    if not rows:
+        os.remove(path)
+        return
+    with open(path, 'rb+') as f:
+        f.readline()  # header
+        for _ in range(rows):
+            if not f.readline():
+                return
+        f.truncate()
+
+def check_as_of(output_dir, as_of=None):
+    """
+    The date a snapshot recorded now would get (default today). Raises
+    ValueError when it is not a date or older than the latest snapshot, so
+    callers can check before writing anything else.
+    """
+    day = parse_date(as_of)
+    catalog_path = os.path.join(output_dir, HISTORY_DIR, CATALOG_FILE)
+    if os.path.exists(catalog_path):
+        dates = pd.read_csv(catalog_path, usecols=["date"])["date"]
+        if len(dates) and parse_date(dates.iloc[-1]) > day:
+            raise ValueError(f"Snapshots are append-only: {day} is older than the latest ({dates.iloc[-1]}).")
+    return day
+
+def _catalog_rows(path, snapshot_ids):
+    """Leading rows of a panel file that belong to cataloged snapshots."""
+    if not os.path.exists(path):
+        return 0
+    ids = pd.read_csv(path, usecols=["snapshot_id"])["snapshot_id"]
+    orphan = ~ids.isin(snapshot_ids).to_numpy()
+    return int(orphan.argmax()) if orphan.any() else len(ids)
+
+def record_snapshot(output_dir, master, oos_df, as_of=None, taken_at=None, chunksize=None):
+    """
+    Appends the scored master (a frame, or the path of funds_master_clean.csv,
+    streamed `chunksize` rows at a time) and OOS alpha as a new snapshot dated
+    `as_of` (default today). Skipped when identical to the latest snapshot.
+    Returns the snapshot id, or None when nothing was recorded.
+    """
+    history_dir = os.path.join(output_dir, HISTORY_DIR)
+    os.makedirs(history_dir, exist_ok=True)
+    day = parse_date(as_of)
+    taken_at = taken_at or datetime.now()
+
+    oos = oos_long(oos_df) if oos_df is not None else oos_long(pd.DataFrame())
+    digest = _content_hash(_fund_chunks(master, chunksize), oos)
+
+    catalog_path = os.path.join(history_dir, CATALOG_FILE)
+    catalog = pd.read_csv(catalog_path) if os.path.exists(catalog_path) else None
+    previous = None
+    if catalog is not None and len(catalog):
+        last = catalog.iloc[-1]
+        if last["content_hash"] == digest:
+            return None
+        if parse_date(last["date"]) > day:
+            raise ValueError(f"Snapshots are append-only: {day} is older than the latest ({last['date']}).")
+        previous = last
+
+    snapshot_id = f"{taken_at:%Y%m%dT%H%M%S}-{digest[:8]}"
+    partition = os.path.join(history_dir, f"date={day.isoformat()}")
+    os.makedirs(partition, exist_ok=True)
+    oos.to_csv(os.path.join(partition, f"{snapshot_id}.oos.csv"), index=False)
+    prev = None
+    if previous is not None:
+        prev = _previous_funds(os.path.join(history_dir, f"date={previous['date']}", f"{previous['snapshot_id']}.funds.csv"),
+                               chunksize)
+
+    # Offsets come from the catalog, so both panels must end where the catalog
+    # says: rows left by a run that failed before its catalog row are cut together.
+    start = int(previous["panel_start"] + previous["panel_rows"]) if previous is not None else 0
+    panel_path = os.path.join(history_dir, PANEL_FILE)
+    oos_path = os.path.join(history_dir, OOS_PANEL_FILE)
+    oos_start = _catalog_rows(oos_path, catalog["snapshot_id"]) if previous is not None else 0
+    _truncate_rows(panel_path, start)
+    _truncate_rows(oos_path, oos_start)
+
+    funds_path = os.path.join(partition, f"{snapshot_id}.funds.csv")
+    rows = 0
+    for i, funds in enumerate(_fund_chunks(master, chunksize)):
+        funds.to_csv(funds_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        # Rank/score change against the previous snapshot, computed once here.
+        panel = funds.reset_index(drop=True)
+        if prev is not None:
+            matched = prev.reindex(_fund_keys(panel))
+            prev_rank, prev_score = matched["rank"].to_numpy(), matched["score_0_100"].to_numpy()
+        else:
+            prev_rank = prev_score = np.full(len(panel), np.nan)
+        panel["prev_rank"] = prev_rank
+        panel["rank_change"] = prev_rank - panel["rank"].to_numpy()  # > 0 = moved up
+        panel["score_change"] = (panel["score_0_100"].to_numpy() - prev_score).round(1)
+        panel.insert(0, "snapshot_id", snapshot_id)
+        panel.insert(1, "date", day.isoformat())
+        _append_csv(panel, panel_path)
+        rows += len(panel)
+    oos_rows = oos.copy()
+    oos_rows.insert(0, "snapshot_id", snapshot_id)
+    oos_rows.insert(1, "date", day.isoformat())
+    _append_csv(oos_rows, oos_path)
+    # Catalog last: a snapshot only becomes visible once its panel rows exist.
+    _append_csv(pd.DataFrame([{
+        "snapshot_id": snapshot_id,
+        "date": day.isoformat(),
+        "taken_at": taken_at.isoformat(timespec="seconds"),
+        "content_hash": digest,
+        "funds": rows,
+        "panel_start": start,
+        "panel_rows": rows,
+    }]), catalog_path)
+    return snapshot_id
+
+
+# --- 2. READER (backend side) ---
+PANEL_COLUMNS = ["snapshot_id", "date"] + FUND_COLUMNS + ["prev_rank", "rank_change", "score_change"]
+
+
+def _read_rows(path, offset, rows):
+    """
+    `rows` lines of a CSV from byte `offset` (0 = first row after the header).
+    Returns (frame, byte offset after them).
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        block = b"".join(f.readline() for _ in range(rows))
+        end = f.tell()
+    return pd.read_csv(io.BytesIO(header + block)), end
+
+
+class HistoryView:
+    """
+    Read-only, in-memory view of the consolidated history files. Snapshot
+    reads are row slices (catalog keeps each snapshot's range in the panel);
+    per-fund series come from a name -> rows index.
+    Built from the `previous` view when the catalog only grew, so a reload
+    parses just the panel rows of the new snapshots.
+    """
+
+    def __init__(self, history_dir, previous=None):
+        self.history_dir = history_dir
+        catalog_path = os.path.join(history_dir, CATALOG_FILE)
+        self.catalog = pd.read_csv(catalog_path) if os.path.exists(catalog_path) else pd.DataFrame(
+            columns=["snapshot_id", "date", "taken_at", "content_hash", "funds", "panel_start", "panel_rows"])
+        visible = int((self.catalog["panel_start"] + self.catalog["panel_rows"]).max()) if len(self.catalog) else 0
+
+        known = previous is not None and 0 < len(previous) <= len(self.catalog) and (
+            self.catalog["snapshot_id"].iloc[:len(previous)].to_numpy() == previous.catalog["snapshot_id"].to_numpy()).all()
+        base = previous.panel if known else pd.DataFrame(columns=PANEL_COLUMNS)
+        self._panel_end = previous._panel_end if known else 0
+        self._by_fund = dict(previous._by_fund) if known else {}
+        # Only the rows up to the catalog: a snapshot still being appended is not visible yet.
+        if visible > len(base):
+            added, self._panel_end = _read_rows(os.path.join(history_dir, PANEL_FILE), self._panel_end, visible - len(base))
+            added.index = pd.RangeIndex(len(base), len(base) + len(added))
+            self.panel = pd.concat([base, added]) if len(base) else added
+            for name, rows in added.groupby(added["mfName"].str.lower()).indices.items():
+                rows = rows + len(base)
+                self._by_fund[name] = np.concatenate([self._by_fund[name], rows]) if name in self._by_fund else rows
+        else:
+            self.panel = base
+
+        oos_path = os.path.join(history_dir, OOS_PANEL_FILE)
+        oos = pd.read_csv(oos_path) if os.path.exists(oos_path) else pd.DataFrame(
+            columns=["snapshot_id", "date", "MFType", "window", "alpha"])
+        self.oos = oos[oos["snapshot_id"].isin(self.catalog["snapshot_id"])]
+        self.dates = self.catalog["date"].to_numpy(dtype=str)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def snapshot_at(self, as_of=None):
+        """Catalog row of the latest snapshot dated on/before `as_of` (default: latest), or None."""
+        if not len(self.catalog):
+            return None
+        i = int(np.searchsorted(self.dates, parse_date(as_of).isoformat() if as_of else self.dates[-1], side="right")) - 1
+        return self.catalog.iloc[i] if i >= 0 else None
+
+    def funds_as_of(self, as_of=None):
+        """Scored funds (with rank deltas) of the snapshot in force on `as_of`."""
+        snap = self.snapshot_at(as_of)
+        if snap is None:
+            return self.panel.iloc[:0]
+        start = int(snap["panel_start"])
+        return self.panel.iloc[start:start + int(snap["panel_rows"])]
+
+    def fund_history(self, name, until=None):
+        """Rows of one fund (exact name, case-insensitive) across snapshots, oldest first."""
+        rows = self._by_fund.get(str(name).strip().lower())
+        if rows is None:
+            return self.panel.iloc[:0]
+        out = self.panel.iloc[rows]
+        if until:
+            out = out[out["date"] <= parse_date(until).isoformat()]
+        return out
+
+    def oos_history(self, window=None, until=None):
+        """OOS alpha per snapshot and type for one window (default: the current one)."""
+        window = window or pick_oos_column(self.oos["window"].drop_duplicates())
+        out = self.oos[self.oos["window"] == window]
+        if until:
+            out = out[out["date"] <= parse_date(until).isoformat()]
+        return out, window
+
+
+class HistoryStore:
+    """Holds the current HistoryView; reloads it when catalog.csv changes (checked at most once per interval)."""
+
+    def __init__(self, data_dir, check_interval=1.0):
+        self.history_dir = os.path.join(data_dir, HISTORY_DIR)
+        self.check_interval = check_interval
+        self._view = None
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            st = os.stat(os.path.join(self.history_dir, CATALOG_FILE))
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def get(self) -> HistoryView:
+        now = time.monotonic()
+        if self._view is not None and now - self._last_check < self.check_interval:
+            return self._view
+        with self._lock:
+            self._last_check = now
+            signature = self._stat()
+            if self._view is None or signature != self._signature:
+                self._view = HistoryView(self.history_dir, previous=self._view)
+                self._signature = signature
+            return self._view
@@ -0,0 +1,252 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Match kinds, best first. The score of a match is its kind's base score plus a
+# small similarity bonus, so ranking is stable across kinds.
+EXACT, PREFIX, TOKENS, FUZZY = "exact", "prefix", "tokens", "fuzzy"
+_BASE = {EXACT: 3.0, PREFIX: 2.0, TOKENS: 1.0, FUZZY: 0.0}
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# Work caps, so a lookup costs the same at 300 or 100k funds: a token prefix
+# expands to at most MAX_EXPANSION vocabulary words and scores at most
+# MAX_POSTINGS rows (the shortest names, which score best); fuzzy matching
+# edit-compares at most MAX_FUZZY shortlisted names.
+MAX_EXPANSION = 32
+MAX_POSTINGS = 256
+MAX_FUZZY = 6
+# A non-exact best match only resolves a query when it beats the runner-up by this much.
+AMBIGUITY_MARGIN = 0.1
+
+
+class Match(NamedTuple):
+    pos: int      # Row position in the indexed frame (use with .iloc)
+    name: str     # Original fund name
+    kind: str     # exact / prefix / tokens / fuzzy
+    score: float  # Higher is better
+
+
+class Resolution(NamedTuple):
+    query: str               # The name as given
+    pos: Optional[int]       # Resolved row position; None when missing or ambiguous
+    candidates: tuple        # Names of the near-tied best matches when ambiguous, else ()
+
+
+def normalize(name) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Read-only lookup structure over fund names, built once per data snapshot.
+
+    - exact:   normalized name -> row positions
+    - prefix:  sorted normalized names, range-scanned with bisect
+    - tokens:  inverted index token -> row positions (shortest names first),
+               with token-prefix expansion over a sorted vocabulary
+               ("syar" hits "syariah")
+    - fuzzy:   trigram postings to shortlist candidates, then edit similarity
+    Ties are broken by row order, so the first row wins like the old
+    `str.contains(...).iloc[0]` behaviour.
+    """
+
+    def __init__(self, names, fuzzy_cutoff=0.6):
+        self.names = [str(n) for n in names]
+        self.norm = [normalize(n) for n in self.names]
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        self.exact = defaultdict(list)
+        self.tokens = defaultdict(list)
+        self.trigrams = defaultdict(list)
+        self.tri_sizes = []
+        for pos, norm in enumerate(self.norm):
+            self.exact[norm].append(pos)
+            for tok in set(norm.split()):
+                self.tokens[tok].append(pos)
+            tris = _trigrams(norm)
+            self.tri_sizes.append(len(tris))
+            for tri in tris:
+                self.trigrams[tri].append(pos)
+
+        # Freeze trigram postings as arrays so fuzzy counting is one bincount.
+        self.trigrams = {tri: np.asarray(p, dtype=np.int32) for tri, p in self.trigrams.items()}
+        self.tri_sizes = np.asarray(self.tri_sizes, dtype=np.float64)
+
+        self.sorted_names = sorted((norm, pos) for pos, norm in enumerate(self.norm))
+        self.sorted_keys = [n for n, _ in self.sorted_names]
+
+        # Token postings ordered by (name length, row), so a capped slice keeps the best scores.
+        self.lengths = np.asarray([len(n) for n in self.norm], dtype=np.int32)
+        self.row_tokens = [tuple(n.split()) for n in self.norm]
+        self.tokens = {
+            tok: np.asarray(sorted(p, key=lambda pos: (self.lengths[pos], pos)), dtype=np.int32)
+            for tok, p in self.tokens.items()
+        }
+        self.vocab = sorted(self.tokens)
+        self.vocab_rows = np.concatenate([[0], np.cumsum([len(self.tokens[t]) for t in self.vocab])])
+
+    @classmethod
+    def from_frame(cls, df, column='mfName'):
+        return cls(df[column].tolist() if column in df.columns else [])
+
+    def __len__(self):
+        return len(self.names)
+
+    # --- Individual strategies ---
+    def _prefix(self, q, limit):
+        i = bisect_left(self.sorted_keys, q)
+        out = []
+        while i < len(self.sorted_keys) and self.sorted_keys[i].startswith(q):
+            out.append(self.sorted_names[i][1])
+            i += 1
+            if len(out) >= limit * 4:
+                break
+        return out
+
+    def _vocab_range(self, tok):
+        """[lo, hi) of the vocabulary words `tok` stands for (exact word below 2 chars)."""
+        lo = bisect_left(self.vocab, tok)
+        if len(tok) < 2:
+            return lo, lo + (lo < len(self.vocab) and self.vocab[lo] == tok)
+        return lo, bisect_left(self.vocab, tok + "\uffff", lo)
+
+    def _token_postings(self, lo, hi):
+        """Rows of the words vocab[lo:hi], at most MAX_POSTINGS per word."""
+        words = self.vocab[lo:min(hi, lo + MAX_EXPANSION)]
+        if len(words) == 1:
+            return self.tokens[words[0]][:MAX_POSTINGS]
+        return np.unique(np.concatenate([self.tokens[w][:MAX_POSTINGS] for w in words]))
+
+    def _tokens(self, q, limit):
+        """
+        Up to `limit * 4` rows containing every query token (as a word prefix),
+        best first. The rarest token supplies at most MAX_POSTINGS candidates
+        per word; the other tokens only filter them.
+        """
+        ranges = [self._vocab_range(tok) for tok in q.split()]
+        sizes = [self.vocab_rows[hi] - self.vocab_rows[lo] for lo, hi in ranges]
+        if not ranges or min(sizes) == 0:
+            return []
+        driver = int(np.argmin(sizes))
+        rows = self._token_postings(*ranges[driver])
+        for i, (lo, hi) in enumerate(ranges):
+            if i != driver and len(rows):
+                has_token = np.zeros(len(self.names), dtype=bool)
+                for w in self.vocab[lo:min(hi, lo + MAX_EXPANSION)]:
+                    has_token[self.tokens[w]] = True
+                rows = rows[has_token[rows]]
+        k = min(limit * 4, len(rows))
+        if k == 0:
+            return []
+        # Shortest names score best; ties go to the first row.
+        key = self.lengths[rows].astype(np.int64) * len(self.names) + rows
+        best = np.argpartition(key, k - 1)[:k]
+        return rows[best[np.argsort(key[best])]].tolist()
+
+    def _fuzzy(self, q, limit):
+        # Dice coefficient over trigrams picks a short list; edit similarity
+        # is only computed for that list.
+        q_tris = _trigrams(q)
+        postings = [self.trigrams[t] for t in q_tris if t in self.trigrams]
+        if not postings:
+            return []
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        dice = 2 * counts / (len(q_tris) + self.tri_sizes)
+        k = min(limit + 1, MAX_FUZZY, len(dice))
+        # Every row tied with the k-th best dice competes, first rows first.
+        kth = np.partition(dice, len(dice) - k)[len(dice) - k]
+        rows = np.flatnonzero((dice >= kth) & (counts > 0))
+        shortlist = rows[np.lexsort((rows, -dice[rows]))][:k].tolist()
+        scored = []
+        matcher = SequenceMatcher(None, b=q)
+        for pos in shortlist:
+            matcher.set_seq1(self.norm[pos])
+            # The quick ratios are upper bounds of ratio(): skip the full diff when they already miss.
+            if matcher.real_quick_ratio() < self.fuzzy_cutoff or matcher.quick_ratio() < self.fuzzy_cutoff:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= self.fuzzy_cutoff:
+                scored.append((pos, ratio))
+        return scored
+
+    # --- Public API ---
+    def lookup(self, name, limit=5):
+        """Returns up to `limit` ranked Match candidates for one query."""
+        q = normalize(name)
+        if not q or not self.names:
+            return []
+
+        best = {}
+        def add(pos, kind, sim):
+            score = _BASE[kind] + sim
+            if pos not in best or score > best[pos].score:
+                best[pos] = Match(pos, self.names[pos], kind, score)
+
+        for pos in self.exact.get(q, ()):
+            add(pos, EXACT, 1.0)
+        for pos in self._prefix(q, limit):
+            add(pos, PREFIX, len(q) / len(self.norm[pos]))
+        if len(best) < limit:
+            for pos in self._tokens(q, limit):
+                add(pos, TOKENS, len(q) / len(self.norm[pos]))
+        if not best:
+            for pos, ratio in self._fuzzy(q, limit):
+                add(pos, FUZZY, ratio)
+
+        ranked = sorted(best.values(), key=lambda m: (-m.score, m.pos))
+        return ranked[:limit]
+
+    def lookup_many(self, names, limit=1):
+        """Batch lookup: one list of candidates per query, in input order."""
+        cache = {}
+        out = []
+        for name in names:
+            key = normalize(name)
+            if key not in cache:
+                cache[key] = self.lookup(name, limit)
+            out.append(cache[key])
+        return out
+
+    def resolve(self, names, shown=3):
+        """
+        One Resolution per query, in input order. A query resolves to a row when
+        it matches a name exactly, has a single candidate, or its best candidate
+        clearly beats the next; otherwise the (up to `shown`) near-tied candidates
+        are returned for the caller to ask about.
+        """
+        out = []
+        for name, matches in zip(names, self.lookup_many(names, limit=shown)):
+            if not matches:
+                out.append(Resolution(name, None, ()))
+            elif (matches[0].kind == EXACT or len(matches) == 1
+                  or matches[0].score - matches[1].score >= AMBIGUITY_MARGIN):
+                out.append(Resolution(name, matches[0].pos, ()))
+            else:
+                tied = tuple(m.name for m in matches if matches[0].score - m.score < AMBIGUITY_MARGIN)
+                out.append(Resolution(name, None, tied))
+        return out
+
+
+def unresolved(resolutions):
+    """{'not_found': [...], 'ambiguous': {query: [candidates]}} for the queries resolve() could not pin down."""
+    return {
+        "not_found": [r.query for r in resolutions if r.pos is None and not r.candidates],
+        "ambiguous": {r.query: list(r.candidates) for r in resolutions if r.candidates},
+    }
+
+
+def get_name_index(snapshot):
+    """The master-frame name index for a snapshot (built once, then shared)."""
+    return snapshot.derived('name_index', lambda s: NameIndex.from_frame(s.master))
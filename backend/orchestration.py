@@ -0,0 +1,54 @@
+import asyncio
+import time
+from collections import deque
+
+# Most recent fan-out timings (newest last), for dashboards / debugging.
+RECENT_FANOUTS = deque(maxlen=200)
+
+
+async def _timed(name, awaitable):
+    started = time.perf_counter()
+    try:
+        result, error = await awaitable, None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    return name, result, error, (time.perf_counter() - started) * 1000
+
+
+async def fan_out(branches):
+    """
+    Runs independent branches concurrently and merges their results.
+    Args:
+        branches: {name: awaitable}. A failing branch does not cancel the others.
+    Returns:
+        {"results": {name: result}, "errors": {name: message},
+         "timings_ms": {name: ms, "wall": ms, "serial": sum of branches}}
+    """
+    started = time.perf_counter()
+    done = await asyncio.gather(*(_timed(name, aw) for name, aw in branches.items()))
+
+    results, errors, timings = {}, {}, {}
+    for name, result, error, ms in done:
+        timings[name] = round(ms, 1)
+        if error:
+            errors[name] = error
+        else:
+            results[name] = result
+    timings["serial"] = round(sum(ms for *_, ms in done), 1)
+    timings["wall"] = round((time.perf_counter() - started) * 1000, 1)
+
+    RECENT_FANOUTS.append({"at": time.time(), "timings_ms": timings, "errors": list(errors)})
+    return {"results": results, "errors": errors, "timings_ms": timings}
+
+
+def fanout_summary():
+    """Average per-branch latency and the saving versus running branches in series."""
+    if not RECENT_FANOUTS:
+        return {"count": 0}
+    totals = {}
+    for entry in RECENT_FANOUTS:
+        for name, ms in entry["timings_ms"].items():
+            totals.setdefault(name, []).append(ms)
+    avg = {name: round(sum(v) / len(v), 1) for name, v in totals.items()}
+    saved = avg.get("serial", 0) - avg.get("wall", 0)
+    return {"count": len(RECENT_FANOUTS), "avg_ms": avg, "avg_saved_ms": round(saved, 1)}
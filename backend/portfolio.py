@@ -0,0 +1,110 @@
+import re
+
+import numpy as np
+
+from .analysis import get_analysis_table
+from .name_index import get_name_index, unresolved
+from .query import get_columns, smart_round_array
+
+# --- Bulk portfolio / watchlist scoring ---
+# All names are resolved in one pass against the name index; every per-fund
+# figure and the weighted aggregate are array gathers over the fund store.
+
+AGGREGATE_COLUMNS = ["score_0_100", "crowding_score", "vol_ret_36m"]
+_SPLIT = re.compile(r"[,;\n]")
+
+
+def parse_holdings(fund_names, weights=""):
+    """
+    'A, B, C' + optional '50, 30, 20' (or '50%, ...') -> (names, weights or None).
+    Raises ValueError on a count mismatch or a negative / unreadable weight.
+    """
+    names = [n.strip() for n in _SPLIT.split(str(fund_names or "")) if n.strip()]
+    if not str(weights or "").strip():
+        return names, None
+    parts = [w.strip().rstrip('%').strip() for w in _SPLIT.split(str(weights)) if w.strip()]
+    if len(parts) != len(names):
+        raise ValueError(f"Got {len(names)} funds but {len(parts)} weights.")
+    try:
+        values = np.array([float(p) for p in parts])
+    except ValueError:
+        raise ValueError(f"Weights must be numbers, got '{weights}'.")
+    if (values < 0).any():
+        raise ValueError("Weights cannot be negative.")
+    return names, values
+
+
+def portfolio_report(snapshot, names, weights=None):
+    """
+    Scores a list of holdings against the snapshot.
+    Args:
+        names: fund names as typed by the user (fuzzy-resolved).
+        weights: holding weights aligned with `names` (any scale); None = equal weight.
+            They are re-normalized over the funds that were found.
+    Returns: {"funds": [...], "portfolio": {...}, "not_found": [...], "ambiguous": {name: [candidates]}}
+    """
+    resolutions = get_name_index(snapshot).resolve(names)
+    missing = unresolved(resolutions)
+    weights = np.ones(len(names)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    # Same fund typed twice (or two spellings of it): merge into one holding.
+    merged = {}
+    for r, w in zip(resolutions, weights):
+        if r.pos is None:
+            continue
+        merged[r.pos] = merged.get(r.pos, 0.0) + w
+    if not merged:
+        return {"funds": [], "portfolio": {}, **missing}
+
+    pos = np.fromiter(merged, dtype=np.int64, count=len(merged))
+    w = np.fromiter(merged.values(), dtype=np.float64, count=len(merged))
+    w = w / w.sum() if w.sum() > 0 else np.full(len(w), 1 / len(w))
+
+    cols = get_columns(snapshot)
+    table = get_analysis_table(snapshot)
+    values = {c: np.nan_to_num(cols.column(c)[pos]) for c in AGGREGATE_COLUMNS}
+    rounded = {c: smart_round_array(v).tolist() for c, v in values.items()}
+    ranks = np.nan_to_num(cols.column("rank")[pos]).astype(np.int64).tolist()
+    types = cols.types[pos]
+    pct = table.pct[pos]
+
+    # Top drivers with their contributions, gathered for every holding at once.
+    driver_names = table.drivers[pos]
+    driver_idx = np.vectorize(table.col.__getitem__, otypes=[np.int64])(driver_names)
+    driver_contrib = smart_round_array(table.contrib[pos[:, None], driver_idx])
+
+    funds = []
+    for i, p in enumerate(pos.tolist()):
+        funds.append({
+            "fund_name": str(cols.names[p]),
+            "type": str(types[i]),
+            "weight": round(float(w[i]), 4),
+            "score": rounded["score_0_100"][i],
+            "rank_in_type": ranks[i],
+            "funds_in_type": int(table.n_in_type[p]),
+            "percentile_in_type": float(pct[i]),
+            "crowding_score": rounded["crowding_score"][i],
+            "vol_ret_36m": rounded["vol_ret_36m"][i],
+            "top_drivers": [{"feature": f, "contribution": c}
+                            for f, c in zip(driver_names[i].tolist(), driver_contrib[i].tolist())],
+        })
+
+    # Weighted aggregate (volatility is the weighted average, ignoring correlation).
+    type_mix = {}
+    for t, wt in zip(types.tolist(), w.tolist()):
+        type_mix[t] = round(type_mix.get(t, 0.0) + wt, 4)
+    portfolio = {
+        "holdings": len(pos),
+        "weighted_score": _weighted(values["score_0_100"], w),
+        "weighted_crowding_score": _weighted(values["crowding_score"], w),
+        "weighted_vol_ret_36m": _weighted(values["vol_ret_36m"], w),
+        "weighted_percentile_in_type": round(float(np.dot(pct, w)), 1),
+        "type_mix": type_mix,
+        "strongest": funds[int(np.argmax(pct))]["fund_name"],
+        "weakest": funds[int(np.argmin(pct))]["fund_name"],
+    }
+    return {"funds": funds, "portfolio": portfolio, **missing}
+
+
+def _weighted(values, w):
+    return float(smart_round_array([np.dot(values, w)])[0])
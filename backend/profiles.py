@@ -0,0 +1,286 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from .query import PROFILE_TYPES
+
+# --- 1. SETTINGS ---
+PROFILE_BACKEND = os.getenv("PROFILE_STORE_BACKEND", "sqlite")  # 'sqlite', 'redis' or 'memory'
+PROFILE_PATH = os.getenv("PROFILE_STORE_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".state", "profiles.sqlite3"))
+PROFILE_REDIS_URL = os.getenv("PROFILE_REDIS_URL", "redis://localhost:6379/0")
+# Buffered writes are flushed this often (seconds); reads of other processes' writes lag by at most CACHE_TTL.
+PROFILE_FLUSH_INTERVAL = float(os.getenv("PROFILE_FLUSH_INTERVAL", "0.5"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "5"))
+PROFILE_CACHE_USERS = int(os.getenv("PROFILE_CACHE_USERS", "10000"))  # least recently used profiles beyond this are dropped
+
+# Profiles are per user id; ids that identify nobody are kept in the session only.
+ANONYMOUS_USERS = {"", "anonymous", "user"}
+
+
+# --- 2. TYPED FIELDS ---
+_RISK_ALIASES = {"KONSERVATIF": "CONSERVATIVE", "MODERAT": "MODERATE", "AGRESIF": "AGGRESSIVE", "SEIMBANG": "BALANCED"}
+
+def _risk_profile(value):
+    key = str(value).strip().upper()
+    key = _RISK_ALIASES.get(key, key)
+    if key not in PROFILE_TYPES:
+        raise ValueError(f"risk_profile must be one of: {', '.join(p.title() for p in PROFILE_TYPES)}.")
+    return key.title()
+
+def _rate(value):
+    """'8%', '8' or '0.08' -> 0.08"""
+    text = str(value).strip().rstrip('%').strip()
+    rate = float(text)
+    return rate / 100 if str(value).strip().endswith('%') or rate > 1 else rate
+
+def _language(value):
+    code = str(value).strip().lower()
+    return {"indonesian": "id", "bahasa": "id", "english": "en"}.get(code, code[:2])
+
+def _text(value):
+    return str(value).strip()[:500]
+
+PROFILE_FIELDS = {
+    "risk_profile": _risk_profile,
+    "target_return": _rate,
+    "horizon_years": lambda v: int(float(str(v).strip())),
+    "language": _language,
+}
+
+def coerce_field(key, value):
+    """Validated, normalized value for a profile field (free text for unknown keys)."""
+    parser = PROFILE_FIELDS.get(key, _text)
+    try:
+        return parser(value)
+    except ValueError as e:
+        raise ValueError(str(e) if key == "risk_profile" else f"Invalid {key}: '{value}'.")
+
+
+# --- 3. BACKENDS ---
+# A backend maps user_id -> {field: JSON-able value}; put_many() writes a batch atomically.
+
+class MemoryProfileBackend:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            return dict(self._data.get(user_id, {}))
+
+    def put_many(self, updates):
+        with self._lock:
+            for user_id, fields in updates.items():
+                self._data.setdefault(user_id, {}).update(fields)
+
+
+class SqliteProfileBackend:
+    """One row per (user, field) in a WAL database, so every worker process shares it."""
+
+    def __init__(self, path=PROFILE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (user_id, key))"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        rows = self._conn().execute("SELECT key, value FROM profiles WHERE user_id = ?", (user_id,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def put_many(self, updates):
+        now = time.time()
+        rows = [(user_id, key, json.dumps(value), now) for user_id, fields in updates.items() for key, value in fields.items()]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO profiles (user_id, key, value, updated_at) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RedisProfileBackend:
+    """One hash per user ('profile:<user_id>') on any Redis-protocol server. Needs the `redis` package."""
+
+    def __init__(self, url=PROFILE_REDIS_URL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PROFILE_STORE_BACKEND=redis needs the 'redis' package (pip install redis).")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, user_id):
+        return {key: json.loads(value) for key, value in self.client.hgetall(f"profile:{user_id}").items()}
+
+    def put_many(self, updates):
+        pipe = self.client.pipeline(transaction=True)
+        for user_id, fields in updates.items():
+            pipe.hset(f"profile:{user_id}", mapping={k: json.dumps(v) for k, v in fields.items()})
+        pipe.execute()
+
+
+def make_profile_backend(kind=PROFILE_BACKEND):
+    if kind == "redis":
+        return RedisProfileBackend()
+    if kind == "memory":
+        return MemoryProfileBackend()
+    return SqliteProfileBackend()
+
+
+# --- 4. STORE ---
+class ProfileStore:
+    """
+    Read-through cache + write-behind buffer over a profile backend.
+
+    `get()` serves from process memory (refreshed from the backend after
+    `cache_ttl` seconds, so other workers' writes show up; at most
+    `max_users` profiles, least recently used dropped first). `set()` updates
+    the cache at once and queues the write; a background thread flushes the
+    queue every `flush_interval` seconds in one batch.
+    """
+
+    def __init__(self, backend=None, flush_interval=PROFILE_FLUSH_INTERVAL, cache_ttl=PROFILE_CACHE_TTL,
+                 max_users=PROFILE_CACHE_USERS):
+        self._backend = backend
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.max_users = max_users
+        self._cache = OrderedDict()  # user_id -> (fields, loaded_at), least recently used first
+        self._pending = {}   # user_id -> {field: value} not yet written
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self.stats = Counter()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = make_profile_backend()
+        return self._backend
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and now - cached[1] < self.cache_ttl:
+                self._cache.move_to_end(user_id)
+                self.stats["hits"] += 1
+                return dict(cached[0])
+        self.stats["misses"] += 1
+        fields = self.backend.get(user_id)
+        with self._lock:
+            # Our own unflushed writes win over what the backend has.
+            fields.update(self._pending.get(user_id, {}))
+            self._remember(user_id, (fields, now))
+            return dict(fields)
+
+    def set(self, user_id, key, value):
+        with self._lock:
+            self._pending.setdefault(user_id, {})[key] = value
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                cached[0][key] = value
+                self._cache.move_to_end(user_id)
+            else:
+                self._remember(user_id, ({key: value}, float("-inf")))  # Partial: next get() reads through.
+        self.stats["writes"] += 1
+        self._ensure_flusher()
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def _remember(self, user_id, entry):
+        # Caller holds self._lock. Unflushed writes live in _pending, so eviction loses nothing.
+        self._cache[user_id] = entry
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_users:
+            self._cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def flush(self):
+        """Writes every buffered update now (also run at exit)."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                self.backend.put_many(pending)
+            except Exception as e:
+                with self._lock:
+                    for user_id, fields in pending.items():
+                        self._pending.setdefault(user_id, {}).update({k: v for k, v in fields.items()
+                                                                      if k not in self._pending[user_id]})
+                self.stats["flush_errors"] += 1
+                print(f"⚠️ Profile store flush failed: {e}")
+                return 0
+            self.stats["flushes"] += 1
+            return sum(len(f) for f in pending.values())
+
+    def _ensure_flusher(self):
+        if self._flusher is None and self.flush_interval > 0:
+            with self._flush_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="profile-flusher", daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def metrics(self):
+        with self._lock:
+            pending = sum(len(f) for f in self._pending.values())
+            cached = len(self._cache)
+        return {**self.stats, "pending_writes": pending, "cached_users": cached}
+
+
+PROFILES = ProfileStore()
+atexit.register(PROFILES.flush)
+
+
+# --- 5. ADK GLUE ---
+def user_id_of(context):
+    """
+    User id of a ToolContext / CallbackContext, or None for anonymous users.
+    ADK releases without the public `user_id` count as anonymous: the
+    profile then lives in the session only.
+    """
+    user_id = getattr(context, "user_id", None)
+    return None if user_id is None or str(user_id).strip().lower() in ANONYMOUS_USERS else user_id
+
+def restore_profile(callback_context):
+    """
+    before_agent_callback: copies the stored profile into fresh session state,
+    so the risk gate (prepare_recommendation, fast path) is answered without
+    asking the user again after a restart or on another worker.
+    """
+    user_id = user_id_of(callback_context)
+    if user_id is None:
+        return None
+    state = callback_context.state
+    for key, value in PROFILES.get(user_id).items():
+        if key not in state:
+            state[key] = value
+    return None
@@ -0,0 +1,195 @@
+import re
+
+import numpy as np
+
+# --- 1. VOCABULARY ---
+# Input aliases for each fund type code (kept in one place for every tool).
+TYPE_ALIASES = {
+    "SH": ["SH", "SAHAM", "EQUITY"],
+    "PU": ["PU", "PASAR UANG", "MONEY"],
+    "PT": ["PT", "PENDAPATAN TETAP", "FIXED"],
+    "CP": ["CP", "CAMPURAN", "BALANCED"],
+}
+TYPE_KEYWORDS = [("SAHAM", "SH"), ("PASAR UANG", "PU"), ("PENDAPATAN", "PT"), ("CAMPURAN", "CP")]
+
+# Risk profile gate: which fund types each profile may be recommended.
+PROFILE_TYPES = {
+    "CONSERVATIVE": ["PU"],
+    "MODERATE": ["PU", "PT"],
+    "BALANCED": ["PU", "PT", "CP"],
+    "AGGRESSIVE": ["PU", "PT", "CP", "SH"],
+}
+
+_FILTER_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(<=|>=|==|!=|<|>|=)\s*(-?[0-9.eE+-]+)\s*$")
+_OPS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "=": np.equal, "!=": np.not_equal,
+}
+
+
+def resolve_fund_type(raw):
+    """Maps user input ('Saham', 'pasar uang', 'PT') to a type code, or None."""
+    raw_input = str(raw).upper().strip()
+    for code, aliases in TYPE_ALIASES.items():
+        if raw_input in aliases:
+            return code
+    for keyword, code in TYPE_KEYWORDS:
+        if keyword in raw_input:
+            return code
+    return None
+
+def resolve_fund_types(raw):
+    """Comma-separated types (or 'All') -> list of codes, plus the unknown entries."""
+    if raw is None or str(raw).strip().upper() in ("", "ALL", "*"):
+        return list(PROFILE_TYPES["AGGRESSIVE"]), []
+    codes, unknown = [], []
+    for part in str(raw).split(','):
+        if not part.strip():
+            continue
+        code = resolve_fund_type(part)
+        if code is None:
+            unknown.append(part.strip())
+        elif code not in codes:
+            codes.append(code)
+    return codes, unknown
+
+def parse_filters(text):
+    """'crowding_score<0, age_months>60' -> [('crowding_score', '<', 0.0), ...]"""
+    if not text:
+        return []
+    if not isinstance(text, str):
+        return list(text)
+    filters = []
+    for clause in re.split(r"[,;]|\band\b", text):
+        if not clause.strip():
+            continue
+        m = _FILTER_RE.match(clause)
+        if not m:
+            raise ValueError(f"Cannot parse filter '{clause.strip()}'. Use e.g. 'vol_ret_36m<0.05'.")
+        filters.append((m.group(1), m.group(2), float(m.group(3))))
+    return filters
+
+def parse_sort(text):
+    """'score_0_100 desc, age_months' -> [('score_0_100', True), ('age_months', False)]"""
+    if not text:
+        return []
+    if not isinstance(text, str):
+        return list(text)
+    keys = []
+    for part in text.split(','):
+        tokens = part.split()
+        if not tokens:
+            continue
+        descending = len(tokens) > 1 and tokens[1].lower().startswith('desc')
+        keys.append((tokens[0], descending))
+    return keys
+
+
+# --- 2. VECTORIZED FORMATTING ---
+def smart_round_array(values):
+    """Vectorized twin of tools.smart_round: 2 significant figures below 0.1, else 2 decimals."""
+    x = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    out = np.round(x, 2)
+    small = (np.abs(x) < 0.1) & (x != 0)
+    if small.any():
+        xs = x[small]
+        factor = 10.0 ** (1 - np.floor(np.log10(np.abs(xs))))
+        out[small] = np.round(xs * factor) / factor
+    return out
+
+
+# --- 3. COLUMNAR VIEW ---
+class FundColumns:
+    """
+    Column arrays over the master frame of a snapshot. Every query is a
+    handful of NumPy operations on these arrays; no per-row Python loop.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.names = df['mfName'].astype(str).to_numpy() if 'mfName' in df.columns else np.array([], dtype=object)
+        self.types = df['MFType'].astype(str).str.upper().to_numpy() if 'MFType' in df.columns else np.array([], dtype=object)
+        self.numeric = {}
+        for col in df.columns:
+            if col in ('mfName', 'MFType'):
+                continue
+            if np.issubdtype(df[col].dtype, np.number):
+                self.numeric[col] = df[col].to_numpy(dtype=np.float64)
+        self.int_columns = {c for c in self.numeric if np.issubdtype(df[c].dtype, np.integer)} | {'rank'}
+
+    def column(self, name):
+        if name not in self.numeric:
+            raise KeyError(f"Unknown column '{name}'. Available: {', '.join(sorted(self.numeric))}.")
+        return self.numeric[name]
+
+    def mask(self, types=None, filters=()):
+        mask = np.ones(self.size, dtype=bool)
+        if types:
+            mask &= np.isin(self.types, list(types))
+        for col, op, value in filters:
+            values = self.column(col)
+            mask &= _OPS[op](values, value) & ~np.isnan(values)
+        return mask
+
+    def top(self, mask, n, sort_keys):
+        """Row positions of the best `n` rows under `mask`, ordered by sort_keys."""
+        idx = np.flatnonzero(mask)
+        if n <= 0:
+            return idx[:0]
+        if not sort_keys or not len(idx):
+            return idx[:n]
+        # Descending keys are negated; NaN sorts last either way.
+        keyed = []
+        for col, descending in sort_keys:
+            vals = self.column(col)[idx]
+            vals = -vals if descending else vals
+            keyed.append(np.where(np.isnan(vals), np.inf, vals))
+        if len(keyed) == 1 and n < len(idx):
+            part = np.argpartition(keyed[0], n - 1)[:n]
+            order = part[np.lexsort((idx[part], keyed[0][part]))]
+        else:
+            order = np.lexsort([idx] + keyed[::-1])[:n]
+        return idx[order]
+
+    def records(self, positions, columns):
+        """Serializes rows to JSON-native dicts, column by column."""
+        out_cols = {"mfName": self.names[positions].tolist(), "MFType": self.types[positions].tolist()}
+        for col in columns:
+            vals = self.column(col)[positions]
+            if col in self.int_columns:
+                out_cols[col] = np.nan_to_num(vals).astype(np.int64).tolist()
+            else:
+                out_cols[col] = smart_round_array(vals).tolist()
+        keys = list(out_cols)
+        return [dict(zip(keys, row)) for row in zip(*out_cols.values())]
+
+
+def get_columns(snapshot):
+    return snapshot.derived('columns', lambda s: FundColumns(s.master))
+
+
+# --- 4. QUERY API ---
+def query_funds(snapshot, types=None, n=10, filters=None, sort=None, columns=None):
+    """
+    Top-N query over the fund store.
+    Args:
+        types: iterable of type codes (e.g. PROFILE_TYPES['BALANCED']); None = all.
+        n: number of rows to return.
+        filters: 'col<op>value' string or list of (col, op, value) tuples.
+        sort: 'col [desc], col2' string or list of (col, descending); defaults to score desc.
+        columns: extra numeric columns to include in every row.
+    Returns: {"total": matching rows, "data": [...]}
+    """
+    cols = get_columns(snapshot)
+    filters = parse_filters(filters)
+    sort_keys = parse_sort(sort) or [("score_0_100", True)]
+    n = max(int(n), 0)
+
+    mask = cols.mask(types, filters)
+    positions = cols.top(mask, n, sort_keys)
+
+    shown = ["score_0_100", "rank"]
+    for col in [c for c, _, _ in filters] + [c for c, _ in sort_keys] + list(columns or []):
+        if col not in shown:
+            shown.append(col)
+    return {"total": int(mask.sum()), "data": cols.records(positions, shown)}
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from .query import PROFILE_TYPES, smart_round_array
+
+# --- Risk-profile recommendation views ---
+# One merged, cross-type ranking per risk profile over the types it allows.
+# Funds are ordered by their per-type normalized score (score_0_100), then
+# percentile in type, then the OOS alpha of their type (how well the type's
+# ranking held up out of sample). Built by the pipeline (data/profile_views.csv,
+# `pos` = row in funds_master_clean.csv); the fund store recomputes it if the
+# file is missing or stale.
+
+PROFILE_VIEWS_FILE = "profile_views.csv"
+VIEW_COLUMNS = ["profile", "profile_rank", "pos", "mfName", "MFType", "score_0_100", "rank",
+                "pct_in_type", "n_in_type", "oos_alpha"]
+
+
+def compute_profile_views(master, oos):
+    """master + {type: OOS alpha} -> rows of VIEW_COLUMNS, every profile in turn."""
+    if master.empty:
+        return pd.DataFrame(columns=VIEW_COLUMNS)
+    types = master["MFType"].astype(str).str.upper()
+    by_type = master["score_0_100"].groupby(types.to_numpy())
+    base = pd.DataFrame({
+        "pos": np.arange(len(master)),
+        "mfName": master["mfName"].to_numpy(),
+        "MFType": types.to_numpy(),
+        "score_0_100": master["score_0_100"].to_numpy(dtype=np.float64),
+        "rank": master["rank"].to_numpy(),
+        "pct_in_type": (by_type.rank(pct=True, method="max") * 100).round(1).to_numpy(),
+        "n_in_type": by_type.transform("size").to_numpy(),
+        "oos_alpha": types.map(lambda t: oos.get(t, np.nan)).to_numpy(dtype=np.float64),
+    })
+    base = base.sort_values(["score_0_100", "pct_in_type", "oos_alpha", "mfName"],
+                            ascending=[False, False, False, True], kind="stable", na_position="last")
+    frames = []
+    for profile, allowed in PROFILE_TYPES.items():
+        view = base[base["MFType"].isin(allowed)].copy()
+        view.insert(0, "profile", profile.title())
+        view.insert(1, "profile_rank", np.arange(1, len(view) + 1))
+        frames.append(view)
+    return pd.concat(frames, ignore_index=True)[VIEW_COLUMNS]
+
+
+class ProfileViews:
+    """
+    Ready-to-send rows per profile, built once per snapshot; a page is a list
+    slice. Type-filtered pages use row subsets cached per (profile, types).
+    """
+
+    def __init__(self, views):
+        self._rows = {}
+        self._types = {}
+        self._subsets = {}
+        for profile, frame in views.groupby("profile", sort=False):
+            scores = smart_round_array(frame["score_0_100"]).tolist()
+            alphas = smart_round_array(frame["oos_alpha"]).tolist()
+            self._rows[profile.upper()] = [
+                {
+                    "profile_rank": int(pr),
+                    "mfName": str(name),
+                    "type": str(t),
+                    "score": score,
+                    "rank_in_type": int(rank),
+                    "funds_in_type": int(n),
+                    "percentile_in_type": float(pct),
+                    "oos_alpha": alpha,
+                }
+                for pr, name, t, score, rank, n, pct, alpha in zip(
+                    frame["profile_rank"], frame["mfName"], frame["MFType"], scores, frame["rank"],
+                    frame["n_in_type"], frame["pct_in_type"], alphas)
+            ]
+            self._types[profile.upper()] = frame["MFType"].to_numpy(dtype=str)
+
+    def page(self, profile, types=None, page=1, page_size=10):
+        """(total rows, rows of the page) of a profile's view, optionally limited to `types`."""
+        rows = self._rows.get(profile.upper(), [])
+        if types is None or set(types) >= set(PROFILE_TYPES[profile.upper()]):
+            start = (page - 1) * page_size
+            return len(rows), rows[start:start + page_size]
+        key = (profile.upper(), frozenset(types))
+        subset = self._subsets.get(key)
+        if subset is None:
+            subset = np.flatnonzero(np.isin(self._types.get(profile.upper(), []), list(types)))
+            self._subsets[key] = subset
+        start = (page - 1) * page_size
+        return len(subset), [rows[i] for i in subset[start:start + page_size].tolist()]
+
+
+def _aligned(views, snap):
+    master = snap.master
+    if views is None or views.empty or master.empty or not set(VIEW_COLUMNS) <= set(views.columns):
+        return False
+    types = master["MFType"].astype(str).str.upper()
+    if len(views) != sum(int(types.isin(allowed).sum()) for allowed in PROFILE_TYPES.values()):
+        return False
+    pos = views["pos"].to_numpy()
+    if pos.max() >= len(master) or not (master["mfName"].to_numpy()[pos] == views["mfName"].to_numpy()).all():
+        return False
+    # OOS alpha must match the window the store is serving (OOS_COLUMN may differ from the pipeline's).
+    alpha = views.drop_duplicates("MFType").set_index("MFType")["oos_alpha"]
+    expected = np.array([snap.oos.get(t, np.nan) for t in alpha.index], dtype=np.float64)
+    return bool(np.allclose(alpha.to_numpy(dtype=np.float64), expected, equal_nan=True))
+
+def get_profile_views(snapshot):
+    """Pipeline-built views when they match the snapshot, else computed now (once per snapshot)."""
+    def build(snap):
+        views = snap.profile_views
+        if not _aligned(views, snap):
+            views = compute_profile_views(snap.master, snap.oos)
+        return ProfileViews(views)
+    return snapshot.derived('profile_views', build)
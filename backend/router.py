@@ -0,0 +1,208 @@
+import os
+import re
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from .name_index import get_name_index, normalize
+from .query import PROFILE_TYPES, resolve_fund_type
+from .store import get_snapshot
+from .tools import get_partner_info, get_top_funds, get_visualization_data
+
+# --- Deterministic fast path ---
+# Structured requests ("top saham", "compare A vs B", "promo Bibit") map 1:1 to
+# a tool call. Answering them here skips the root-agent LLM call AND the
+# sub-agent hop. Anything free-form ("why", "explain", ...) goes to the LLM, and
+# so does any message with a word its template would ignore ("with volatility
+# below 0.05", "yang tidak crowded", "similar to ...").
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") != "0"
+FAST_PATH_STATS = Counter()
+
+TYPE_LABELS = {"SH": "Saham", "PU": "Pasar Uang", "PT": "Pendapatan Tetap", "CP": "Campuran"}
+
+_FREE_FORM = re.compile(r"\b(why|how come|explain|kenapa|mengapa|jelaskan|analy[sz]e|analisa|analisis|should i|sebaiknya)\b", re.I)
+# Profile statements must reach the LLM so it can save them first. 'Balanced' is
+# also a fund category (Campuran), so it only counts next to "profile".
+_PROFILE_TALK = re.compile(
+    r"\b(conservative|moderate|aggressive|konservatif|moderat|agresif|risk profile|profil risiko)\b"
+    r"|\bbalanced\b.*\bprofil|\bprofil\w*\b.*\bbalanced\b", re.I)
+_INDONESIAN = re.compile(r"\b(terbaik|bandingkan|reksadana|saya|apa|dan|yang|untuk|promo)\b", re.I)
+_TOP = re.compile(r"\b(top|best|terbaik|rekomendasi|recommend(?:ation)?s?)\b(?:\s+(\d+))?", re.I)
+TOP_N_DEFAULT, TOP_N_MAX = 5, 20
+# "top 10%" is a segment or a threshold, not a count.
+_PERCENT = re.compile(r"\d+(?:[.,]\d+)?\s*%")
+_TYPE_WORDS = re.compile(r"\b(saham|equity|pasar uang|money market|pendapatan tetap|fixed income|campuran|balanced)\b", re.I)
+_TYPE_WORD_CODES = {"equity": "SH", "money market": "PU", "fixed income": "PT"}
+_COMPARE = re.compile(r"^\s*(?:please\s+)?(?:compare|bandingkan|head[- ]to[- ]head)?\s*:?\s*(.+?)\s+(?:vs\.?|versus|dengan|dan|and)\s+(.+?)\s*\??$", re.I)
+_PARTNER = re.compile(r"\b(bibit|bareksa|bank)\b", re.I)
+_PROMO = re.compile(r"\b(promo|promotion|sale|sales|diskon|discount|cashback|benefit|benefits|keuntungan)\b", re.I)
+# Only explicit comparison wording: "what is alpha?" is a question for the LLM.
+_PERFORMANCE = re.compile(
+    r"performance comparison|\btop\s+10\s*%.*\b(vs\.?|versus|against|dibanding)\s+(the\s+)?(rest|sisanya)\b", re.I)
+
+# Every word a template answers for. One word outside its template's vocabulary
+# means the question asks for something the template would drop.
+_WORDS = re.compile(r"\d+(?:[.,]\d+)?%?|[^\W\d_]+")
+_FILLER = {
+    "a", "an", "the", "me", "my", "i", "please", "show", "give", "list", "what", "which", "are", "is",
+    "fund", "funds", "mutual", "reksadana", "reksa", "dana", "now", "today", "currently", "right",
+    "tolong", "saya", "dong", "yang", "apa", "saja", "aja", "mana", "untuk", "sekarang", "ini",
+    "lihat", "tampilkan", "kasih", "berikan", "of", "in", "for", "category", "kategori", "jenis",
+}
+_TYPE_VOCAB = {"saham", "equity", "pasar", "uang", "money", "market", "pendapatan", "tetap",
+               "fixed", "income", "campuran", "balanced"}
+_TOP_VOCAB = _FILLER | _TYPE_VOCAB | {
+    "top", "best", "terbaik", "rekomendasi", "recommend", "recommendation", "recommendations",
+    "recommended", "rank", "ranking", "ranked", "peringkat"}
+_PARTNER_VOCAB = _FILLER | {
+    "bibit", "bareksa", "bank", "promo", "promos", "promotion", "promotions", "sale", "sales",
+    "diskon", "discount", "discounts", "cashback", "benefit", "benefits", "keuntungan",
+    "and", "dan", "or", "atau", "any", "there", "ada", "current", "ongoing", "info", "about",
+    "tentang", "from", "dari", "on", "at", "di", "via"}
+_PERFORMANCE_VOCAB = _FILLER | _TYPE_VOCAB | {
+    "performance", "comparison", "model", "top", "10%", "vs", "versus", "against", "dibanding",
+    "rest", "sisanya", "alpha", "kinerja"}
+
+
+def _within(text, vocab):
+    return all(w in vocab for w in _WORDS.findall(text.lower()))
+
+def _is_fund_name(name):
+    """True only for an exact (normalized) fund name: partial names go to the LLM."""
+    return normalize(name) in get_name_index(get_snapshot()).exact
+
+
+class Intent(NamedTuple):
+    name: str
+    args: dict
+
+
+def detect_intent(text) -> Optional[Intent]:
+    """Returns a structured intent, or None when the LLM should handle the message."""
+    text = (text or "").strip()
+    if not text or _FREE_FORM.search(text) or _PROFILE_TALK.search(text):
+        return None
+
+    if _PARTNER.search(text) and _PROMO.search(text):
+        if not _within(text, _PARTNER_VOCAB):
+            return None
+        partners = {m.lower() for m in _PARTNER.findall(text)}
+        return Intent("partner", {"partner_name": partners.pop() if len(partners) == 1 else "All"})
+
+    top = _TOP.search(text)
+    codes = {_TYPE_WORD_CODES.get(w.lower()) or resolve_fund_type(w) for w in _TYPE_WORDS.findall(text)}
+    if len(codes) > 1:
+        return None  # Several categories ("saham dan campuran"): one template cannot answer it.
+    if top and codes and not _PERCENT.search(text):
+        # The count is the only number a top-N template reads.
+        if not _within(text[:top.start()] + top.group(1) + text[top.end():], _TOP_VOCAB):
+            return None
+        n = int(top.group(2)) if top.group(2) else TOP_N_DEFAULT
+        return Intent("top_funds", {"fund_type": codes.pop(), "n": max(1, min(n, TOP_N_MAX))})
+
+    if _PERFORMANCE.search(text):
+        return Intent("performance_comparison", {}) if _within(text, _PERFORMANCE_VOCAB) else None
+
+    compare = _COMPARE.match(text)
+    if compare and re.search(r"\b(vs\.?|versus|compare|bandingkan|head[- ]to[- ]head)\b", text, re.I):
+        names = [compare.group(1)] + re.split(r"\s*,\s*|\s+(?:vs\.?|versus|dan|and)\s+", compare.group(2))
+        names = [n.strip(" ?.") for n in names if n.strip(" ?.")]
+        if len(names) >= 2 and all(_is_fund_name(n) for n in names):
+            return Intent("head_to_head", {"fund_names": ", ".join(names)})
+    return None
+
+
+# --- Templates ---
+def _pct(x):
+    return f"{x * 100:.1f}%"
+
+def _performance_lines(lang):
+    chart = get_visualization_data('performance_comparison')
+    rows = sorted(chart.get("data", {}).items(), key=lambda kv: -kv[1])
+    title = ("Kinerja model: 10% reksadana teratas vs sisanya (alpha)" if lang == "id"
+             else "Model performance: top 10% funds vs the rest (alpha)")
+    return [f"**{title}**"] + [f"- {TYPE_LABELS.get(t, t)}: {a:+.1%}" for t, a in rows]
+
+def _render_top(args, state, lang):
+    code = args["fund_type"]
+    profile = str(state.get('risk_profile', 'Unknown'))
+    allowed = PROFILE_TYPES.get(profile.strip().upper())
+    if not allowed:
+        return ("Sebelum memberi rekomendasi, pilih profil risiko Anda: Conservative, Moderate, Balanced, atau Aggressive."
+                if lang == "id" else
+                "Before I recommend funds, please choose your risk profile: Conservative, Moderate, Balanced, or Aggressive.")
+    if code not in allowed:
+        return (f"Berdasarkan profil {profile} Anda, saya tidak dapat merekomendasikan reksadana {TYPE_LABELS[code]}."
+                if lang == "id" else
+                f"Based on your {profile} profile, I cannot recommend {TYPE_LABELS[code]} funds.")
+
+    result = get_top_funds(code, args["n"])
+    if "error" in result:
+        return None
+    head = (f"**Top {len(result['data'])} Reksadana {TYPE_LABELS[code]}**" if lang == "id"
+            else f"**Top {len(result['data'])} {TYPE_LABELS[code]} Mutual Funds**")
+    lines = [head] + [f"{r['rank']}. {r['mfName']} — score {r['score']}" for r in result["data"]]
+    return "\n".join(lines + [""] + _performance_lines(lang))
+
+def _render_head_to_head(args, state, lang):
+    result = get_visualization_data('head_to_head', args["fund_names"])
+    requested = [n for n in args["fund_names"].split(",") if n.strip()]
+    if "error" in result or len(result["data"]) != len(requested):
+        return None  # Unresolved names: let the LLM ask for clarification.
+    lines = ["| Fund | Score | Return 6M | Value Added |", "|---|---|---|---|"]
+    lines += [f"| {r['name']} | {r['score']} | {_pct(r['return_6m'])} | {r['value_added']} |" for r in result["data"]]
+    title = "**Perbandingan Head-to-Head**" if lang == "id" else "**Head-to-Head Comparison**"
+    return "\n".join([title] + lines)
+
+def _render_partner(args, state, lang):
+    result = get_partner_info(args["partner_name"])
+    if "error" in result:
+        return None
+    partners = result.values() if "name" not in result else [result]
+    lines = []
+    for p in partners:
+        lines.append(f"**{p['name']}**\n- Promo: {p['promo']}\n- Benefits: {p['benefits']}\n- {p['link']}")
+    return "\n\n".join(lines)
+
+def _render_performance(args, state, lang):
+    return "\n".join(_performance_lines(lang))
+
+_RENDERERS = {
+    "top_funds": _render_top,
+    "head_to_head": _render_head_to_head,
+    "partner": _render_partner,
+    "performance_comparison": _render_performance,
+}
+
+
+def answer(text, state) -> Optional[str]:
+    """Templated reply for a structured message, or None to defer to the LLM."""
+    intent = detect_intent(text)
+    if intent is None:
+        FAST_PATH_STATS["llm"] += 1
+        return None
+    lang = "id" if _INDONESIAN.search(text) else "en"
+    reply = _RENDERERS[intent.name](intent.args, state, lang)
+    FAST_PATH_STATS[intent.name if reply else "llm"] += 1
+    return reply
+
+
+def fast_path_callback(callback_context, llm_request):
+    """
+    before_model_callback for the root agent. Only fires at the start of a turn
+    (last content is the user's text), so tool/sub-agent follow-ups always reach
+    the model.
+    """
+    if not FAST_PATH_ENABLED or not llm_request.contents:
+        return None
+    last = llm_request.contents[-1]
+    if last.role != "user" or not last.parts or any(p.function_response for p in last.parts):
+        return None
+    text = " ".join(p.text for p in last.parts if p.text)
+    reply = answer(text, callback_context.state)
+    if reply is None:
+        return None
+
+    from google.adk.models import LlmResponse
+    from google.genai import types
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=reply)]))
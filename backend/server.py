@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from . import startup, store, tools, tracing
+from .profiles import PROFILES
+from .encoding import payload_metrics
+from .cache import cache_metrics
+from .router import FAST_PATH_STATS
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+startup.record("imports", time.perf_counter() - startup.IMPORT_STARTED)
+
+APP_NAME = "indo_fund_advisor"
+
+# --- 1. CONCURRENCY SETTINGS ---
+# Chat turns are bounded globally and per session: a session runs one turn at
+# a time (extra turns wait up to SESSION_WAIT_SECONDS, then get a 'busy'
+# event), and a slow Gemini call only ever holds its own slot.
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", "32"))
+MAX_TURNS_PER_SESSION = int(os.getenv("MAX_TURNS_PER_SESSION", "1"))
+SESSION_WAIT_SECONDS = float(os.getenv("SESSION_WAIT_SECONDS", "10"))
+
+
+class SessionBusy(Exception):
+    pass
+
+
+class SessionLimiter:
+    """Per-session semaphores plus one global semaphore for agent turns."""
+
+    def __init__(self, per_session, global_limit):
+        self.per_session = per_session
+        self._global = asyncio.Semaphore(global_limit)
+        self._sessions = {}
+        self._waiters = {}
+
+    @asynccontextmanager
+    async def slot(self, session_key, timeout):
+        sem = self._sessions.setdefault(session_key, asyncio.Semaphore(self.per_session))
+        self._waiters[session_key] = self._waiters.get(session_key, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise SessionBusy("A turn is already running for this session.")
+            try:
+                async with self._global:
+                    yield
+            finally:
+                sem.release()
+        finally:
+            self._waiters[session_key] -= 1
+            if not self._waiters[session_key]:
+                # Nobody holds or waits for it: drop it so idle sessions cost nothing.
+                del self._waiters[session_key]
+                self._sessions.pop(session_key, None)
+
+    def active_sessions(self):
+        return len(self._sessions)
+
+
+# --- 2. APP ---
+_runtime = {}
+
+_runner_lock = threading.Lock()
+
+@asynccontextmanager
+async def lifespan(app):
+    _runtime["limiter"] = SessionLimiter(MAX_TURNS_PER_SESSION, MAX_CONCURRENT_TURNS)
+    # Snapshot, indexes and agents warm up in the background, off the event
+    # loop: /health answers at once, /ready once they are done (startup.py).
+    _runtime["warm_up"] = asyncio.create_task(run_in_threadpool(startup.warm_up, _runner))
+    yield
+    _runtime.clear()
+    await run_in_threadpool(PROFILES.flush)
+    await run_in_threadpool(tracing.flush)
+
+app = FastAPI(title="IndoFund Advisor API", lifespan=lifespan)
+
+
+def _runner():
+    """ADK runner + session service, created at warm-up or on the first chat request."""
+    with _runner_lock:
+        if "runner" not in _runtime:
+            from google.adk.runners import Runner
+            from google.adk.sessions import InMemorySessionService
+            from .agent import root_agent
+
+            sessions = InMemorySessionService()
+            _runtime["sessions"] = sessions
+            _runtime["runner"] = Runner(app_name=APP_NAME, agent=root_agent, session_service=sessions)
+        return _runtime["runner"], _runtime["sessions"]
+
+async def _call_tool(func, *args):
+    result = await run_in_threadpool(func, *args)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=404 if "not found" in result["error"] else 400, detail=result["error"])
+    return result
+
+
+@app.get("/health")
+async def health():
+    """Liveness: answers as soon as the process is up (data_version is null while loading)."""
+    snap = store.STORE.peek()
+    limiter = _runtime.get("limiter")
+    return {
+        "status": "ok",
+        "data_version": snap.version if snap else None,
+        "funds": len(snap.master) if snap else 0,
+        "active_sessions": limiter.active_sessions() if limiter else 0,
+    }
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once warm with valid data, else 503; includes the startup-time breakdown."""
+    report = startup.readiness(store.STORE.peek())
+    report.update(store.STORE.load_info)
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/metrics/cache")
+async def metrics_cache():
+    """Hit/miss counters of the search/analyst response cache."""
+    return await run_in_threadpool(cache_metrics)
+
+
+def _metric_families():
+    """Cache, fast-path and store gauges appended to the span metrics."""
+    cache = cache_metrics()
+    snap = store.STORE.peek()
+    limiter = _runtime.get("limiter")
+    profiles = PROFILES.metrics()
+    payloads = payload_metrics()
+    return [
+        ("advisor_response_cache_total", "counter", "Search/analyst response cache lookups.",
+         [({"namespace": ns, "result": r}, stats[r]) for ns, stats in cache["namespaces"].items()
+          for r in ("hits", "misses", "expired", "evictions")]),
+        ("advisor_response_cache_bytes", "gauge", "Bytes held by the response cache.",
+         [({}, cache["backend"]["bytes"])]),
+        ("advisor_fast_path_total", "counter", "Turns answered by the fast path, by intent ('llm' = deferred).",
+         [({"intent": k}, v) for k, v in FAST_PATH_STATS.items()]),
+        ("advisor_fund_store_funds", "gauge", "Funds in the current snapshot.",
+         [({"version": snap.version}, len(snap.master))] if snap else []),
+        ("advisor_startup_seconds", "gauge", "Time spent in each startup phase of this worker.",
+         [({"phase": k}, v) for k, v in startup.STARTUP["seconds"].items()]),
+        ("advisor_fund_store_reloads_total", "counter", "Snapshot reloads since start.",
+         [({}, store.STORE.reloads)]),
+        ("advisor_active_sessions", "gauge", "Sessions holding or waiting for a turn slot.",
+         [({}, limiter.active_sessions() if limiter else 0)]),
+        ("advisor_profile_store_total", "counter", "Profile store cache lookups and buffered writes.",
+         [({"result": r}, profiles.get(r, 0)) for r in ("hits", "misses", "writes", "flushes", "flush_errors")]),
+        ("advisor_profile_store_pending_writes", "gauge", "Profile fields buffered, not yet written.",
+         [({}, profiles["pending_writes"])]),
+        ("advisor_llm_payload_bytes_total", "counter", "Tool result bytes before (raw) and after (sent) compact encoding.",
+         [({"tool": t, "kind": k}, p[f"{k}_bytes"]) for t, p in payloads.items() for k in ("raw", "sent")]),
+        ("advisor_llm_payload_saved_tokens_total", "counter", "Estimated input tokens saved by compact encoding.",
+         [({"tool": t}, p["saved_tokens"]) for t, p in payloads.items()]),
+        ("advisor_llm_payload_truncated_total", "counter", "Tool results cut to their token budget.",
+         [({"tool": t}, p["truncated"]) for t, p in payloads.items()]),
+    ]
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: span latency histograms, errors, payload bytes, tokens, caches."""
+    text = tracing.render_prometheus(await run_in_threadpool(_metric_families))
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+# --- 3. TOOL ENDPOINTS (no LLM involved) ---
+@app.get("/tools/top-funds")
+async def top_funds(fund_type: str, n: int = Query(5, ge=1, le=100)):
+    return await _call_tool(tools.get_top_funds, fund_type, n)
+
+@app.get("/tools/search-funds")
+async def search_funds(
+    fund_types: str = "All",
+    n: int = Query(10, ge=1, le=500),
+    filters: str = "",
+    sort_by: str = "score_0_100 desc",
+):
+    return await _call_tool(tools.search_funds, fund_types, n, filters, sort_by)
+
+@app.get("/tools/fund-analysis")
+async def fund_analysis(fund_name: str):
+    return await _call_tool(tools.get_fund_analysis, fund_name)
+
+@app.get("/tools/recommendations")
+async def recommendations(
+    risk_profile: str,
+    fund_types: str = "All",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50),
+):
+    return await _call_tool(tools.get_profile_recommendations, risk_profile, fund_types, page, page_size)
+
+@app.get("/tools/similar-funds")
+async def similar_funds(
+    fund_name: str,
+    n: int = Query(5, ge=1, le=100),
+    fund_types: str = "All",
+    risk_profile: str = "",
+    safer: bool = False,
+):
+    return await _call_tool(tools.find_similar_funds, fund_name, n, fund_types, risk_profile, safer)
+
+@app.get("/tools/portfolio-score")
+async def portfolio_score(fund_names: str, weights: str = ""):
+    return await _call_tool(tools.score_portfolio, fund_names, weights)
+
+@app.get("/tools/visualization")
+async def visualization(viz_type: str, fund_names: str = "", as_of: str = ""):
+    return await _call_tool(tools.get_visualization_data, viz_type, fund_names, as_of)
+
+@app.get("/tools/partners")
+async def partners(partner_name: str = "All"):
+    return await _call_tool(tools.get_partner_info, partner_name)
+
+
+# --- 4. STREAMING CHAT ---
+class ChatRequest(BaseModel):
+    message: str
+    user_id: str = "anonymous"
+    session_id: Optional[str] = None
+
+
+def _event_payload(event):
+    parts = (event.content.parts if event.content and event.content.parts else [])
+    return {
+        "author": event.author,
+        "text": "".join(p.text for p in parts if getattr(p, "text", None)),
+        "tool_calls": [p.function_call.name for p in parts if getattr(p, "function_call", None)],
+        "final": event.is_final_response(),
+    }
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Runs one root_agent turn and streams its events as Server-Sent Events."""
+    from google.genai import types
+
+    runner, sessions = await run_in_threadpool(_runner)
+    session_id = req.session_id or uuid.uuid4().hex
+    session = await sessions.get_session(app_name=APP_NAME, user_id=req.user_id, session_id=session_id)
+    if session is None:
+        await sessions.create_session(app_name=APP_NAME, user_id=req.user_id, session_id=session_id)
+
+    limiter = _runtime["limiter"]
+    session_key = f"{req.user_id}:{session_id}"
+
+    async def stream():
+        yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+        try:
+            async with limiter.slot(session_key, SESSION_WAIT_SECONDS):
+                # One trace per turn: tool, sub-agent and model spans nest under it.
+                with tracing.span("chat.turn", kind="server", session_id=session_id, user_id=req.user_id,
+                                  **{"request.bytes": tracing.payload_size(req.message)}) as turn:
+                    message = types.Content(role="user", parts=[types.Part(text=req.message)])
+                    async for event in runner.run_async(user_id=req.user_id, session_id=session_id, new_message=message):
+                        turn.add("events", 1)
+                        yield f"data: {json.dumps(_event_payload(event), ensure_ascii=False)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except SessionBusy as e:
+            yield f"event: busy\ndata: {json.dumps({'error': str(e)})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    # python -m backend.server  (or: uvicorn backend.server:app --workers 4)
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")))
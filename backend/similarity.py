@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# --- Similar-fund index ---
+# Each fund is a point in feature space: value = z-score across the whole
+# universe x sqrt(|weight|), so squared Euclidean distance = sum of
+# weight x (z difference)^2 over the weights.csv features. Vectors are built by
+# the pipeline (data/fund_vectors.csv, same row order as funds_master_clean.csv);
+# the fund store recomputes them if the file is missing or stale.
+
+VECTORS_FILE = "fund_vectors.csv"
+VECTOR_PREFIX = "vec_"
+
+
+def compute_vectors(master, weights):
+    features = [f for f in weights if f in master.columns]
+    out = pd.DataFrame({"mfName": master["mfName"].to_numpy(), "MFType": master["MFType"].to_numpy()})
+    if master.empty:
+        return out
+    values = master[features].to_numpy(dtype=np.float64)
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0)
+    std[std == 0] = 1.0
+    z = np.nan_to_num((values - mean) / std)
+    scaled = z * np.sqrt(np.abs([weights[f] for f in features]))
+    for i, f in enumerate(features):
+        out[f"{VECTOR_PREFIX}{f}"] = scaled[:, i]
+    return out
+
+
+class SimilarityIndex:
+    """
+    Brute-force k-NN over a contiguous float32 matrix. One query is a
+    mat-vec plus an argpartition over the rows allowed by the type
+    constraint, well under a millisecond at 10k funds.
+    """
+
+    def __init__(self, vectors, master):
+        self.features = [c[len(VECTOR_PREFIX):] for c in vectors.columns if c.startswith(VECTOR_PREFIX)]
+        self.matrix = np.ascontiguousarray(vectors[[VECTOR_PREFIX + f for f in self.features]].to_numpy(dtype=np.float32))
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.types = master["MFType"].astype(str).str.upper().to_numpy()
+        self.vol = np.nan_to_num(master["vol_ret_36m"].to_numpy(dtype=np.float64), nan=np.inf)
+        self.crowding = np.nan_to_num(master["crowding_score"].to_numpy(dtype=np.float64), nan=np.inf)
+        self._subsets = {}
+
+    def _subset(self, types):
+        """Rows (and their matrix slice) for a set of types; cached per type combination."""
+        key = frozenset(types) if types else None
+        subset = self._subsets.get(key)
+        if subset is None:
+            rows = np.flatnonzero(np.isin(self.types, list(types))) if types else np.arange(len(self.types))
+            subset = (rows, np.ascontiguousarray(self.matrix[rows]), self.sq_norms[rows])
+            self._subsets[key] = subset
+        return subset
+
+    def query(self, pos, n=5, types=None, safer=False):
+        """
+        Nearest funds to the fund at row `pos`.
+        Args:
+            types: allowed type codes; None = all.
+            safer: only funds with lower vol_ret_36m and no higher (positive) crowding_score.
+        Returns: (row positions, distances), nearest first.
+        Raises ValueError for `safer` when the fund's own volatility is unknown.
+        """
+        rows, matrix, sq_norms = self._subset(types)
+        q = self.matrix[pos]
+        dist = sq_norms - 2.0 * (matrix @ q) + float(q @ q)
+        keep = rows != pos
+        if safer:
+            # Unknown volatility is stored as inf: nothing can be "safer" than it.
+            if not np.isfinite(self.vol[pos]):
+                raise ValueError("its volatility (vol_ret_36m) is unknown")
+            # Crowding only has to improve when the reference fund is crowded (> 0);
+            # unknown crowding counts as not crowded.
+            ceiling = self.crowding[pos] if np.isfinite(self.crowding[pos]) else 0.0
+            keep &= (self.vol[rows] < self.vol[pos]) & (self.crowding[rows] <= max(ceiling, 0.0))
+        candidates = np.flatnonzero(keep)
+        if n <= 0 or not len(candidates):
+            return rows[:0], dist[:0]
+        cand_dist = dist[candidates]
+        if n < len(candidates):
+            part = np.argpartition(cand_dist, n - 1)[:n]
+            order = part[np.argsort(cand_dist[part], kind="stable")]
+        else:
+            order = np.argsort(cand_dist, kind="stable")
+        picked = candidates[order]
+        return rows[picked], np.sqrt(np.maximum(dist[picked], 0.0))
+
+
+def _aligned(vectors, master):
+    return (
+        vectors is not None and len(vectors) == len(master) and len(master) > 0
+        and (vectors["mfName"].to_numpy() == master["mfName"].to_numpy()).all()
+    )
+
+def get_similarity_index(snapshot):
+    """Pipeline-built vectors when they match the master frame, else computed now (once per snapshot)."""
+    def build(snap):
+        vectors = snap.vectors
+        if not _aligned(vectors, snap.master):
+            vectors = compute_vectors(snap.master, snap.weights)
+        return SimilarityIndex(vectors, snap.master)
+    return snapshot.derived('similarity', build)
@@ -0,0 +1,101 @@
+import os
+import time
+from contextlib import contextmanager
+
+from .tracing import span
+
+# --- Warm startup ---
+# A worker starts in phases, each timed here so cold-start regressions show up
+# (STARTUP, GET /ready, advisor_startup_seconds in /metrics):
+#   imports   backend modules pulled in by the server (no google-adk, no data);
+#   snapshot  the indexes in data/snapshot.pkl plus the mapped columnar frames
+#             when it is valid, else every data file (sub-phases snapshot.read /
+#             .verify / .unpickle / .frames, or snapshot.build);
+#   indexes   name index, columns, analysis, similarity and profile views
+#             (only the cheap column views are left after a prebuilt snapshot);
+#   agents    google-adk import + agent build (STARTUP_WARM_AGENTS=0 leaves it
+#             to the first chat request).
+# The server runs them in the background once it is listening; /ready answers
+# 503 until they are done and the snapshot has no problems.
+
+WARM_AGENTS = os.getenv("STARTUP_WARM_AGENTS", "1") != "0"
+IMPORT_STARTED = time.perf_counter()  # The server imports this module before its other backend modules.
+
+STARTUP = {"seconds": {}, "state": {}, "errors": {}}
+
+
+@contextmanager
+def phase(name):
+    """Times one startup phase into STARTUP (and a 'startup' span)."""
+    started = time.perf_counter()
+    STARTUP["state"][name] = "running"
+    try:
+        with span(f"startup.{name}", kind="startup"):
+            yield
+    except Exception as e:
+        STARTUP["state"][name] = "failed"
+        STARTUP["errors"][name] = str(e)
+        raise
+    else:
+        STARTUP["state"][name] = "done"
+    finally:
+        STARTUP["seconds"][name] = round(time.perf_counter() - started, 4)
+
+def record(name, seconds):
+    STARTUP["seconds"][name] = round(seconds, 4)
+    STARTUP["state"][name] = "done"
+
+
+def warm_indexes(snap):
+    """Builds every per-snapshot index the tools use."""
+    from .analysis import get_analysis_table
+    from .name_index import get_name_index
+    from .query import get_columns
+    from .recommendations import get_profile_views
+    from .similarity import get_similarity_index
+
+    for build in (get_name_index, get_columns, get_analysis_table, get_similarity_index, get_profile_views):
+        build(snap)
+
+def warm_up(build_agents=None):
+    """Snapshot + indexes (+ agents through `build_agents`); run once per worker, off the event loop."""
+    from .store import get_snapshot
+
+    try:
+        with phase("snapshot"):
+            snap = get_snapshot()
+        with phase("indexes"):
+            warm_indexes(snap)
+        if build_agents is not None and WARM_AGENTS:
+            with phase("agents"):
+                build_agents()
+    except Exception as e:
+        print(f"❌ Startup failed: {e}")
+        return None
+    seconds = ", ".join(f"{k} {v:.2f}s" for k, v in STARTUP["seconds"].items() if "." not in k)
+    print(f"🚀 Warm ({seconds}).")
+    return snap
+
+
+def readiness(snap):
+    """{'ready': bool, ...}: every required phase done, no errors, a valid snapshot."""
+    required = ["snapshot", "indexes"] + (["agents"] if WARM_AGENTS else [])
+    waiting = [name for name in required if STARTUP["state"].get(name) != "done"]
+    problems = list(snap.problems) if snap is not None else []
+    return {
+        "ready": not waiting and not problems and not STARTUP["errors"],
+        "waiting": waiting,
+        "problems": problems,
+        "errors": dict(STARTUP["errors"]),
+        "data_version": snap.version if snap is not None else None,
+        "startup_seconds": dict(STARTUP["seconds"]),
+    }
+
+
+def build_prebuilt(data_dir):
+    """Builds data_dir's snapshot from its files, with every index, into data_dir/snapshot.pkl."""
+    from .store import build_snapshot, write_prebuilt
+
+    snap = build_snapshot(data_dir)
+    warm_indexes(snap)
+    return write_prebuilt(snap, data_dir)
@@ -0,0 +1,428 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from .analysis import ANALYSIS_FILE
+from .columnar import COLUMNAR_DIR, load_frame, meta_path
+from .history import OOS_COLUMN, HistoryStore, pick_oos_column
+from .recommendations import PROFILE_VIEWS_FILE
+from .similarity import VECTORS_FILE
+from .startup import phase, warm_indexes
+from .tracing import span
+
+# --- 1. SETUP PATHS ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+FUND_TYPES = ['sh', 'pt', 'pu', 'cp']
+MASTER_FILE = "funds_master_clean.csv"
+WEIGHTS_FILE = "weights.csv"
+OOS_FILE = "oos_reliability.csv"
+PREBUILT_FILE = "snapshot.pkl"
+PREBUILT_STARTUP = os.getenv("PREBUILT_STARTUP", "1") != "0"  # '0' = always build from the CSV files
+
+def fund_files():
+    return [MASTER_FILE, ANALYSIS_FILE, VECTORS_FILE, PROFILE_VIEWS_FILE] + [f"funds_{t}.csv" for t in FUND_TYPES]
+
+def tracked_files():
+    """Every file a snapshot is built from (relative to the data dir)."""
+    bundles = [meta_path(COLUMNAR_DIR, f[:-4]) for f in fund_files()]
+    return fund_files() + [WEIGHTS_FILE, OOS_FILE] + bundles
+
+
+# --- 2. IMMUTABLE SNAPSHOT ---
+@dataclass(frozen=True)
+class FundSnapshot:
+    """
+    One consistent, read-only view of the data directory.
+    Frames must be treated as read-only: they are shared by every reader.
+    """
+    version: str
+    signature: tuple
+    content_hash: str
+    loaded_at: float
+    master: pd.DataFrame
+    by_type: MappingProxyType
+    weights: MappingProxyType
+    oos: MappingProxyType
+    # Column of oos_reliability.csv behind `oos` (e.g. 'outofsample_oct24-oct25')
+    oos_window: str
+    # Precomputed feature attribution, row-aligned with `master` (see analysis.py)
+    analysis: pd.DataFrame
+    # Weighted, standardized feature vectors for the similar-fund index (see similarity.py)
+    vectors: pd.DataFrame
+    # Merged cross-type ranking per risk profile (see recommendations.py)
+    profile_views: pd.DataFrame
+    # Which reader produced each fund file: 'columnar' (mmap bundle) or 'csv'.
+    sources: MappingProxyType
+    # Why metadata or fund files are unusable (missing weights, no OOS window, ...); empty when valid.
+    problems: tuple = ()
+    # Per-snapshot derived structures (indexes etc.), built lazily on first use.
+    # FundStore builds them all before publishing a reloaded snapshot; each key
+    # has its own lock, so building one never blocks readers of the others.
+    _derived: dict = field(default_factory=dict, repr=False, compare=False)
+    _derived_locks: dict = field(default_factory=dict, repr=False, compare=False)
+    _derived_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def type_frame(self, code):
+        """Returns the ranked frame for a type code ('sh', 'pt', ...) or an empty frame."""
+        return self.by_type.get(code.lower(), pd.DataFrame())
+
+    def derived(self, key, builder):
+        """Memoizes `builder(self)` under `key` for the lifetime of this snapshot."""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                lock = self._derived_locks.setdefault(key, threading.Lock())
+            with lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = builder(self)
+                    self._derived[key] = value
+        return value
+
+
+def _read_csv(data_dir, filename):
+    path = os.path.join(data_dir, filename)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_csv(path)
+
+def _read_metadata(data_dir, problems):
+    """weights + OOS alpha; what could not be read is reported in `problems`, not left as silent {}."""
+    weights, oos, oos_window = {}, {}, None
+    try:
+        weights_df = _read_csv(data_dir, WEIGHTS_FILE)
+        if {'feature', 'weight'} <= set(weights_df.columns) and not weights_df.empty:
+            weights = dict(zip(weights_df['feature'], weights_df['weight']))
+        else:
+            problems.append(f"{WEIGHTS_FILE} is missing or has no feature weights")
+    except Exception as e:
+        problems.append(f"{WEIGHTS_FILE} could not be read: {e}")
+    try:
+        oos_df = _read_csv(data_dir, OOS_FILE)
+        oos_window = pick_oos_column(oos_df.columns)
+        if 'MFType' in oos_df.columns and oos_window:
+            oos = dict(zip(oos_df['MFType'], oos_df[oos_window]))
+        else:
+            problems.append(f"{OOS_FILE} is missing or has no {OOS_COLUMN or 'outofsample_*'} column")
+    except Exception as e:
+        problems.append(f"{OOS_FILE} could not be read: {e}")
+    return weights, oos, oos_window
+
+def _file_signature(data_dir):
+    sig = []
+    for name in tracked_files():
+        try:
+            st = os.stat(os.path.join(data_dir, name))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((name, None, None))
+    return tuple(sig)
+
+def _file_hashes(data_dir):
+    hashes = {}
+    for name in tracked_files():
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            hashes[name] = None
+            continue
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        hashes[name] = h.hexdigest()
+    return hashes
+
+def _content_hash(hashes):
+    return hashlib.sha1(repr(sorted(hashes.items())).encode()).hexdigest()
+
+def _read_fund_frames(data_dir, hashes):
+    """Fund files from the mmap'd columnar bundle when it mirrors the CSV, else the CSV."""
+    frames, sources = {}, {}
+    for name in fund_files():
+        frames[name], sources[name] = load_frame(
+            os.path.join(data_dir, COLUMNAR_DIR), name[:-4], os.path.join(data_dir, name), hashes.get(name)
+        )
+    return frames, sources
+
+def build_snapshot(data_dir=DATA_DIR, signature=None, hashes=None):
+    """Reads every tracked file once and returns a new immutable snapshot."""
+    with span("store.build_snapshot", kind="store", data_dir=data_dir) as s:
+        signature = signature or _file_signature(data_dir)
+        hashes = hashes or _file_hashes(data_dir)
+
+        problems = []
+        weights, oos, oos_window = _read_metadata(data_dir, problems)
+
+        frames, sources = _read_fund_frames(data_dir, hashes)
+        content_hash = _content_hash(hashes)
+        if frames[MASTER_FILE].empty:
+            problems.append(f"{MASTER_FILE} is missing or empty")
+        for problem in problems:
+            print(f"⚠️ Fund store problem: {problem}")
+        s.set("funds", len(frames[MASTER_FILE]))
+        s.set("problems", len(problems))
+        s.set("source", sources[MASTER_FILE])
+
+        return FundSnapshot(
+            version=content_hash[:12],
+            signature=signature,
+            content_hash=content_hash,
+            loaded_at=time.time(),
+            master=frames[MASTER_FILE],
+            analysis=frames[ANALYSIS_FILE],
+            vectors=frames[VECTORS_FILE],
+            profile_views=frames[PROFILE_VIEWS_FILE],
+            by_type=MappingProxyType({t: frames[f"funds_{t}.csv"] for t in FUND_TYPES}),
+            weights=MappingProxyType(weights),
+            oos=MappingProxyType(oos),
+            oos_window=oos_window or "",
+            sources=MappingProxyType(sources),
+            problems=tuple(problems),
+        )
+
+
+# --- 3. PREBUILT SNAPSHOT ---
+# One file holding a validated snapshot's metadata and derived indexes, written
+# by the pipeline (startup.build_prebuilt) so a worker starts without rebuilding
+# the indexes. The frames are NOT in it: they are still mapped from the columnar
+# bundles (columnar.py), so every worker keeps sharing their page-cache pages.
+# The pickled indexes are private to each worker, like indexes built at startup;
+# FundColumns is left out because it is views over the mapped frame.
+# Layout: a JSON header line, then the pickled payload. It is only used when
+# it was built from exactly the files on disk, the same OOS_COLUMN and the same
+# code: the pickled indexes are objects of the modules below, so any change to
+# them (or to pandas/numpy) invalidates the file.
+PREBUILT_FORMAT = 2
+PREBUILT_INDEXES = ("name_index", "analysis", "similarity", "profile_views")
+INDEX_MODULES = ["store.py", "columnar.py", "history.py", "analysis.py", "similarity.py",
+                 "recommendations.py", "name_index.py", "query.py"]
+_FRAME_FIELDS = ("master", "by_type", "analysis", "vectors", "profile_views", "sources")
+
+def code_fingerprint():
+    """Hash of the snapshot/index-building modules and the pandas/numpy versions."""
+    h = hashlib.sha1(f"{pd.__version__}/{np.__version__}".encode())
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in INDEX_MODULES:
+        with open(os.path.join(backend_dir, name), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def write_prebuilt(snap, data_dir=DATA_DIR):
+    """Writes `snap`'s metadata and the indexes it has built so far to data_dir/snapshot.pkl."""
+    if snap.problems:
+        raise ValueError(f"Snapshot {snap.version} is not valid: {'; '.join(snap.problems)}")
+    state = {f.name: getattr(snap, f.name) for f in fields(snap)
+             if not f.name.startswith('_') and f.name not in _FRAME_FIELDS}
+    for name in ('weights', 'oos'):
+        state[name] = dict(state[name])
+    derived = {k: v for k, v in snap._derived.items() if k in PREBUILT_INDEXES}
+    payload = pickle.dumps({"snapshot": state, "derived": derived}, protocol=pickle.HIGHEST_PROTOCOL)
+    header = {
+        "format": PREBUILT_FORMAT,
+        "version": snap.version,
+        "content_hash": snap.content_hash,
+        "signature": snap.signature,
+        "oos_column": OOS_COLUMN,
+        "code": code_fingerprint(),
+        # Per-file sha1s, so the columnar bundles are checked without hashing the CSVs again.
+        "hashes": _file_hashes(data_dir),
+        "funds": len(snap.master),
+        "indexes": sorted(derived),
+        "sha1": hashlib.sha1(payload).hexdigest(),
+        "built_at": time.time(),
+    }
+    path = os.path.join(data_dir, PREBUILT_FILE)
+    with open(path + ".tmp", 'wb') as f:
+        f.write(json.dumps(header).encode() + b"\n")
+        f.write(payload)
+    os.replace(path + ".tmp", path)
+    return header
+
+def _stale_reason(header, data_dir, signature):
+    """Why a prebuilt header does not match data_dir and this code, or None."""
+    if header.get("format") != PREBUILT_FORMAT:
+        return f"format {header.get('format')} (expected {PREBUILT_FORMAT})"
+    if header.get("oos_column") != OOS_COLUMN:
+        return f"built for OOS_COLUMN={header.get('oos_column')!r}"
+    if header.get("code") != code_fingerprint():
+        return "built by different code (index modules or pandas/numpy changed)"
+    if _content_hash(header.get("hashes", {})) != header.get("content_hash"):
+        return "built from other files than the snapshot it holds"
+    # Same mtimes and sizes as at build time: trust it; otherwise compare contents.
+    if tuple(map(tuple, header.get("signature", ()))) != signature:
+        if _content_hash(_file_hashes(data_dir)) != header.get("content_hash"):
+            return "stale (data files changed since it was built)"
+    return None
+
+def prebuilt_status(data_dir=DATA_DIR):
+    """None when data_dir/snapshot.pkl is current, else why it needs a rebuild (header only)."""
+    path = os.path.join(data_dir, PREBUILT_FILE)
+    if not os.path.exists(path):
+        return "not built"
+    with open(path, 'rb') as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return "unreadable header"
+    return _stale_reason(header, data_dir, _file_signature(data_dir))
+
+def load_prebuilt(data_dir=DATA_DIR, signature=None):
+    """(snapshot, None) from data_dir/snapshot.pkl, or (None, why it cannot be used)."""
+    path = os.path.join(data_dir, PREBUILT_FILE)
+    if not os.path.exists(path):
+        return None, "not built"
+    signature = signature or _file_signature(data_dir)
+    with phase("snapshot.read"):
+        with open(path, 'rb') as f:
+            blob = f.read()
+    with phase("snapshot.verify"):
+        head, _, payload = blob.partition(b"\n")
+        try:
+            header = json.loads(head)
+        except ValueError:
+            return None, "unreadable header"
+        stale = _stale_reason(header, data_dir, signature)
+        if stale:
+            return None, stale
+        if hashlib.sha1(payload).hexdigest() != header.get("sha1"):
+            return None, "corrupt (checksum mismatch)"
+    with phase("snapshot.unpickle"):
+        data = pickle.loads(payload)
+    with phase("snapshot.frames"):
+        frames, sources = _read_fund_frames(data_dir, header["hashes"])
+    state = data["snapshot"]
+    for name in ('weights', 'oos'):
+        state[name] = MappingProxyType(state[name])
+    state.update(signature=signature, loaded_at=time.time())
+    snap = FundSnapshot(
+        **state,
+        master=frames[MASTER_FILE],
+        analysis=frames[ANALYSIS_FILE],
+        vectors=frames[VECTORS_FILE],
+        profile_views=frames[PROFILE_VIEWS_FILE],
+        by_type=MappingProxyType({t: frames[f"funds_{t}.csv"] for t in FUND_TYPES}),
+        sources=MappingProxyType(sources),
+    )
+    snap._derived.update(data["derived"])
+    return snap, None
+
+
+# --- 4. HOT-RELOADING STORE ---
+class FundStore:
+    """
+    Thread-safe holder of the current FundSnapshot.
+
+    `get()` is cheap: it stats the data files at most once per `check_interval`
+    seconds. When they change, a background thread builds a new snapshot and
+    swaps it in with a single reference assignment, so readers keep using the
+    previous snapshot and are never blocked by a reload. Files touched within
+    the last `settle` seconds are left alone until the writer is done.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, check_interval=1.0, settle=0.5):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self.settle = settle
+        self._snapshot = None
+        self._last_check = 0.0
+        self._init_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.reloads = 0
+        # How the first snapshot was loaded: 'prebuilt' or 'files' (+ why the prebuilt file was skipped).
+        self.load_info = {}
+
+    def get(self) -> FundSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            with self._init_lock:
+                if self._snapshot is None:
+                    print(f"Loading fund store from: {self.data_dir}")
+                    self._snapshot = self._first_load()
+                    self._last_check = time.monotonic()
+                    print(f"✅ Fund store loaded (version {self._snapshot.version}, {self._snapshot.sources[MASTER_FILE]}).")
+                return self._snapshot
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._maybe_reload(snap)
+        return snap
+
+    def peek(self):
+        """Current snapshot, or None while the first load is running (never blocks)."""
+        return self._snapshot
+
+    def _first_load(self):
+        signature = _file_signature(self.data_dir)
+        snap, skipped = (None, "disabled") if not PREBUILT_STARTUP else load_prebuilt(self.data_dir, signature)
+        if snap is None:
+            if skipped not in ("not built", "disabled"):
+                print(f"⚠️ Prebuilt snapshot not used: {skipped}")
+            with phase("snapshot.build"):
+                snap = build_snapshot(self.data_dir, signature)
+        self.load_info = {"source": "files" if skipped else "prebuilt", "prebuilt_skipped": skipped}
+        return snap
+
+    def _maybe_reload(self, snap):
+        signature = _file_signature(self.data_dir)
+        if signature == snap.signature:
+            return
+        newest = max((mtime or 0) for _, mtime, _ in signature)
+        if time.time() - newest / 1e9 < self.settle:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return  # A reload is already running.
+        threading.Thread(target=self._reload, args=(snap, signature), daemon=True).start()
+
+    def _reload(self, snap, signature):
+        try:
+            hashes = _file_hashes(self.data_dir)
+            if _content_hash(hashes) == snap.content_hash:
+                # Touched but unchanged: keep the data, remember the new mtimes.
+                new = replace(snap, signature=signature)
+            else:
+                new = build_snapshot(self.data_dir, signature, hashes)
+                # Built before the swap, so no reader of the new snapshot waits for an index.
+                warm_indexes(new)
+                self.reloads += 1
+                print(f"🔄 Fund store reloaded (version {new.version}).")
+            self._snapshot = new
+        except Exception as e:
+            print(f"⚠️ Fund store reload failed, keeping version {snap.version}: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def reload(self) -> FundSnapshot:
+        """Synchronously rebuilds the snapshot (for scripts and tests)."""
+        with self._reload_lock:
+            new = build_snapshot(self.data_dir)
+            warm_indexes(new)
+            self._snapshot = new
+            self._last_check = time.monotonic()
+            return new
+
+
+STORE = FundStore()
+
+def get_snapshot() -> FundSnapshot:
+    return STORE.get()
+
+_HISTORY = {}
+
+def get_history():
+    """Snapshot history (history.py) of the current store's data dir."""
+    data_dir = STORE.data_dir
+    history = _HISTORY.get(data_dir)
+    if history is None:
+        history = _HISTORY.setdefault(data_dir, HistoryStore(data_dir))
+    return history.get()
@@ -1,35 +1,19 @@
 import pandas as pd
 import numpy as np
-import os
-
-# --- 1. SETUP PATHS ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-
-# --- 2. LOAD DATA HELPER ---
-def load_data(filename):
-    path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(path):
-        return pd.DataFrame()
-    return pd.read_csv(path)
-
-# Load Metadata
-try:
-    print(f"Loading metadata from: {DATA_DIR}")
-    WEIGHTS_DF = load_data("weights.csv")
-    WEIGHTS_DICT = dict(zip(WEIGHTS_DF['feature'], WEIGHTS_DF['weight'])) if not WEIGHTS_DF.empty else {}
-
-    OOS_DF = load_data("oos_reliability.csv")
-    if 'MFType' in OOS_DF.columns and 'outofsample_oct24-oct25' in OOS_DF.columns:
-        OOS_DICT = dict(zip(OOS_DF['MFType'], OOS_DF['outofsample_oct24-oct25']))
-    else:
-        OOS_DICT = {}
-
-    print("✅ Metadata loaded successfully.")
-except Exception as e:
-    print(f"⚠️ Metadata Error: {e}")
-    WEIGHTS_DICT = {}
-    OOS_DICT = {}
+from .store import get_history, get_snapshot
+from .name_index import get_name_index, unresolved
+from .analysis import get_analysis_table
+from .query import PROFILE_TYPES, get_columns, query_funds, resolve_fund_type, resolve_fund_types
+from .portfolio import parse_holdings, portfolio_report
+from .similarity import get_similarity_index
+from .recommendations import get_profile_views
+from .history import parse_date
+from .tracing import traced
+
+# --- 1. SHARED FUND STORE ---
+# Data + metadata are read once into an immutable snapshot and hot-reloaded
+# when the pipeline rewrites data/ (see store.py). Nothing is read at import:
+# the first call loads it, or the server warms it at startup (see startup.py).
 
 # --- HELPER: JSON-SAFE CONVERTER ---
 def to_native_type(val):
@@ -45,71 +29,190 @@ def smart_round(val):
         return float(f"{val:.2g}") if abs(val) < 0.1 else round(val, 2)
     return val
 
-# --- 3. DEFINE TOOLS ---
+# --- 2. DEFINE TOOLS ---
+# Every tool runs inside a span (timing, arguments, payload size; see tracing.py).
 
-def get_top_funds(fund_type: str) -> dict:
-    """Retrieves top 5 funds for a specific category using CLEAN split files."""
-    raw_input = str(fund_type).upper().strip()
-    target_code = None
-    
-    # Map input
-    if raw_input in ["SH", "SAHAM", "EQUITY"]: target_code = "sh"
-    elif raw_input in ["PU", "PASAR UANG", "MONEY"]: target_code = "pu"
-    elif raw_input in ["PT", "PENDAPATAN TETAP", "FIXED"]: target_code = "pt"
-    elif raw_input in ["CP", "CAMPURAN", "BALANCED"]: target_code = "cp"
-    
-    if not target_code:
-        if "SAHAM" in raw_input: target_code = "sh"
-        elif "PASAR UANG" in raw_input: target_code = "pu"
-        elif "PENDAPATAN" in raw_input: target_code = "pt"
-        elif "CAMPURAN" in raw_input: target_code = "cp"
-    
+@traced()
+def get_top_funds(fund_type: str, n: int = 5) -> dict:
+    """Retrieves the top N (default 5) funds for a specific category using CLEAN split files."""
+    target_code = resolve_fund_type(fund_type)
     if not target_code:
         return {"error": f"Invalid fund type '{fund_type}'."}
 
-    df = load_data(f"funds_{target_code}.csv")
-    if df.empty: return {"error": f"Database for {target_code.upper()} not found."}
-    
-    top = df.head(5)
+    snap = get_snapshot()
+    if snap.type_frame(target_code).empty: return {"error": f"Database for {target_code} not found."}
     
-    result = []
-    for _, row in top.iterrows():
-        result.append({
-            "mfName": row['mfName'],
-            "score": smart_round(row['score_0_100']),
-            "rank": int(row['rank'])
-        })
+    top = query_funds(snap, types=[target_code], n=n, sort="rank")
+    result = [{"mfName": r["mfName"], "score": r["score_0_100"], "rank": r["rank"]} for r in top["data"]]
     return {"status": "success", "data": result}
 
 
+@traced()
+def search_funds(fund_types: str = "All", n: int = 10, filters: str = "", sort_by: str = "score_0_100 desc") -> dict:
+    """
+    Screens funds across one or more categories in a single call.
+    Args:
+        fund_types: Comma-separated categories, e.g. 'PU, PT, CP' or 'All'.
+        n: How many funds to return.
+        filters: Feature conditions, e.g. 'vol_ret_36m<0.05, crowding_score<0, age_months>60'.
+        sort_by: Column plus optional 'desc', e.g. 'score_0_100 desc' or 'vol_ret_36m'.
+    """
+    codes, unknown = resolve_fund_types(fund_types)
+    if unknown:
+        return {"error": f"Invalid fund type(s): {', '.join(unknown)}."}
+
+    snap = get_snapshot()
+    if snap.master.empty: return {"error": "Master database not loaded."}
+    try:
+        result = query_funds(snap, types=codes, n=n, filters=filters, sort=sort_by)
+    except (KeyError, ValueError) as e:
+        return {"error": str(e).strip('"')}
+    return {"status": "success", "types": codes, "total_matches": result["total"], "data": result["data"]}
+
+
+@traced()
 def get_fund_analysis(fund_name: str) -> dict:
-    """Retrieves deep analysis."""
-    df = load_data("funds_master_clean.csv")
+    """Retrieves deep analysis: score, percentile in category, and the features driving it."""
+    snap = get_snapshot()
+    df = snap.master
     if df.empty: return {"error": "Master database not loaded."}
 
-    mask = df['mfName'].str.contains(fund_name, case=False, na=False)
-    matches = df[mask]
-    if matches.empty: return {"error": f"Fund '{fund_name}' not found."}
-    
-    row = matches.iloc[0]
+    candidates = get_name_index(snap).lookup(fund_name, limit=3)
+    if not candidates: return {"error": f"Fund '{fund_name}' not found."}
     
-    fund_features = {}
-    for feature, weight in WEIGHTS_DICT.items():
-        if feature in row:
-            fund_features[feature] = smart_round(row[feature])
-
+    pos = candidates[0].pos
+    row = df.iloc[pos]
     return {
         "fund_name": str(row['mfName']),
         "type": str(row['MFType']),
         "ai_score": smart_round(row.get('score_0_100', 0)),
-        "historical_alpha_top_vs_rest": smart_round(OOS_DICT.get(row['MFType'], 0)),
-        "analysis_data": {
-            "global_weights": WEIGHTS_DICT,
-            "fund_specifics": fund_features
-        }
+        "rank_in_type": int(row['rank']) if 'rank' in row else None,
+        "historical_alpha_top_vs_rest": smart_round(snap.oos.get(row['MFType'], 0)),
+        "crowding_score": smart_round(row.get('crowding_score', 0)),
+        "analysis_data": get_analysis_table(snap).payload(pos, smart_round),
+    }
+
+@traced()
+def score_portfolio(fund_names: str, weights: str = "") -> dict:
+    """
+    Scores a whole portfolio or watchlist in ONE call: score, rank in category and
+    top drivers per fund, plus the weighted portfolio score, crowding and volatility.
+    Args:
+        fund_names: Comma-separated fund names, e.g. 'Fund A, Fund B, Fund C'.
+        weights: Optional holding weights in the same order, e.g. '50, 30, 20'. Empty = equal weights.
+    """
+    try:
+        names, holding_weights = parse_holdings(fund_names, weights)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not names: return {"error": "fund_names required."}
+
+    snap = get_snapshot()
+    if snap.master.empty: return {"error": "Master database not loaded."}
+
+    report = portfolio_report(snap, names, holding_weights)
+    if not report["funds"]:
+        if report["ambiguous"]:
+            return {"error": "Fund names are ambiguous; ask which fund was meant.",
+                    "not_found": report["not_found"], "ambiguous": report["ambiguous"]}
+        return {"error": f"Funds not found: {', '.join(report['not_found'])}."}
+    return {"status": "success", **report}
+
+@traced()
+def find_similar_funds(fund_name: str, n: int = 5, fund_types: str = "All", risk_profile: str = "", safer: bool = False) -> dict:
+    """
+    Finds funds with the most similar feature profile ("funds like this one"),
+    e.g. alternatives when a fund is blocked by the risk profile or looks crowded.
+    Args:
+        fund_name: The reference fund.
+        n: How many alternatives to return.
+        fund_types: Allowed categories, comma-separated (e.g. 'PU, PT') or 'All'.
+        risk_profile: The user's risk profile; limits results to the categories it allows.
+        safer: Only funds with lower volatility than the reference fund (and less crowded, if it is crowded).
+    """
+    codes, unknown = resolve_fund_types(fund_types)
+    if unknown:
+        return {"error": f"Invalid fund type(s): {', '.join(unknown)}."}
+    if risk_profile and risk_profile.strip().upper() not in ("", "UNKNOWN"):
+        allowed = PROFILE_TYPES.get(risk_profile.strip().upper())
+        if not allowed:
+            return {"error": f"Invalid risk profile '{risk_profile}'."}
+        codes = [c for c in codes if c in allowed]
+        if not codes:
+            return {"error": f"None of the requested categories are allowed for a {risk_profile} profile."}
+
+    snap = get_snapshot()
+    if snap.master.empty: return {"error": "Master database not loaded."}
+    candidates = get_name_index(snap).lookup(fund_name, limit=1)
+    if not candidates: return {"error": f"Fund '{fund_name}' not found."}
+
+    pos = candidates[0].pos
+    try:
+        positions, distances = get_similarity_index(snap).query(pos, max(int(n), 0), types=codes, safer=safer)
+    except ValueError as e:
+        return {"error": f"Cannot find safer alternatives to '{candidates[0].name}': {e}."}
+    cols = get_columns(snap)
+    shown = ["score_0_100", "rank", "vol_ret_36m", "crowding_score"]
+    data = cols.records(positions, shown)
+    for row, d in zip(data, distances.tolist()):
+        row["distance"] = round(d, 3)
+    return {
+        "status": "success",
+        "fund": cols.records([pos], shown)[0],
+        "types": codes,
+        "safer": bool(safer),
+        "data": data,
+    }
+
+MAX_PAGE_SIZE = 50
+
+@traced()
+def get_profile_recommendations(risk_profile: str, fund_types: str = "All", page: int = 1, page_size: int = 10) -> dict:
+    """
+    Best funds for a risk profile in ONE call: a single ranking across every
+    category the profile allows (score within category, percentile, OOS alpha of
+    the category), paginated. Categories the profile does not allow are never returned.
+    Args:
+        risk_profile: 'Conservative', 'Moderate', 'Balanced' or 'Aggressive'.
+        fund_types: Optional narrower categories, comma-separated (e.g. 'PT, CP'); 'All' = everything allowed.
+        page: Page number, starting at 1.
+        page_size: Funds per page (max 50).
+    """
+    profile = str(risk_profile or "").strip().upper()
+    allowed = PROFILE_TYPES.get(profile)
+    if not allowed:
+        return {"error": f"Invalid risk profile '{risk_profile}'. Choose: Conservative, Moderate, Balanced, Aggressive."}
+    codes, unknown = resolve_fund_types(fund_types)
+    if unknown:
+        return {"error": f"Invalid fund type(s): {', '.join(unknown)}."}
+    page, page_size = int(page), int(page_size)
+    if page < 1 or page_size < 1:
+        return {"error": "page and page_size must be at least 1."}
+    page_size = min(page_size, MAX_PAGE_SIZE)
+
+    permitted = [c for c in codes if c in allowed]
+    excluded = [c for c in codes if c not in allowed]
+    explicit = str(fund_types or "").strip().upper() not in ("", "ALL")
+    if not permitted:
+        return {"status": "blocked", "risk_profile": profile.title(), "requested": codes, "allowed": allowed}
+
+    snap = get_snapshot()
+    if snap.master.empty: return {"error": "Master database not loaded."}
+    total, data = get_profile_views(snap).page(profile, permitted, page, page_size)
+    return {
+        "status": "success",
+        "risk_profile": profile.title(),
+        "types": permitted,
+        "excluded_types": excluded if explicit else [],
+        "oos_window": snap.oos_window,
+        "page": page,
+        "pages": -(-total // page_size),
+        "total": total,
+        "data": data,
     }
 
 # --- NEW TOOL: PARTNER INFO ---
+@traced()
 def get_partner_info(partner_name: str) -> dict:
     """
     Retrieves info about channel partners (sales, promos, benefits).
@@ -151,39 +254,60 @@ def get_partner_info(partner_name: str) -> dict:
     return {"error": f"Partner '{partner_name}' not found. Try 'Bibit', 'Bareksa', or 'Bank'."}
 
 # --- NEW TOOL: VISUALIZATION ---
-def get_visualization_data(viz_type: str, fund_names: str = None) -> dict:
+@traced()
+def get_visualization_data(viz_type: str, fund_names: str = "", as_of: str = "") -> dict:
     """
     Generates data for frontend visualization.
     Args:
-        viz_type: 'performance_comparison' (Top 10% vs Rest) or 'head_to_head'.
-        fund_names: Comma-separated list of funds for 'head_to_head'.
+        viz_type: 'performance_comparison' (Top 10% vs Rest), 'head_to_head',
+            'rank_history' (rank/score of funds over time), 'alpha_history' (Top 10% alpha over time)
+            or 'rank_movers' (biggest rank changes in the latest data update).
+        fund_names: Comma-separated list of funds for 'head_to_head' and 'rank_history'.
+        as_of: Optional date 'YYYY-MM-DD': use the data as it was on that date (history views and performance_comparison).
     """
+    if as_of:
+        try:
+            parse_date(as_of)
+        except ValueError:
+            return {"error": f"Invalid as_of date '{as_of}'. Use YYYY-MM-DD."}
+
     if viz_type == 'performance_comparison':
         # Returns the Alpha (OOS Reliability) stats
         # This shows how much better the Top 10% funds are compared to the Rest 90%
+        snap = get_snapshot()
+        alpha = dict(snap.oos) # {'SH': 0.24, ...}
+        if as_of:
+            past, _ = get_history().oos_history(snap.oos_window or None, until=as_of)
+            if past.empty: return {"error": f"No history recorded on or before {as_of}."}
+            past = past[past["snapshot_id"] == past["snapshot_id"].iloc[-1]]
+            alpha = dict(zip(past["MFType"], past["alpha"].astype(float)))
         return {
             "type": "bar_chart",
             "title": "Model Performance: Top 10% Funds vs Market Average (Alpha)",
             "x_axis": "Fund Type",
             "y_axis": "Excess Return (Alpha)",
-            "data": OOS_DICT # {'SH': 0.24, ...}
+            "window": snap.oos_window,
+            "data": alpha
         }
+
+    elif viz_type in ('rank_history', 'alpha_history', 'rank_movers'):
+        return _history_chart(viz_type, fund_names, as_of)
     
     elif viz_type == 'head_to_head':
         if not fund_names:
             return {"error": "fund_names required for head_to_head."}
         
-        df = load_data("funds_master_clean.csv")
+        snap = get_snapshot()
+        df = snap.master
         if df.empty: return {"error": "DB not loaded."}
         
-        names = [n.strip() for n in fund_names.split(',')]
-        # Find funds
+        names = [n.strip() for n in fund_names.split(',') if n.strip()]
+        # Find funds (one batch lookup against the snapshot's name index)
+        resolutions = get_name_index(snap).resolve(names)
         comparison_data = []
-        for name in names:
-            mask = df['mfName'].str.contains(name, case=False, na=False)
-            matches = df[mask]
-            if not matches.empty:
-                row = matches.iloc[0]
+        for r in resolutions:
+            if r.pos is not None:
+                row = df.iloc[r.pos]
                 comparison_data.append({
                     "name": row['mfName'],
                     "score": smart_round(row.get('score_0_100', 0)),
@@ -194,7 +318,68 @@ def get_visualization_data(viz_type: str, fund_names: str = None) -> dict:
         return {
             "type": "comparison_table",
             "title": "Head-to-Head Comparison",
-            "data": comparison_data
+            "data": comparison_data,
+            **unresolved(resolutions),
         }
 
-    return {"error": "Invalid viz_type."}
\ No newline at end of file
+    return {"error": "Invalid viz_type."}
+
+
+def _optional(val):
+    """Whole number, or None when missing (e.g. a fund's first snapshot has no previous rank)."""
+    return None if pd.isna(val) else int(val)
+
+def _history_chart(viz_type, fund_names, as_of):
+    """Time-series charts served from the history panel (no per-snapshot file reads)."""
+    history = get_history()
+    if not len(history):
+        return {"error": "No history recorded yet. Each pipeline run adds a snapshot."}
+
+    if viz_type == 'alpha_history':
+        rows, window = history.oos_history(get_snapshot().oos_window or None, until=as_of or None)
+        rows = rows.drop_duplicates(["date", "MFType"], keep="last")
+        series = [{"name": t, "points": [{"date": d, "alpha": smart_round(a)} for d, a in zip(g["date"], g["alpha"])]}
+                  for t, g in rows.groupby("MFType", sort=True)]
+        return {"type": "line_chart", "title": f"Top 10% vs Rest Alpha over time ({window})",
+                "x_axis": "Date", "y_axis": "Excess Return (Alpha)", "series": series}
+
+    if viz_type == 'rank_movers':
+        snap_row = history.snapshot_at(as_of or None)
+        if snap_row is None: return {"error": f"No history recorded on or before {as_of}."}
+        funds = history.funds_as_of(as_of or None).dropna(subset=["rank_change"])
+        up = funds[funds["rank_change"] > 0].sort_values("rank_change", ascending=False, kind="stable")
+        down = funds[funds["rank_change"] < 0].sort_values("rank_change", kind="stable")
+        fmt = lambda df: [{"name": r.mfName, "type": r.MFType, "rank": int(r.rank), "rank_change": int(r.rank_change),
+                           "score_change": smart_round(r.score_change)} for r in df.itertuples()]
+        return {"type": "bar_chart", "title": "Biggest Rank Changes", "date": snap_row["date"],
+                "x_axis": "Fund", "y_axis": "Rank change (+ = moved up)",
+                "up": fmt(up.head(10)), "down": fmt(down.head(10))}
+
+    # rank_history
+    if not fund_names:
+        return {"error": "fund_names required for rank_history."}
+    names = [n.strip() for n in fund_names.split(',') if n.strip()]
+    snap = get_snapshot()
+    series, not_found, ambiguous = [], [], {}
+    for r in get_name_index(snap).resolve(names):
+        if r.candidates:
+            ambiguous[r.query] = list(r.candidates)
+            continue
+        # Funds no longer in the current data are looked up in the history as typed.
+        canonical = str(snap.master['mfName'].iat[r.pos]) if r.pos is not None else r.query
+        rows = history.fund_history(canonical, until=as_of or None).drop_duplicates("date", keep="last")
+        if rows.empty:
+            not_found.append(r.query)
+            continue
+        ranks = rows["rank"].to_numpy()
+        # Change vs the previous point shown (several snapshots on one day collapse to the last).
+        changes = [_optional(rows["rank_change"].iat[0])] + (ranks[:-1] - ranks[1:]).tolist()
+        series.append({
+            "name": canonical,
+            "type": str(rows["MFType"].iat[-1]),
+            "points": [{"date": d, "rank": int(r), "score": smart_round(s), "rank_change": c}
+                       for d, r, s, c in zip(rows["date"], ranks, rows["score_0_100"], changes)],
+        })
+    return {"type": "line_chart", "title": "Rank History", "x_axis": "Date",
+            "y_axis": "Rank in category (1 = best)", "series": series, "not_found": not_found,
+            "ambiguous": ambiguous}
\ No newline at end of file
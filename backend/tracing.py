@@ -0,0 +1,363 @@
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- 1. SETTINGS ---
+# Spans are always aggregated into in-process metrics (see render_prometheus).
+# Finished traces are also exported as OTLP/JSON when a target is configured:
+#   TRACE_EXPORT_PATH    -> one ExportTraceServiceRequest JSON object per line
+#   TRACE_OTLP_ENDPOINT  -> POSTed to an OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "indo_fund_advisor")
+
+# Upper bounds in seconds, Prometheus histogram style.
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MAX_PENDING_TRACES = 1000
+ATTR_MAX_CHARS = 256
+
+_OTLP_KIND = {"internal": 1, "server": 2, "client": 3}  # tool/agent/llm spans are exported as INTERNAL/CLIENT
+
+
+# --- 2. SPANS ---
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, name, kind, parent=None, attributes=None, start_ns=None):
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration_s(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+_CURRENT = ContextVar("current_span", default=None)
+
+def current_span():
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """Opens a child of the current span (or a new trace) for the duration of the block."""
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+    s = Span(name, kind, _CURRENT.get(), attributes)
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        try:
+            _CURRENT.reset(token)
+        except ValueError:
+            pass  # Closed from another context (e.g. an SSE generator after a disconnect).
+        _finish(s)
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount):
+        pass
+
+_NOOP = _NoopSpan()
+
+
+def payload_size(value):
+    """UTF-8 size of a value as the LLM / HTTP client would receive it (JSON)."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode())
+
+def _short(value):
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= ATTR_MAX_CHARS else text[:ATTR_MAX_CHARS] + "…"
+
+def _record_result(s, result):
+    s.set("payload.bytes", payload_size(result))
+    if isinstance(result, dict) and "error" in result:
+        s.error = str(result["error"])
+
+
+def traced(kind="tool", name=None):
+    """
+    Decorator: runs each call of a tool function inside a span carrying its
+    arguments, result size and error (an {"error": ...} result counts as one).
+    The signature and docstring are kept, so ADK builds the same declaration.
+    """
+    def decorate(func):
+        span_name = name or func.__name__
+        params = list(inspect.signature(func).parameters)
+
+        def arg_attrs(args, kwargs):
+            named = dict(zip(params, args), **kwargs)
+            return {f"arg.{k}": _short(v) for k, v in named.items() if k != "tool_context"}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    return await func(*args, **kwargs)
+                with span(span_name, kind, **arg_attrs(args, kwargs)) as s:
+                    result = await func(*args, **kwargs)
+                    _record_result(s, result)
+                    return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    return func(*args, **kwargs)
+                with span(span_name, kind, **arg_attrs(args, kwargs)) as s:
+                    result = func(*args, **kwargs)
+                    _record_result(s, result)
+                    return result
+        return wrapper
+    return decorate
+
+
+# --- 3. LLM CALLS (ADK model callbacks) ---
+# before/after_model_callback pair: the model call becomes a span under the
+# current tool/agent span, with GenAI semantic-convention token attributes.
+_LLM_STARTED = OrderedDict()  # (invocation_id, agent) -> (start_ns, parent span, model)
+
+def llm_call_started(callback_context, llm_request):
+    if TRACING_ENABLED:
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        _LLM_STARTED[key] = (time.time_ns(), _CURRENT.get(), llm_request.model)
+        while len(_LLM_STARTED) > MAX_PENDING_TRACES:  # Calls that errored never reach the 'after' hook.
+            _LLM_STARTED.popitem(last=False)
+    return None
+
+def llm_call_finished(callback_context, llm_response):
+    started = _LLM_STARTED.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if started is None:
+        return None
+    start_ns, parent, model = started
+    s = Span(f"llm {callback_context.agent_name}", "llm", parent, {
+        "gen_ai.system": "gemini",
+        "gen_ai.request.model": str(model or ""),
+        "agent": callback_context.agent_name,
+    }, start_ns=start_ns)
+    usage = llm_response.usage_metadata
+    if usage is not None:
+        s.set("gen_ai.usage.input_tokens", usage.prompt_token_count or 0)
+        s.set("gen_ai.usage.output_tokens", usage.candidates_token_count or 0)
+    if llm_response.error_code:
+        s.error = f"{llm_response.error_code}: {llm_response.error_message}"
+    s.end_ns = time.time_ns()
+    _finish(s)
+    return None
+
+
+# --- 4. METRICS ---
+class SpanMetrics:
+    """Per (kind, name) counters and a latency histogram, in Prometheus terms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.payload_bytes = defaultdict(int)
+        self.cache = defaultdict(int)     # (kind, name, 'hit'|'miss')
+        self.tokens = defaultdict(int)    # (agent, 'input'|'output')
+
+    def observe(self, s):
+        key = (s.kind, s.name)
+        duration = s.duration_s
+        attrs = s.attributes
+        with self._lock:
+            self.count[key] += 1
+            self.seconds[key] += duration
+            bucket = self.buckets[key]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    bucket[i] += 1
+            if s.error:
+                self.errors[key] += 1
+            if "payload.bytes" in attrs:
+                self.payload_bytes[key] += attrs["payload.bytes"]
+            if "cache.hit" in attrs:
+                self.cache[key + ("hit" if attrs["cache.hit"] else "miss",)] += 1
+            if s.kind == "llm":
+                agent = attrs.get("agent", s.name)
+                self.tokens[(agent, "input")] += attrs.get("gen_ai.usage.input_tokens", 0)
+                self.tokens[(agent, "output")] += attrs.get("gen_ai.usage.output_tokens", 0)
+
+    def reset(self):
+        self.__init__()
+
+
+METRICS = SpanMetrics()
+RECENT_SPANS = deque(maxlen=500)
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                          for k, v in labels.items()) + "}"
+
+def render_prometheus(extra=()):
+    """
+    Prometheus text exposition of the span metrics.
+    `extra`: (name, type, help, [(labels_dict, value), ...]) families to append.
+    """
+    m = METRICS
+    with m._lock:
+        count, errors, seconds = dict(m.count), dict(m.errors), dict(m.seconds)
+        buckets = {k: list(v) for k, v in m.buckets.items()}
+        payload, cache, tokens = dict(m.payload_bytes), dict(m.cache), dict(m.tokens)
+
+    lines = [
+        "# HELP advisor_span_duration_seconds Span latency by kind (tool/agent/llm/...) and name.",
+        "# TYPE advisor_span_duration_seconds histogram",
+    ]
+    for (kind, name), n in sorted(count.items()):
+        for bound, c in zip(DURATION_BUCKETS, buckets[(kind, name)]):
+            lines.append(f"advisor_span_duration_seconds_bucket{_labels(kind=kind, name=name, le=bound)} {c}")
+        lines.append(f"advisor_span_duration_seconds_bucket{_labels(kind=kind, name=name, le='+Inf')} {n}")
+        lines.append(f"advisor_span_duration_seconds_sum{_labels(kind=kind, name=name)} {seconds[(kind, name)]:.6f}")
+        lines.append(f"advisor_span_duration_seconds_count{_labels(kind=kind, name=name)} {n}")
+
+    families = [
+        ("advisor_span_errors_total", "counter", "Spans that raised or returned an error.",
+         [(dict(kind=k, name=n), v) for (k, n), v in errors.items()]),
+        ("advisor_span_payload_bytes_total", "counter", "JSON bytes returned by tools / sub-agents.",
+         [(dict(kind=k, name=n), v) for (k, n), v in payload.items()]),
+        ("advisor_span_cache_total", "counter", "Cache lookups made inside spans.",
+         [(dict(kind=k, name=n, result=r), v) for (k, n, r), v in cache.items()]),
+        ("advisor_llm_tokens_total", "counter", "Gemini tokens by agent and direction.",
+         [(dict(agent=a, direction=d), v) for (a, d), v in tokens.items()]),
+    ]
+    for name, kind, help_text, samples in families + list(extra):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines += [f"{name}{_labels(**labels) if labels else ''} {value}" for labels, value in sorted(
+            samples, key=lambda s: sorted(s[0].items()))]
+    return "\n".join(lines) + "\n"
+
+
+# --- 5. OTLP/JSON EXPORT ---
+_PENDING = OrderedDict()  # trace_id -> finished spans, exported when the root span ends
+_PENDING_LOCK = threading.Lock()
+_EXPORT_QUEUE = queue.Queue(maxsize=10000)
+_exporter_thread = None
+
+
+def _finish(s):
+    METRICS.observe(s)
+    RECENT_SPANS.append(s)
+    if not (TRACE_EXPORT_PATH or TRACE_OTLP_ENDPOINT):
+        return
+    with _PENDING_LOCK:
+        spans = _PENDING.setdefault(s.trace_id, [])
+        spans.append(s)
+        if s.parent_id is not None and len(_PENDING) <= MAX_PENDING_TRACES:
+            return
+        batch = _PENDING.pop(s.trace_id) if s.parent_id is None else _PENDING.popitem(last=False)[1]
+    _enqueue(batch)
+
+
+def _enqueue(batch):
+    global _exporter_thread
+    if _exporter_thread is None:
+        with _PENDING_LOCK:
+            if _exporter_thread is None:
+                _exporter_thread = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+                _exporter_thread.start()
+    try:
+        _EXPORT_QUEUE.put_nowait(batch)
+    except queue.Full:
+        pass  # Never block a request on telemetry.
+
+
+def _attr_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp(spans):
+    """OTLP/JSON ExportTraceServiceRequest for a list of finished spans."""
+    out = []
+    for s in spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": _OTLP_KIND["client" if s.kind == "llm" else "internal"],
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": "span.kind", "value": {"stringValue": s.kind}}]
+                          + [{"key": k, "value": _attr_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        out.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": out}],
+    }]}
+
+
+def _export_loop():
+    while True:
+        batch = _EXPORT_QUEUE.get()
+        body = json.dumps(to_otlp(batch), ensure_ascii=False)
+        try:
+            if TRACE_EXPORT_PATH:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_EXPORT_PATH)), exist_ok=True)
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            if TRACE_OTLP_ENDPOINT:
+                req = urllib.request.Request(TRACE_OTLP_ENDPOINT, data=body.encode(), method="POST",
+                                             headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(req, timeout=5).close()
+        except Exception as e:
+            print(f"⚠️ Trace export failed: {e}")
+        finally:
+            _EXPORT_QUEUE.task_done()
+
+
+def flush(timeout=5.0):
+    """Waits (up to `timeout`) for queued traces to be written; used at shutdown and in scripts."""
+    deadline = time.monotonic() + timeout
+    while _EXPORT_QUEUE.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any
+
+from google.adk.models import BaseLlm, LlmResponse
+from google.genai import types
+
+# --- Local stand-in for Gemini ---
+# Replays a fixed script per agent: each step is either a tool call
+# {"call": name, "args": {...}} or a final {"text": "..."}. The step index is
+# the number of model turns already taken since the last user message, so the
+# same script works for every turn of a conversation.
+
+
+class ScriptedLlm(BaseLlm):
+    model: str = "gemini-scripted"  # 'gemini' prefix keeps built-in tools (google_search) accepted
+    script: list = []
+    latency_ms: float = 0.0
+    calls: int = 0
+
+    def _step(self, llm_request):
+        contents = llm_request.contents or []
+        start = 0
+        for i, content in enumerate(contents):
+            if content.role == "user" and any(p.text for p in content.parts or []):
+                start = i
+        done = sum(1 for c in contents[start:] if c.role == "model")
+        return self.script[min(done, len(self.script) - 1)]
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.calls += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        step = self._step(llm_request)
+        if "call" in step:
+            part = types.Part(function_call=types.FunctionCall(name=step["call"], args=step.get("args", {})))
+        else:
+            part = types.Part(text=step["text"])
+        # Rough token counts (~4 chars per token) so tracing sees realistic usage.
+        prompt_chars = sum(len(p.text or "") for c in llm_request.contents or [] for p in c.parts or [])
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_chars // 4, candidates_token_count=len(str(step)) // 4)
+        yield LlmResponse(content=types.Content(role="model", parts=[part]), usage_metadata=usage)
+
+
+def install(agents: dict[str, Any], scripts: dict[str, list], latency_ms=0.0):
+    """Swaps each agent's model for a ScriptedLlm. Returns the originals for restore()."""
+    originals = {}
+    for name, agent in agents.items():
+        originals[name] = agent.model
+        agent.model = ScriptedLlm(script=scripts.get(name, [{"text": f"{name} done."}]), latency_ms=latency_ms)
+    return originals
+
+def restore(agents, originals):
+    for name, model in originals.items():
+        agents[name].model = model
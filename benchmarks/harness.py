@@ -0,0 +1,96 @@
+import asyncio
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+# --- Timing + memory measurement ---
+
+def summarize(samples_ms):
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "max_ms": round(float(arr.max()), 4),
+    }
+
+def _peak_kb(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def measure(fn, repeat=200, warmup=5, memory=True):
+    """Times `fn()` `repeat` times; peak traced allocation is taken from one extra run."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    result = summarize(samples)
+    if memory:
+        result["peak_alloc_kb"] = _peak_kb(fn)
+    return result
+
+def measure_async(make_coro, repeat=50, warmup=2, memory=True):
+    """Like measure() for coroutines; each run gets a fresh coroutine on one event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return measure(lambda: loop.run_until_complete(make_coro()), repeat, warmup, memory)
+    finally:
+        loop.close()
+
+
+# --- Baselines ---
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def compare(baseline, current, metric="p50_ms", threshold=0.10):
+    """Rows of (case, base, now, delta%, flag) for cases present in both runs."""
+    rows = []
+    for case in sorted(set(baseline) & set(current)):
+        base, now = baseline[case].get(metric), current[case].get(metric)
+        if not base or now is None:
+            continue
+        delta = (now - base) / base
+        flag = "REGRESSION" if delta > threshold else ("faster" if delta < -threshold else "")
+        rows.append((case, base, now, round(delta * 100, 1), flag))
+    return rows
+
+def print_results(results):
+    print(f"{'case':58} {'p50':>10} {'p95':>10} {'p99':>10} {'peak KB':>10}")
+    for case, r in sorted(results.items()):
+        print(f"{case:58} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r.get('peak_alloc_kb', 0):>10.1f}")
+
+def print_comparison(rows, metric="p50_ms"):
+    print(f"\n{'case':58} {'base':>10} {'now':>10} {'delta%':>8}  ({metric})")
+    for case, base, now, delta, flag in rows:
+        print(f"{case:58} {base:>10.3f} {now:>10.3f} {delta:>8.1f}  {flag}")
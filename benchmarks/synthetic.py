@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Synthetic fund universes ---
+# Same file layout and column set as raw_data/, with feature distributions
+# loosely matched to the shipped data, so pipeline + tools can be benchmarked
+# at 10k-1M funds.
+
+TYPES = ["sh", "pt", "pu", "cp"]
+TYPE_SHARE = [0.27, 0.38, 0.20, 0.15]
+FEATURES = {
+    # name: (mean, std)
+    "age_months": (140, 70),
+    "cost_of_uniqueness": (2.0, 1.0),
+    "crowding_score": (0.0, 0.05),
+    "flow_vol_ann_36m_std": (0.02, 0.015),
+    "flows_ann_36m_avg": (0.0, 0.01),
+    "ret_3m": (0.05, 0.08),
+    "ret_6m": (0.10, 0.15),
+    "value_added": (5.0, 20.0),
+    "vol_ret_36m": (0.03, 0.02),
+}
+WORDS = ["Dana", "Syariah", "Kelas", "Saham", "Pasar", "Uang", "Obligasi", "Prima", "Plus",
+         "Maxima", "Ekuitas", "Berimbang", "Likuid", "Kas", "Bond", "Income", "Growth", "Fund"]
+MANAGERS = ["Bahana", "Mandiri", "BNIAM", "Sucorinvest", "Schroder", "Manulife", "Principal",
+            "Insight", "Trimegah", "Panin", "Batavia", "Eastspring", "Simas", "Danareksa"]
+
+
+def fund_names(n, rng):
+    managers = rng.choice(MANAGERS, n)
+    w1, w2 = rng.choice(WORDS, n), rng.choice(WORDS, n)
+    return [f"{m} {a} {b} {i}" for i, (m, a, b) in enumerate(zip(managers, w1, w2))]
+
+def make_universe(n, seed=0):
+    """A master-like frame with n funds across the four types (scores not yet normalized)."""
+    rng = np.random.default_rng(seed)
+    types = rng.choice([t.upper() for t in TYPES], n, p=TYPE_SHARE)
+    df = pd.DataFrame({"mfName": fund_names(n, rng), "MFType": types})
+    df["score_raw"] = rng.normal(0, 0.5, n)
+    for name, (mean, std) in FEATURES.items():
+        vals = rng.normal(mean, std, n)
+        df[name] = np.maximum(vals, 1).round().astype(int) if name == "age_months" else vals
+    return df
+
+def write_raw(df, raw_dir, weights_path="raw_data/feature_weights.csv", oos_path="raw_data/fund-scoring-by-type_cv_oos_review.csv"):
+    """Writes the universe in raw_data/ layout (scoring + features file per type, plus metadata)."""
+    os.makedirs(raw_dir, exist_ok=True)
+    for t in TYPES:
+        part = df[df["MFType"] == t.upper()]
+        part[["mfName", "MFType", "score_raw"]].to_csv(os.path.join(raw_dir, f"fund-scoring-by-type_cv_{t}.csv"), index=False)
+        part[["mfName", "MFType"] + list(FEATURES)].to_csv(
+            os.path.join(raw_dir, f"fund-scoring-by-type_cv_features_{t}.csv"), index=False)
+    pd.read_csv(weights_path).to_csv(os.path.join(raw_dir, "feature_weights.csv"), index=False)
+    pd.read_csv(oos_path).to_csv(os.path.join(raw_dir, "fund-scoring-by-type_cv_oos_review.csv"), index=False)
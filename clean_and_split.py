@@ -1,18 +1,19 @@
 import pandas as pd
-import numpy as np
 import os
+from pipeline import normalize_scores, rank_funds, write_outputs
 
-def clean_and_split():
-    # Setup paths
-    input_file = "C:/Users/USER/Documents/GetU.Grow/venv/grow_agent/data/funds_master.csv" # The file you just uploaded
-    output_dir = "data"
+def clean_and_split(input_file="data/funds_master.csv", output_dir="data"):
+    """
+    Re-derives the ranked split files from an existing funds_master.csv.
+    `python pipeline.py` already does this as part of a normal run.
+    """
     os.makedirs(output_dir, exist_ok=True)
     
     print(f"📂 Loading {input_file}...")
     try:
         df = pd.read_csv(input_file)
     except FileNotFoundError:
-        print("❌ Error: funds_master.csv not found. Please upload it to the root folder.")
+        print("❌ Error: funds_master.csv not found. Run `python pipeline.py` first.")
         return
 
     # 1. Clean up columns: Drop the broken score columns
@@ -33,25 +34,12 @@ def clean_and_split():
             print(f"⚠️ No funds found for {f_type}, skipping.")
             continue
             
-        # Recalculate Score 0-100 strictly for this group
-        min_s = type_df['score_raw'].min()
-        max_s = type_df['score_raw'].max()
-        
-        if max_s > min_s:
-            type_df['score_0_100'] = ((type_df['score_raw'] - min_s) / (max_s - min_s)) * 100
-        else:
-            type_df['score_0_100'] = 100.0 # Single fund case
-            
-        # Round for display
-        type_df['score_0_100'] = type_df['score_0_100'].round(1)
-        
-        # Add Rank
-        type_df = type_df.sort_values(by='score_0_100', ascending=False)
-        type_df['rank'] = range(1, len(type_df) + 1)
+        # Recalculate Score 0-100 strictly for this group, then rank
+        type_df = rank_funds(normalize_scores(type_df))
 
         # Save individual file
         output_path = os.path.join(output_dir, f"funds_{f_type.lower()}.csv")
-        type_df.to_csv(output_path, index=False)
+        write_outputs(type_df, output_dir, f"funds_{f_type.lower()}.csv")
         print(f"✅ Saved {f_type} ranking to: {output_path} ({len(type_df)} funds)")
         
         clean_dfs.append(type_df)
@@ -62,7 +50,7 @@ def clean_and_split():
         # For the overall master, we might want an 'overall_rank' or just keep type ranks.
         # Let's keep it simple for now.
         master_path = os.path.join(output_dir, "funds_master_clean.csv")
-        master_clean.to_csv(master_path, index=False)
+        write_outputs(master_clean, output_dir, "funds_master_clean.csv")
         print(f"🎉 Saved Master DB to: {master_path} ({len(master_clean)} funds)")
     else:
         print("❌ No data to save.")
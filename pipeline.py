@@ -0,0 +1,371 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from backend.analysis import ANALYSIS_FILE, compute_analysis
+from backend.similarity import VECTORS_FILE, compute_vectors
+from backend.columnar import COLUMNAR_DIR, sha1_file, write_bundle
+from backend.history import check_as_of, pick_oos_column, record_snapshot
+from backend.recommendations import PROFILE_VIEWS_FILE, compute_profile_views
+from backend.startup import build_prebuilt
+from backend.store import PREBUILT_FILE, prebuilt_status
+from stream_ingest import (CHUNK_ROWS, concat_csvs, load_dtypes, save_dtypes, stream_analysis, stream_profile_views,
+                           stream_type, stream_vectors)
+
+RAW_DIR = "raw_data"
+OUTPUT_DIR = "data"
+MANIFEST_FILE = ".pipeline_manifest.json"
+CACHE_DIR = ".cache"
+
+# Known types keep their historical order in the master file; any other type
+# found in raw_data is appended alphabetically.
+DEFAULT_TYPE_ORDER = ['sh', 'pt', 'pu', 'cp']
+SCORE_PATTERN = re.compile(r"^fund-scoring-by-type_cv_([a-z0-9]+)\.csv$")
+
+
+# --- 1. HELPERS ---
+def file_hash(path):
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def write_csv_atomic(df, path):
+    """Writes next to the target and renames, so readers never see half a file."""
+    tmp = f"{path}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def write_outputs(df, output_dir, filename):
+    """CSV for humans/compat + a memory-mapped columnar bundle for the backend."""
+    path = os.path.join(output_dir, filename)
+    write_csv_atomic(df, path)
+    write_bundle(df, os.path.join(output_dir, COLUMNAR_DIR), filename[:-4], source_sha1=sha1_file(path))
+
+def score_path(raw_dir, f_type):
+    return os.path.join(raw_dir, f"fund-scoring-by-type_cv_{f_type}.csv")
+
+def features_path(raw_dir, f_type):
+    return os.path.join(raw_dir, f"fund-scoring-by-type_cv_features_{f_type}.csv")
+
+def discover_types(raw_dir):
+    found = []
+    for name in os.listdir(raw_dir) if os.path.isdir(raw_dir) else []:
+        m = SCORE_PATTERN.match(name)
+        if m:
+            found.append(m.group(1))
+    known = [t for t in DEFAULT_TYPE_ORDER if t in found]
+    return known + sorted(t for t in found if t not in DEFAULT_TYPE_ORDER)
+
+def find_metadata_file(raw_dir, pattern, required_column):
+    """First CSV matching `pattern` that really is a CSV with `required_column`."""
+    for path in sorted(glob.glob(os.path.join(raw_dir, pattern))):
+        try:
+            df = pd.read_csv(path)
+        except Exception:
+            continue  # e.g. an .xlsx saved with a .csv extension
+        if required_column in df.columns:
+            return path, df
+    return None, None
+
+
+# --- 2. PER-TYPE TRANSFORM ---
+def normalize_scores(df):
+    """Score 0-100 strictly from 'score_raw', relative to THIS TYPE only."""
+    min_s = df['score_raw'].min()
+    max_s = df['score_raw'].max()
+    if max_s > min_s:
+        df['score_0_100'] = ((df['score_raw'] - min_s) / (max_s - min_s)) * 100
+    else:
+        df['score_0_100'] = 100.0 # Single fund case
+    df['score_0_100'] = df['score_0_100'].round(1)
+    return df
+
+def rank_funds(df):
+    df = df.sort_values(by='score_0_100', ascending=False, kind='stable')
+    df['rank'] = range(1, len(df) + 1)
+    return df
+
+def process_type(f_type, score_file, feat_file):
+    """
+    Normalize + merge + rank one fund type.
+    Returns (merged frame in scoring-file order, ranked frame).
+    """
+    # A. Scoring file is the source of truth for rank
+    df_score = pd.read_csv(score_file)
+    df_score.columns = df_score.columns.str.strip()
+    df_score = df_score.drop(columns=[c for c in df_score.columns if 'score_0_100' in c])
+
+    # B. Features file only adds "Why" context (left join)
+    if feat_file and os.path.exists(feat_file):
+        df_feat = pd.read_csv(feat_file)
+        df_feat.columns = df_feat.columns.str.strip()
+        # We TRUST the scoring file: drop any score columns carried by features.
+        df_feat = df_feat.drop(columns=[c for c in df_feat.columns if c == 'score_raw' or 'score_0_100' in c])
+        merge_keys = ['mfName'] + (['MFType'] if 'MFType' in df_feat.columns else [])
+        # One feature row per fund (the first, as stream_ingest.FeatureIndex does):
+        # a left join on a duplicated key would list the fund twice.
+        dupes = df_feat.duplicated(merge_keys)
+        if dupes.any():
+            print(f"   ⚠️ {os.path.basename(feat_file)}: {int(dupes.sum())} duplicate feature row(s) ignored (first kept).")
+            df_feat = df_feat[~dupes]
+        merged = pd.merge(df_score, df_feat, on=merge_keys, how='left')
+    else:
+        merged = df_score
+
+    merged = normalize_scores(merged)
+    return merged, rank_funds(merged.copy())
+
+def _stream_type_job(args):
+    f_type, score_file, feat_file, cache_file, chunksize = args
+    base = cache_file[:-len(".dtypes.json")]
+    if os.path.exists(cache_file):
+        os.remove(cache_file)  # The CSVs are about to be rewritten.
+    try:
+        count, dtypes = stream_type(score_file, feat_file, f"{base}.merged.csv", f"{base}.ranked.csv", chunksize)
+    except Exception as e:
+        return f_type, None, str(e)
+    save_dtypes(dtypes, cache_file)  # Written last: marks the type's CSVs as complete.
+    return f_type, count, None
+
+def cache_file_for(cache_dir, f_type, stream):
+    """Per-type result of the last run: a pickle, or (stream mode) a dtypes file next to two CSVs."""
+    return os.path.join(cache_dir, f"{f_type}.dtypes.json" if stream else f"{f_type}.pkl")
+
+def _process_type_job(args):
+    f_type, score_file, feat_file, cache_file = args
+    if os.path.exists(cache_file):
+        os.remove(cache_file)  # A failed type must not fall back to the last run's result.
+    try:
+        merged, ranked = process_type(f_type, score_file, feat_file)
+    except Exception as e:
+        return f_type, None, str(e)
+    with open(cache_file, 'wb') as f:
+        pickle.dump((merged, ranked), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return f_type, len(ranked), None
+
+
+def write_fund_files_streamed(fund_types, cache_dir, output_dir, rewrite, chunksize):
+    """
+    Stream mode: per-type CSVs -> split files and master files, chunk by chunk.
+    The split/master bundles are not written (the store reads the CSVs).
+    Returns the path of funds_master_clean.csv.
+    """
+    merged_parts, ranked_parts = [], []
+    for f_type in fund_types:
+        base = os.path.join(cache_dir, f_type)
+        dtypes = load_dtypes(f"{base}.dtypes.json")
+        merged_parts.append((f"{base}.merged.csv", {c: t for c, t in dtypes.items() if c != 'rank'}))
+        ranked_parts.append((f"{base}.ranked.csv", dtypes))
+        if rewrite(f_type):
+            out = os.path.join(output_dir, f"funds_{f_type}.csv")
+            shutil.copyfile(f"{base}.ranked.csv", f"{out}.tmp")
+            os.replace(f"{out}.tmp", out)
+    concat_csvs(merged_parts, os.path.join(output_dir, "funds_master.csv"), chunksize)
+    clean_path = os.path.join(output_dir, "funds_master_clean.csv")
+    concat_csvs(ranked_parts, clean_path, chunksize)
+    return clean_path
+
+
+# --- 3. PIPELINE ---
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"types": {}, "metadata": {}}
+
+def run_pipeline(raw_dir=RAW_DIR, output_dir=OUTPUT_DIR, workers=None, force=False, as_of=None,
+                 stream=False, chunksize=CHUNK_ROWS, prebuilt=True):
+    """
+    Single entry point: raw_data -> data/.
+    Only fund types whose scoring or features file changed (by content hash)
+    are re-processed, in a process pool; the master and per-type split files
+    are then written in one pass, and appended to the snapshot history
+    (data/history/, dated `as_of`, default today). Returns a small run report.
+    With `stream`, raw files are read `chunksize` rows at a time and outputs
+    are written as they go (see stream_ingest.py), for inputs larger than memory.
+    With `prebuilt`, the whole validated snapshot (data + indexes) is also
+    written to data/snapshot.pkl, which API workers load in one read.
+    """
+    started = time.perf_counter()
+    # The history is append-only: refuse an older as_of before any output is rewritten.
+    try:
+        check_as_of(output_dir, as_of)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return {"error": str(e)}
+    os.makedirs(output_dir, exist_ok=True)
+    cache_dir = os.path.join(output_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    new_manifest = {"types": {}, "metadata": {}}
+    report = {"processed": [], "reused": [], "failed": [], "metadata": []}
+
+    print("🚀 Starting pipeline...")
+
+    # --- A. Metadata (Weights & OOS) ---
+    for key, pattern, column, target in [
+        ("weights", "*weights*.csv", "feature", "weights.csv"),
+        ("oos", "*oos_review*.csv", "MFType", "oos_reliability.csv"),
+    ]:
+        path, df = find_metadata_file(raw_dir, pattern, column)
+        if path is None:
+            print(f"⚠️ No {key} file found in {raw_dir}.")
+            continue
+        digest = file_hash(path)
+        new_manifest["metadata"][key] = digest
+        out = os.path.join(output_dir, target)
+        if force or manifest["metadata"].get(key) != digest or not os.path.exists(out):
+            write_csv_atomic(df, out)
+            report["metadata"].append(key)
+            print(f"✅ {key} processed from {os.path.basename(path)}.")
+
+    # --- B. Funds: hash inputs, find what changed ---
+    fund_types = discover_types(raw_dir)
+    jobs = []
+    for f_type in fund_types:
+        s_file, f_file = score_path(raw_dir, f_type), features_path(raw_dir, f_type)
+        hashes = {"score": file_hash(s_file), "features": file_hash(f_file)}
+        new_manifest["types"][f_type] = hashes
+        cache_file = cache_file_for(cache_dir, f_type, stream)
+        unchanged = manifest["types"].get(f_type) == hashes and os.path.exists(cache_file)
+        if unchanged and not force:
+            report["reused"].append(f_type)
+        else:
+            if not os.path.exists(f_file):
+                print(f"   ⚠️ Features file missing for {f_type}, keeping scores only.")
+            jobs.append((f_type, s_file, f_file, cache_file) + ((chunksize,) if stream else ()))
+
+    if jobs:
+        print(f"Processing {len(jobs)} changed type(s): {', '.join(j[0].upper() for j in jobs)}")
+        job = _stream_type_job if stream else _process_type_job
+        if len(jobs) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(job, jobs))
+        else:
+            results = [job(j) for j in jobs]
+        for f_type, count, error in results:
+            if error:
+                report["failed"].append(f_type)
+                # Forget the hash so the type is retried next run.
+                new_manifest["types"].pop(f_type, None)
+                print(f"   ❌ {f_type.upper()}: {error}")
+            else:
+                report["processed"].append(f_type)
+                print(f"   ✅ {f_type.upper()}: {count} funds.")
+    if report["reused"]:
+        print(f"   ♻️ Unchanged, reused: {', '.join(t.upper() for t in report['reused'])}")
+    if report["failed"]:
+        # Outputs stay those of the last good run; the failed types are retried next run.
+        report["error"] = f"Processing failed for: {', '.join(t.upper() for t in report['failed'])}."
+        print(f"\n❌ Error: {report['error']} Outputs left unchanged.")
+        with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(new_manifest, f, indent=2)
+        return report
+
+    # --- C. Write master + splits in one pass ---
+    fund_types = [t for t in fund_types if os.path.exists(cache_file_for(cache_dir, t, stream))]
+    if not fund_types:
+        print("\n❌ Error: No data processed.")
+        return report
+
+    stale_outputs = bool(jobs) or bool(report["metadata"]) or any(
+        not os.path.exists(os.path.join(output_dir, name))
+        for name in ["funds_master.csv", "funds_master_clean.csv", ANALYSIS_FILE, VECTORS_FILE, PROFILE_VIEWS_FILE] + [f"funds_{t}.csv" for t in fund_types]
+        + ([] if stream else [os.path.join(COLUMNAR_DIR, "funds_master_clean.meta.json")])
+    )
+    if stale_outputs or force:
+        weights_path = os.path.join(output_dir, "weights.csv")
+        weights_df = pd.read_csv(weights_path) if os.path.exists(weights_path) else pd.DataFrame(columns=['feature', 'weight'])
+        weights = dict(zip(weights_df['feature'], weights_df['weight']))
+        rewrite = lambda t: t in report["processed"] or force or not os.path.exists(os.path.join(output_dir, f"funds_{t}.csv"))
+        oos_path = os.path.join(output_dir, "oos_reliability.csv")
+        oos_df = pd.read_csv(oos_path) if os.path.exists(oos_path) else None
+        oos_window = pick_oos_column(oos_df.columns) if oos_df is not None else None
+        oos = dict(zip(oos_df['MFType'], oos_df[oos_window])) if oos_window and 'MFType' in oos_df.columns else {}
+        if stream:
+            # Derived outputs and the history snapshot are streamed from the clean
+            # master too (CSV only: the store reads them without bundles).
+            master_clean = write_fund_files_streamed(fund_types, cache_dir, output_dir, rewrite, chunksize)
+            total = stream_analysis(master_clean, weights, os.path.join(output_dir, ANALYSIS_FILE), chunksize)
+            stream_vectors(master_clean, weights, os.path.join(output_dir, VECTORS_FILE), chunksize)
+            stream_profile_views(master_clean, oos, os.path.join(output_dir, PROFILE_VIEWS_FILE), chunksize)
+        else:
+            merged_all, ranked_all = [], []
+            for f_type in fund_types:
+                with open(os.path.join(cache_dir, f"{f_type}.pkl"), 'rb') as f:
+                    merged, ranked = pickle.load(f)
+                if rewrite(f_type):
+                    write_outputs(ranked, output_dir, f"funds_{f_type}.csv")
+                merged_all.append(merged)
+                ranked_all.append(ranked)
+            write_csv_atomic(pd.concat(merged_all, ignore_index=True), os.path.join(output_dir, "funds_master.csv"))
+            master_clean = pd.concat(ranked_all, ignore_index=True)
+            write_outputs(master_clean, output_dir, "funds_master_clean.csv")
+            total = len(master_clean)
+
+            # Per-fund attribution (weight x within-type z-score), percentile, top drivers
+            write_outputs(compute_analysis(master_clean, weights), output_dir, ANALYSIS_FILE)
+            # Weighted, standardized feature vectors for the similar-fund index
+            write_outputs(compute_vectors(master_clean, weights), output_dir, VECTORS_FILE)
+            # Merged cross-type ranking per risk profile, with the current OOS alpha per type
+            write_outputs(compute_profile_views(master_clean, oos), output_dir, PROFILE_VIEWS_FILE)
+        report["total_funds"] = total
+        print(f"🎉 Saved Master DB ({total} funds) and {len(fund_types)} split files.")
+
+        # Append-only history of scores, ranks and OOS alpha (see backend/history.py)
+        try:
+            report["snapshot"] = record_snapshot(output_dir, master_clean, oos_df, as_of, chunksize=chunksize)
+        except ValueError as e:  # Another run recorded a newer snapshot meanwhile.
+            report["snapshot"] = None
+            report["history_error"] = str(e)
+            print(f"⚠️ History snapshot not recorded: {e}")
+        if report["snapshot"]:
+            print(f"🗂️ Recorded history snapshot {report['snapshot']}.")
+    else:
+        print("✨ Nothing changed, outputs are up to date.")
+
+    # --- D. Prebuilt snapshot for warm API starts (see backend/startup.py) ---
+    # Checked against the data itself, so a stale file left by a --no-prebuilt run is replaced.
+    prebuilt_path = os.path.join(output_dir, PREBUILT_FILE)
+    if prebuilt and (force or prebuilt_status(output_dir) is not None):
+        try:
+            header = build_prebuilt(output_dir)
+            report["prebuilt"] = header["version"]
+            print(f"📦 Prebuilt snapshot {header['version']} ({header['funds']} funds, "
+                  f"{os.path.getsize(prebuilt_path) / 1e6:.1f} MB).")
+        except ValueError as e:
+            print(f"⚠️ Prebuilt snapshot not written: {e}")
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(new_manifest, f, indent=2)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build data/ from raw_data/ (incremental).")
+    parser.add_argument("--raw-dir", default=RAW_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (1 = serial).")
+    parser.add_argument("--force", action="store_true", help="Re-process every type.")
+    parser.add_argument("--as-of", default=None, help="Date of this data for the history store (YYYY-MM-DD, default today).")
+    parser.add_argument("--stream", action="store_true", help="Chunked, bounded-memory ingest for very large raw files.")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="Rows per chunk in --stream mode.")
+    parser.add_argument("--no-prebuilt", action="store_true", help="Skip writing data/snapshot.pkl.")
+    args = parser.parse_args()
+    print(run_pipeline(args.raw_dir, args.output_dir, args.workers, args.force, args.as_of, args.stream, args.chunksize,
+                       not args.no_prebuilt))
@@ -0,0 +1,571 @@
+import csv
+import io
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from backend.analysis import CONTRIB_PREFIX, TOP_K
+from backend.query import PROFILE_TYPES
+from backend.recommendations import VIEW_COLUMNS
+from backend.similarity import VECTOR_PREFIX
+
+# --- Streaming ingest (pipeline.py --stream) ---
+# Same outputs as the in-memory path, for raw files larger than memory.
+# Peak memory is a few chunks plus one key -> byte-offset dict, whatever the input size:
+#
+#   pass 0  features file: dtype per column (chunked) + hash index (mfName[, MFType]) -> row offset
+#   pass 1  scoring file:  dtype per column, min/max of score_raw (for score_0_100)
+#   pass 2  scoring file:  normalize, join features through the index, append to <type>.merged.csv,
+#                          spill each chunk sorted by score as a run file
+#   merge   k-way merge of the runs, MERGE_FAN_IN at a time (external sort) -> ranks,
+#           appended to <type>.ranked.csv
+#
+# The derived outputs (analysis, vectors, profile views) and the history
+# snapshot are then streamed from funds_master_clean.csv too (section 6).
+#
+# Columns keep the dtype a full pd.read_csv would infer (int columns with a
+# gap become float, etc.), so the CSVs match the in-memory pipeline byte for byte.
+
+CHUNK_ROWS = int(os.getenv("PIPELINE_CHUNK_ROWS", "100000"))
+RUN_BLOCK_ROWS = 2048  # Rows per block in a sorted run; a merge holds one block per run.
+MERGE_FAN_IN = 32      # Runs merged at once; more runs are first merged into longer runs.
+_SORT_KEY = ["_neg_score", "_row"]
+_KEY_SEP = "\x1f"  # Joins mfName and MFType into one index key.
+
+
+# --- 1. DTYPES ---
+def promote(a, b):
+    """dtype that holds both (what pd.concat / one big read_csv would end up with)."""
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if {a, b} <= {"int64", "float64"}:
+        return "float64"
+    return "object"
+
+def _with_gaps(dtype):
+    """dtype of a column once NaN rows are added (left join miss, column missing from a part)."""
+    return {"int64": "float64", "bool": "object"}.get(dtype, dtype)
+
+def read_header(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return [c.strip() for c in next(csv.reader(f))]
+
+def read_chunks(path, chunksize, dtypes=None, exact=False, usecols=None):
+    """
+    Chunks of a CSV with stripped column names and (optionally) fixed dtypes.
+    `exact` parses floats round-trip: needed when re-reading our own output,
+    whose values must come back bit-identical (the default parser is not).
+    """
+    names = read_header(path)
+    return pd.read_csv(path, header=0, names=names, dtype=dtypes, chunksize=chunksize, encoding='utf-8-sig',
+                       float_precision='round_trip' if exact else None, usecols=usecols)
+
+def scan_dtypes(path, chunksize):
+    dtypes = {}
+    for chunk in read_chunks(path, chunksize):
+        for col in chunk.columns:
+            dtypes[col] = promote(dtypes.get(col), str(chunk[col].dtype))
+    return dtypes
+
+
+# --- 2. FEATURE HASH INDEX ---
+class _Records:
+    """
+    Line source for csv.reader over a binary file: tracks the byte offset of
+    every line handed out and keeps the raw bytes since the last mark(), so a
+    record's offset and bytes are known even when a quoted field spans lines.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+        self.raw = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        self.raw.append(line)
+        return line.decode('utf-8')
+
+    def mark(self):
+        """Starts a new record: returns its byte offset."""
+        self.raw = []
+        return self.offset
+
+
+class FeatureIndex:
+    """
+    Hash index over the features file: join key -> byte offset of its first row.
+    Only keys are held in memory; rows are read back by seek when a scoring
+    chunk needs them, and parsed in one read_csv call per chunk. Later rows with
+    an already-seen key are counted in `duplicates` and ignored (as in
+    pipeline.process_type). One csv.reader runs over the whole file, so quoted
+    fields with newlines stay in their row.
+    """
+
+    def __init__(self, path, key_columns, chunksize):
+        self.path = path
+        self.columns = read_header(path)
+        self.key_columns = key_columns
+        self.dtypes = scan_dtypes(path, chunksize)
+        for k in key_columns:
+            self.dtypes[k] = "str"
+        key_idx = [self.columns.index(k) for k in key_columns]
+        self.offsets = {}
+        self.duplicates = 0
+        with open(path, 'rb') as f:
+            self._header = f.readline()
+            records = _Records(f)
+            reader = csv.reader(records)
+            while True:
+                offset = records.mark()
+                row = next(reader, None)
+                if row is None:
+                    break
+                if row:
+                    key = _KEY_SEP.join(row[i] for i in key_idx)
+                    if key in self.offsets:
+                        self.duplicates += 1
+                    else:
+                        self.offsets[key] = offset
+
+    def keys(self, chunk):
+        """Index keys of a scoring chunk's rows."""
+        first, rest = self.key_columns[0], self.key_columns[1:]
+        return chunk[first].astype(str).str.cat([chunk[k].astype(str) for k in rest], sep=_KEY_SEP).tolist()
+
+    def gather(self, keys, dtypes):
+        """Feature rows for `keys` (from keys()), aligned with them; NaN where missing."""
+        found = [(off, i) for i, off in enumerate(self.offsets.get(k) for k in keys) if off is not None]
+        found.sort()  # Read in file order.
+        lines = []
+        with open(self.path, 'rb') as f:
+            for off, _ in found:
+                f.seek(off)
+                records = _Records(f)
+                next(csv.reader(records))  # Pulls every line of the record.
+                line = b''.join(records.raw)
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+        frame = pd.read_csv(io.BytesIO(self._header + b''.join(lines)), header=0, names=self.columns,
+                            dtype=dtypes, encoding='utf-8-sig')
+        frame.index = [i for _, i in found]
+        return frame.reindex(range(len(keys)))
+
+
+# --- 3. EXTERNAL SORT ---
+def _write_run(batches, path):
+    """One sorted run (batches already in key order), pickled in blocks."""
+    with open(path, 'wb') as f:
+        for batch in batches:
+            for start in range(0, len(batch), RUN_BLOCK_ROWS):
+                pickle.dump(batch.iloc[start:start + RUN_BLOCK_ROWS], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def _up_to(head, keys, frontier):
+    """Mask of the rows of `head` whose key tuple sorts at or before `frontier`."""
+    before = np.zeros(len(head), dtype=bool)
+    tied = np.ones(len(head), dtype=bool)
+    for key, bound in zip(keys, frontier):
+        values = head[key].to_numpy()
+        before |= tied & (values < bound)
+        tied &= values == bound
+    return before | tied
+
+def merge_runs(paths, keys=_SORT_KEY):
+    """
+    Yields the rows of every run in global order of `keys` (all ascending), a
+    batch at a time. Each round emits all loaded rows up to the smallest "last
+    key" among the runs' current blocks: nothing still on disk can sort before it.
+    """
+    readers = [_read_run(p) for p in paths]
+    heads = [next(r, None) for r in readers]
+    while True:
+        live = [i for i, h in enumerate(heads) if h is not None]
+        if not live:
+            return
+        frontier = min(tuple(heads[i][k].iat[-1] for k in keys) for i in live)
+        taken = []
+        for i in live:
+            head = heads[i]
+            mask = _up_to(head, keys, frontier)
+            taken.append(head[mask])
+            rest = head[~mask]
+            heads[i] = rest if len(rest) else next(readers[i], None)
+        yield pd.concat(taken).sort_values(keys, kind='stable')
+
+def sorted_batches(runs, work_dir, keys=_SORT_KEY):
+    """merge_runs over any number of runs, at most MERGE_FAN_IN open at a time."""
+    level = 0
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for start in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[start:start + MERGE_FAN_IN]
+            path = os.path.join(work_dir, f"merge_{level}_{start:06d}.pkl")
+            _write_run(merge_runs(group, keys), path)
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs, level = merged, level + 1
+    return merge_runs(runs, keys)
+
+
+# --- 4. ONE TYPE ---
+def _append(df, path, first):
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+def stream_type(score_file, feat_file, merged_path, ranked_path, chunksize=CHUNK_ROWS):
+    """
+    Streaming twin of pipeline.process_type: writes the merged frame (scoring-file
+    order) and the ranked frame as CSVs. Returns (row count, {column: dtype}).
+    """
+    work_dir = f"{ranked_path}.runs"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        # Pass 0: features index. We TRUST the scoring file: drop any score columns carried by features.
+        index = None
+        feat_cols = []
+        if feat_file and os.path.exists(feat_file):
+            header = read_header(feat_file)
+            merge_keys = ['mfName'] + (['MFType'] if 'MFType' in header else [])
+            index = FeatureIndex(feat_file, merge_keys, chunksize)
+            if index.duplicates:
+                print(f"   ⚠️ {os.path.basename(feat_file)}: {index.duplicates} duplicate feature row(s) ignored (first kept).")
+            feat_cols = [c for c in header if c not in merge_keys and c != 'score_raw' and 'score_0_100' not in c]
+
+        # Pass 1: dtypes, score range, unmatched keys (an unmatched row turns int features into float)
+        score_dtypes, lo, hi, unmatched = {}, np.inf, -np.inf, False
+        for chunk in read_chunks(score_file, chunksize, dtypes={'mfName': 'str', 'MFType': 'str'}):
+            chunk = chunk.drop(columns=[c for c in chunk.columns if 'score_0_100' in c])
+            for col in chunk.columns:
+                score_dtypes[col] = promote(score_dtypes.get(col), str(chunk[col].dtype))
+            raw = chunk['score_raw']
+            if raw.notna().any():
+                lo, hi = min(lo, raw.min()), max(hi, raw.max())
+            if index is not None and not unmatched:
+                unmatched = any(k not in index.offsets for k in index.keys(chunk))
+
+        # Output columns as pd.merge would name them (overlapping non-key columns get _x / _y).
+        overlap = set(feat_cols) & set(score_dtypes)
+        out_dtypes = {(f"{c}_x" if c in overlap else c): t for c, t in score_dtypes.items()}
+        feat_dtypes = {}
+        for c in feat_cols:
+            t = index.dtypes[c]
+            if unmatched:
+                t = _with_gaps(t)
+            feat_dtypes[f"{c}_y" if c in overlap else c] = t
+        out_dtypes.update(feat_dtypes)
+        out_dtypes['score_0_100'] = "float64"
+
+        # Pass 2: normalize + join, write merged rows, spill sorted runs
+        runs, rows = [], 0
+        for n, chunk in enumerate(read_chunks(score_file, chunksize, dtypes=score_dtypes)):
+            chunk = chunk.drop(columns=[c for c in chunk.columns if 'score_0_100' in c]).reset_index(drop=True)
+            chunk = chunk.rename(columns={c: f"{c}_x" for c in overlap})
+            if index is not None:
+                feats = index.gather(index.keys(chunk), index.dtypes)[feat_cols]
+                feats.columns = [f"{c}_y" if c in overlap else c for c in feat_cols]
+                chunk = pd.concat([chunk, feats], axis=1)
+            if hi > lo:
+                chunk['score_0_100'] = ((chunk['score_raw'] - lo) / (hi - lo)) * 100
+            else:
+                chunk['score_0_100'] = 100.0  # Single fund case
+            chunk['score_0_100'] = chunk['score_0_100'].round(1)
+            chunk = chunk.astype(out_dtypes)
+            _append(chunk, merged_path, first=n == 0)
+
+            # Rank key: score desc (NaN last), then scoring-file order, as rank_funds' stable sort.
+            chunk['_neg_score'] = (-chunk['score_0_100']).fillna(np.inf).to_numpy()
+            chunk['_row'] = np.arange(rows, rows + len(chunk))
+            run = os.path.join(work_dir, f"run_{n:06d}.pkl")
+            _write_run([chunk.sort_values(_SORT_KEY, kind='stable')], run)
+            runs.append(run)
+            rows += len(chunk)
+
+        # Merge: global order -> ranks
+        rank = 0
+        first = True
+        for batch in sorted_batches(runs, work_dir):
+            batch = batch.drop(columns=_SORT_KEY)
+            batch['rank'] = np.arange(rank + 1, rank + len(batch) + 1)
+            rank += len(batch)
+            _append(batch, ranked_path, first)
+            first = False
+        if first:  # Empty scoring file: header-only outputs.
+            _append(pd.DataFrame(columns=list(out_dtypes) + ['rank']), ranked_path, True)
+            if not runs:
+                _append(pd.DataFrame(columns=list(out_dtypes)), merged_path, True)
+        out_dtypes['rank'] = "int64"
+        return rows, out_dtypes
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# --- 5. CONCATENATION ---
+def concat_csvs(parts, out_path, chunksize=CHUNK_ROWS):
+    """
+    Streams [(csv path, {column: dtype})] into one CSV, like pd.concat of the
+    frames: union of columns in order of appearance, dtypes promoted.
+    """
+    columns, dtypes = [], {}
+    for _, part_dtypes in parts:
+        for col, t in part_dtypes.items():
+            if col not in dtypes:
+                columns.append(col)
+            dtypes[col] = promote(dtypes.get(col), t)
+    for col in columns:
+        if any(col not in d for _, d in parts):
+            dtypes[col] = _with_gaps(dtypes[col])  # Missing in some part -> NaN there.
+
+    tmp = f"{out_path}.tmp"
+    first = True
+    for path, part_dtypes in parts:
+        for chunk in read_chunks(path, chunksize, dtypes=part_dtypes, exact=True):
+            _append(chunk.reindex(columns=columns).astype(dtypes), tmp, first)
+            first = False
+    if first:
+        _append(pd.DataFrame(columns=columns), tmp, True)
+    os.replace(tmp, out_path)
+    return dtypes
+
+def save_dtypes(dtypes, path):
+    with open(path, 'w') as f:
+        json.dump(dtypes, f)
+
+def load_dtypes(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# --- 6. DERIVED OUTPUTS ---
+# Streaming twins of analysis.compute_analysis, similarity.compute_vectors and
+# recommendations.compute_profile_views over funds_master_clean.csv. Each needs
+# statistics of a whole type (or of the universe), so it makes one pass to
+# collect them and one to write; the profile views are an external sort.
+# Means and deviations are accumulated chunk by chunk, so values can differ
+# from the in-memory functions in the last float digits.
+
+class Moments:
+    """Per-group count, mean and M2 of float columns, merged chunk by chunk (NaN skipped)."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.count, self._mean, self._m2 = {}, {}, {}
+
+    def add(self, groups, values):
+        by = pd.DataFrame(values, columns=self.columns).groupby(np.asarray(groups), sort=False)
+        counts, means, variances = by.count(), by.mean(), by.var(ddof=0)
+        for g in counts.index:
+            nb = counts.loc[g].to_numpy(dtype=np.float64)
+            mb = np.nan_to_num(means.loc[g].to_numpy(dtype=np.float64))
+            m2b = np.nan_to_num(variances.loc[g].to_numpy(dtype=np.float64)) * nb
+            if g not in self.count:
+                self.count[g], self._mean[g], self._m2[g] = nb, mb, m2b
+                continue
+            na, ma = self.count[g], self._mean[g]
+            n = na + nb
+            delta = mb - ma
+            share = np.divide(nb, n, out=np.zeros_like(n), where=n > 0)
+            self._mean[g] = ma + delta * share
+            self._m2[g] = self._m2[g] + m2b + delta ** 2 * na * share
+            self.count[g] = n
+
+    def mean(self, g):
+        return np.where(self.count[g] > 0, self._mean[g], np.nan)
+
+    def std(self, g):
+        """Population standard deviation (ddof=0); NaN for a column with no values."""
+        return np.sqrt(np.where(self.count[g] > 0, self._m2[g], np.nan) / np.maximum(self.count[g], 1))
+
+
+class TypePercentiles:
+    """
+    pct_in_type / n_in_type for rows streamed in funds_master_clean order, where
+    each type's rows are sorted by score, best first, NaN last: a row's rank
+    (method 'max', as in compute_analysis) is counted from where its score's
+    tie starts. count() sees every row once before percentiles() is used.
+    """
+
+    def __init__(self):
+        self.size, self.valid = {}, {}
+        self._state = {}  # type -> (valid rows seen, last score, position where its tie starts)
+
+    def count(self, types, scores):
+        for t, n, v in zip(*_per_type(types, ~np.isnan(scores))):
+            self.size[t] = self.size.get(t, 0) + n
+            self.valid[t] = self.valid.get(t, 0) + v
+
+    def percentiles(self, types, scores):
+        pct = np.full(len(scores), np.nan)
+        for t in pd.unique(types):
+            rows = np.flatnonzero(types == t)
+            rows = rows[~np.isnan(scores[rows])]
+            if not len(rows):
+                continue
+            s = scores[rows]
+            seen, last, start = self._state.get(t, (0, None, 0))
+            pos = seen + np.arange(1, len(s) + 1)
+            new_tie = np.ones(len(s), dtype=bool)
+            new_tie[1:] = s[1:] != s[:-1]
+            new_tie[0] = s[0] != last
+            starts = np.maximum(np.maximum.accumulate(np.where(new_tie, pos, 0)), start)
+            valid = self.valid[t]
+            pct[rows] = np.round((valid - starts + 1) / valid * 100, 1)
+            self._state[t] = (seen + len(s), s[-1], int(starts[-1]))
+        return pct
+
+    def sizes(self, types):
+        return np.array([self.size[t] for t in types], dtype=np.int64)
+
+
+def _per_type(types, flags):
+    frame = pd.DataFrame({"t": types, "f": flags}).groupby("t", sort=False)["f"]
+    return frame.size().index, frame.size().to_numpy(), frame.sum().to_numpy()
+
+def _per_row(stats, types):
+    """Stacks one per-type vector per row."""
+    codes, uniques = pd.factorize(types)
+    return np.vstack([stats(t) for t in uniques])[codes] if len(uniques) else np.empty((0, 0))
+
+def _write_chunks(frames, out_path, columns):
+    """Writes frames to out_path through a temp file; header-only when there are none."""
+    tmp = f"{out_path}.tmp"
+    first = True
+    for frame in frames:
+        _append(frame, tmp, first)
+        first = False
+    if first:
+        _append(pd.DataFrame(columns=columns), tmp, True)
+    os.replace(tmp, out_path)
+
+def _clean_chunks(clean_path, columns, chunksize):
+    return read_chunks(clean_path, chunksize, dtypes={'mfName': 'str', 'MFType': 'str'}, exact=True, usecols=columns)
+
+
+def stream_analysis(clean_path, weights, out_path, chunksize=CHUNK_ROWS, top_k=TOP_K):
+    """compute_analysis of funds_master_clean.csv, written to out_path. Returns the row count."""
+    features = [f for f in weights if f in read_header(clean_path)]
+    columns = ["mfName", "MFType", "score_0_100"] + features
+    moments, ranks, rows = Moments(features), TypePercentiles(), 0
+    for chunk in _clean_chunks(clean_path, columns, chunksize):
+        types = chunk["MFType"].to_numpy()
+        moments.add(types, chunk[features].to_numpy(dtype=np.float64))
+        ranks.count(types, chunk["score_0_100"].to_numpy(dtype=np.float64))
+        rows += len(chunk)
+    w = np.array([weights[f] for f in features], dtype=np.float64)
+    names = np.array(features, dtype=object)
+
+    def frames():
+        for chunk in _clean_chunks(clean_path, columns, chunksize):
+            types = chunk["MFType"].to_numpy()
+            std = _per_row(moments.std, types)
+            std[std == 0] = np.nan
+            z = np.nan_to_num((chunk[features].to_numpy(dtype=np.float64) - _per_row(moments.mean, types)) / std, nan=0.0)
+            contrib = z * w
+            out = pd.DataFrame({"mfName": chunk["mfName"].to_numpy(), "MFType": types})
+            for i, f in enumerate(features):
+                out[f"{CONTRIB_PREFIX}{f}"] = contrib[:, i]
+            out["pct_in_type"] = ranks.percentiles(types, chunk["score_0_100"].to_numpy(dtype=np.float64))
+            out["n_in_type"] = ranks.sizes(types)
+            order = np.argsort(-np.abs(contrib), axis=1, kind="stable")[:, :top_k]
+            for k in range(min(top_k, len(features))):
+                out[f"driver_{k + 1}"] = names[order[:, k]]
+            yield out
+
+    _write_chunks(frames() if rows else [], out_path, ["mfName", "MFType"])
+    return rows
+
+
+def stream_vectors(clean_path, weights, out_path, chunksize=CHUNK_ROWS):
+    """compute_vectors of funds_master_clean.csv, written to out_path."""
+    features = [f for f in weights if f in read_header(clean_path)]
+    columns = ["mfName", "MFType"] + features
+    moments, rows = Moments(features), 0
+    for chunk in _clean_chunks(clean_path, columns, chunksize):
+        moments.add(np.zeros(len(chunk), dtype=np.int8), chunk[features].to_numpy(dtype=np.float64))
+        rows += len(chunk)
+    if not rows:
+        return _write_chunks([], out_path, ["mfName", "MFType"])
+    mean, std = moments.mean(0), moments.std(0)
+    std[std == 0] = 1.0
+    scale = np.sqrt(np.abs([weights[f] for f in features]))
+
+    def frames():
+        for chunk in _clean_chunks(clean_path, columns, chunksize):
+            scaled = np.nan_to_num((chunk[features].to_numpy(dtype=np.float64) - mean) / std) * scale
+            out = pd.DataFrame({"mfName": chunk["mfName"].to_numpy(), "MFType": chunk["MFType"].to_numpy()})
+            for i, f in enumerate(features):
+                out[f"{VECTOR_PREFIX}{f}"] = scaled[:, i]
+            yield out
+
+    _write_chunks(frames(), out_path, columns)
+
+
+_VIEW_KEY = ["_neg_score", "_neg_pct", "_neg_alpha", "mfName", "pos"]
+
+def stream_profile_views(clean_path, oos, out_path, chunksize=CHUNK_ROWS):
+    """compute_profile_views of funds_master_clean.csv: one external sort, then one pass per profile."""
+    columns = ["mfName", "MFType", "score_0_100", "rank"]
+    profiled = set().union(*PROFILE_TYPES.values())
+    ranks = TypePercentiles()
+    for chunk in _clean_chunks(clean_path, columns, chunksize):
+        ranks.count(chunk["MFType"].str.upper().to_numpy(), chunk["score_0_100"].to_numpy(dtype=np.float64))
+
+    work_dir = f"{out_path}.runs"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        runs, pos = [], 0
+        for n, chunk in enumerate(_clean_chunks(clean_path, columns, chunksize)):
+            types = chunk["MFType"].str.upper().to_numpy()
+            score = chunk["score_0_100"].to_numpy(dtype=np.float64)
+            base = pd.DataFrame({
+                "pos": np.arange(pos, pos + len(chunk)),
+                "mfName": chunk["mfName"].to_numpy(),
+                "MFType": types,
+                "score_0_100": score,
+                "rank": chunk["rank"].to_numpy(),
+                "pct_in_type": ranks.percentiles(types, score),
+                "n_in_type": ranks.sizes(types),
+                "oos_alpha": np.array([oos.get(t, np.nan) for t in types], dtype=np.float64),
+            })
+            pos += len(chunk)
+            base = base[base["MFType"].isin(profiled)]
+            # Sort key of compute_profile_views: score, pct, alpha descending (NaN last), name, row.
+            for key, col in zip(_VIEW_KEY, ["score_0_100", "pct_in_type", "oos_alpha"]):
+                base[key] = (-base[col]).fillna(np.inf)
+            run = os.path.join(work_dir, f"run_{n:06d}.pkl")
+            _write_run([base.sort_values(_VIEW_KEY, kind='stable')], run)
+            runs.append(run)
+        ordered = os.path.join(work_dir, "ordered.pkl")
+        _write_run(sorted_batches(runs, work_dir, _VIEW_KEY), ordered)
+
+        def frames():
+            for profile, allowed in PROFILE_TYPES.items():
+                done = 0
+                for batch in _read_run(ordered):
+                    view = batch[batch["MFType"].isin(allowed)].copy()
+                    view.insert(0, "profile", profile.title())
+                    view.insert(1, "profile_rank", np.arange(done + 1, done + len(view) + 1))
+                    done += len(view)
+                    yield view[VIEW_COLUMNS]
+
+        _write_chunks(frames(), out_path, VIEW_COLUMNS)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,21 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    """Synthetic raw_data/ whose SH features file repeats some funds with other values."""
+    monkeypatch.chdir(ROOT_DIR)  # write_raw copies the metadata files from raw_data/
+    raw = tmp_path / "raw"
+    synthetic.write_raw(synthetic.make_universe(400, seed=1), str(raw))
+    feat_path = raw / "fund-scoring-by-type_cv_features_sh.csv"
+    feat = pd.read_csv(feat_path)
+    dupes = feat.head(5).assign(ret_3m=9.0)
+    pd.concat([feat, dupes], ignore_index=True).to_csv(feat_path, index=False)
+    return str(raw)
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from backend import agent
+from backend.router import fast_path_callback
+
+# Per tool: arguments asking for Saham (SH), which a Conservative profile (PU only) blocks.
+ASKS_FOR_SAHAM = {
+    "get_top_funds": {"fund_type": "Saham", "n": 3},
+    "search_funds": {"fund_types": "SH", "n": 3},
+    "find_similar_funds": {"fund_name": "Sucorinvest Maxi Fund", "fund_types": "Saham"},
+}
+GATED_TOOLS = [(a.name, t) for a in (agent.db_agent, agent.analyst_agent) for t in a.tools
+               if getattr(t, "__name__", None) in ASKS_FOR_SAHAM]
+
+
+def context(profile=None):
+    state = {"risk_profile": profile} if profile else {}
+    return SimpleNamespace(state=state, agent_name="test_agent", invocation_id="inv-1")
+
+
+def test_every_fund_listing_sub_agent_tool_is_gated():
+    assert sorted({t.__name__ for _, t in GATED_TOOLS}) == sorted(ASKS_FOR_SAHAM)
+    assert len(GATED_TOOLS) == 4  # db_agent: 3, analyst_agent: find_similar_funds
+
+
+@pytest.mark.parametrize("owner, tool", GATED_TOOLS, ids=lambda v: getattr(v, "__name__", v))
+def test_db_tools_refuse_blocked_types(owner, tool):
+    args = ASKS_FOR_SAHAM[tool.__name__]
+    assert tool(**args, tool_context=context())["status"] == "needs_profile"
+    result = tool(**args, tool_context=context("Conservative"))
+    assert result["status"] == "blocked" and result["allowed"] == ["PU"]
+    assert "status" not in tool(**args, tool_context=context("Aggressive"))  # success
+
+
+def test_db_tools_drop_blocked_types_and_ignore_the_models_profile():
+    search = agent.profile_gate(agent.search_funds)
+    result = search(fund_types="PU, SH", n=5, tool_context=context("Conservative"))
+    assert result["excluded_types"] == ["SH"] and {r["MFType"] for r in result["data"]} == {"PU"}
+
+    similar = agent.profile_gate(agent.find_similar_funds)
+    result = similar("Sucorinvest Maxi Fund", n=5, risk_profile="Aggressive", tool_context=context("Conservative"))
+    assert result["types"] == ["PU"] and {r["MFType"] for r in result["data"]} == {"PU"}
+
+
+def fast_path(text, profile=None):
+    request = SimpleNamespace(contents=[types.Content(role="user", parts=[types.Part(text=text)])])
+    response = fast_path_callback(context(profile), request)
+    return response.content.parts[0].text if response else None
+
+
+def test_fast_path_refuses_blocked_types():
+    assert "risk profile" in fast_path("top saham")
+    assert "cannot recommend Saham" in fast_path("top saham", "Moderate")
+    assert "tidak dapat merekomendasikan" in fast_path("top 5 reksadana saham terbaik", "Conservative")
+    assert "Top 5 Saham" in fast_path("top saham", "Aggressive")
+
+
+def test_recommend_funds_only_returns_allowed_types():
+    assert agent.recommend_funds(tool_context=context())["status"] == "needs_profile"
+    result = agent.recommend_funds(page_size=50, tool_context=context("Moderate"))
+    assert result["types"] == ["PU", "PT"]
+    assert {row[result["data"]["cols"].index("type")] for row in result["data"]["rows"]} == {"PU", "PT"}
+    blocked = agent.recommend_funds(fund_types="Saham, Campuran", tool_context=context("Moderate"))
+    assert blocked["status"] == "blocked" and blocked["requested"] == ["SH", "CP"]
+
+
+def test_prepare_recommendation_gates_before_calling_sub_agents(monkeypatch):
+    requests = []
+
+    async def run_async(*, args, tool_context):
+        requests.append(args["request"])
+        return "ok"
+
+    for tool in (agent.db_tool, agent.viz_tool, agent.analyst_tool):
+        monkeypatch.setattr(tool, "run_async", run_async)
+    prepare = lambda ctx, **kw: asyncio.run(agent.prepare_recommendation("best funds", tool_context=ctx, **kw))
+
+    assert prepare(context())["status"] == "needs_profile"
+    assert prepare(context("Conservative"), fund_types="Saham")["status"] == "blocked"
+    assert requests == []  # Refused without spending a sub-agent call.
+
+    result = prepare(context("Conservative"), fund_types="Saham, Pasar Uang", include_analysis=True)
+    assert result["allowed_types"] == ["PU"]
+    assert requests[0].endswith("Only these categories: PU.")
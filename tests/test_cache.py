@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend import cache
+from backend.cache import MemoryBackend, ResponseCache, SqliteBackend, make_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        self.now += 0.001  # Every call is a distinct instant, so LRU order is well defined.
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path, clock):
+    def make(max_bytes=1 << 20):
+        if request.param == "memory":
+            return ResponseCache(MemoryBackend(max_bytes=max_bytes))
+        return ResponseCache(SqliteBackend(str(tmp_path / "cache" / "responses.sqlite3"), max_bytes=max_bytes))
+    return make
+
+
+def value(size):
+    return "x" * (size - 2)  # JSON-encoded: size bytes with the quotes
+
+
+def test_round_trip_and_counters(make_cache):
+    c = make_cache()
+    assert c.get("search", "k") is None
+    c.set("search", "k", {"answer": "Ya, ada promo", "rows": [1, 2.5]}, ttl=60)
+    assert c.get("search", "k") == {"answer": "Ya, ada promo", "rows": [1, 2.5]}
+    assert c.get("analyst", "k") is None  # Namespaces do not share entries.
+    metrics = c.metrics()["namespaces"]
+    assert metrics["search"] == {"hits": 1, "misses": 1, "expired": 0, "evictions": 0, "hit_ratio": 0.5}
+
+
+def test_entries_expire_after_their_ttl(make_cache, clock):
+    c = make_cache()
+    c.set("search", "short", "a", ttl=10)
+    c.set("search", "long", "b", ttl=100)
+    clock.now += 11
+    assert c.get("search", "short") is None and c.get("search", "long") == "b"
+    assert c.stats["search.expired"] == 1
+    assert c.backend.usage()["entries"] == 1  # Expired entries are dropped on read.
+
+
+def test_least_recently_used_entries_are_evicted(make_cache):
+    c = make_cache(max_bytes=300)
+    for key in "abc":
+        c.set("ns", key, value(100), ttl=60)
+    assert c.get("ns", "a") is not None  # b is now the least recently used
+    c.set("ns", "d", value(100), ttl=60)
+    assert [c.get("ns", k) is not None for k in "abcd"] == [True, False, True, True]
+    assert c.stats["ns.evictions"] == 1
+    assert c.backend.usage()["bytes"] <= 300
+
+
+def test_oversized_values_are_not_stored(make_cache):
+    c = make_cache(max_bytes=100)
+    c.set("ns", "big", value(101), ttl=60)
+    assert c.get("ns", "big") is None and c.backend.usage()["entries"] == 0
+
+
+def test_sqlite_entries_survive_a_restart(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(SqliteBackend(path)).set("analyst", "k", [1, 2], ttl=60)
+    assert ResponseCache(SqliteBackend(path)).get("analyst", "k") == [1, 2]
+
+
+def test_keys_ignore_case_punctuation_and_spacing():
+    assert make_key("Top  Saham?", "v1") == make_key("top saham", "v1")
+    assert make_key("top saham", "v1") != make_key("top saham", "v2")
+    assert make_key("top 10% saham", "v1") != make_key("top 10 saham", "v1")
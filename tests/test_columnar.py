@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from backend.columnar import load_frame, read_bundle, sha1_file, write_bundle
+
+FRAME = pd.DataFrame({
+    "mfName": ["Alpha Fund", "Beta Fund", "Gamma Fund"],
+    "score_0_100": [91.5, np.nan, 12.25],
+    "rank": [1, 3, 2],
+    "MFType": ["SH", "PU", None],
+    "age_months": pd.array([12, None, 40], dtype="Int64"),
+})
+
+
+def mapped(array):
+    """True when the array's memory comes from a np.memmap (no copy was made)."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def test_round_trip_keeps_columns_values_and_order(tmp_path):
+    meta = write_bundle(FRAME, tmp_path, "funds")
+    assert meta["kinds"] == {"mfName": "str", "score_0_100": "f64", "rank": "i64", "MFType": "str", "age_months": "f64"}
+    df = read_bundle(tmp_path, "funds")
+    assert list(df.columns) == list(FRAME.columns)
+    np.testing.assert_array_equal(df["score_0_100"], FRAME["score_0_100"])
+    assert df["rank"].dtype == np.int64 and df["rank"].tolist() == [1, 3, 2]
+    assert df["age_months"].tolist()[::2] == [12.0, 40.0] and np.isnan(df["age_months"][1])
+    assert df["mfName"].tolist() == FRAME["mfName"].tolist()
+    assert df["MFType"].tolist() == ["SH", "PU", ""]  # Missing strings come back empty.
+
+
+def test_numeric_columns_are_zero_copy_views(tmp_path):
+    write_bundle(FRAME, tmp_path, "funds")
+    df = read_bundle(tmp_path, "funds")
+    for col in ("score_0_100", "rank", "age_months"):
+        assert mapped(df[col].to_numpy()), col
+        assert not df[col].to_numpy().flags.writeable
+
+
+def test_load_frame_only_uses_a_bundle_that_mirrors_the_csv(tmp_path):
+    csv_path = tmp_path / "funds.csv"
+    FRAME.to_csv(csv_path, index=False)
+    write_bundle(FRAME, tmp_path, "funds", source_sha1=sha1_file(csv_path))
+    assert load_frame(tmp_path, "funds", csv_path)[1] == "columnar"
+
+    FRAME.head(2).to_csv(csv_path, index=False)
+    df, source = load_frame(tmp_path, "funds", csv_path)
+    assert source == "csv" and len(df) == 2
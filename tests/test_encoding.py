@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from backend import tools
+from backend.encoding import _size, encode, fit_budget, tabulate
+
+
+def context(agent_name="db_agent", invocation_id="inv-1", state=None):
+    return SimpleNamespace(agent_name=agent_name, invocation_id=invocation_id, state={} if state is None else state)
+
+
+def test_same_shaped_rows_become_tables():
+    rows = [{"mfName": "A", "score": 1.0}, {"mfName": "B", "score": 2.0}]
+    assert tabulate({"data": rows}) == {"data": {"cols": ["mfName", "score"], "rows": [["A", 1.0], ["B", 2.0]]}}
+    records = {"SH": {"alpha": 0.1}, "PU": {"alpha": 0.02}}
+    assert tabulate(records) == {"cols": ["key", "alpha"], "rows": [["SH", 0.1], ["PU", 0.02]]}
+    # Rows of different shapes (or a single row) are left as they are.
+    mixed = [{"a": 1}, {"b": 2}]
+    assert tabulate(mixed) == mixed and tabulate(rows[:1]) == rows[:1]
+
+
+def test_meta_is_sent_once_per_agent_invocation_then_referenced():
+    result = lambda: tools.get_profile_recommendations("Aggressive", "All", 1, 50)
+    ctx = context()
+    first = encode("get_profile_recommendations", result(), ctx)
+    assert "oos_alpha" in first["meta"] and "oos_alpha" not in first["data"]["cols"]
+    second = encode("get_profile_recommendations", result(), ctx)
+    assert second["meta_ref"] == first["meta"]["version"] and "meta" not in second
+    # Another agent, or a new invocation, gets the meta block again.
+    assert "meta" in encode("get_profile_recommendations", result(), context("root", state=ctx.state))
+    assert "meta" in encode("get_profile_recommendations", result(), context(invocation_id="inv-2", state=ctx.state))
+
+    # A short page is smaller with alpha left in its rows: no meta block then.
+    short = encode("get_profile_recommendations", tools.get_profile_recommendations("Aggressive", "All", 1, 3), context())
+    assert "meta" not in short and "oos_alpha" in short["data"]["cols"]
+
+
+def test_encoded_payloads_never_grow():
+    results = {
+        "get_top_funds": tools.get_top_funds("SH", 10),
+        "search_funds": tools.search_funds("PU, PT", n=15, filters="vol_ret_36m<0.05"),
+        "get_fund_analysis": tools.get_fund_analysis("Sucorinvest Maxi Fund"),
+        "find_similar_funds": tools.find_similar_funds("Sucorinvest Maxi Fund", n=5),
+        "get_profile_recommendations": tools.get_profile_recommendations("Balanced", "All", 1, 10),
+        "get_partner_info": tools.get_partner_info("All"),
+    }
+    for name, result in results.items():
+        assert "error" not in result, name
+        assert _size(encode(name, result, context())) <= _size(result), name
+
+
+def test_errors_pass_through_unchanged():
+    error = {"error": "Fund 'x' not found."}
+    assert encode("get_fund_analysis", error, context()) is error
+
+
+def test_budget_cuts_the_longest_table_and_says_so():
+    rows = [{"mfName": f"Fund {i}", "score": i} for i in range(500)]
+    payload = tabulate({
+        "data": rows,
+        "types": [{"code": c, "n": 1} for c in ("SH", "PU")],
+    })
+    fitted = fit_budget(payload, budget_tokens=200)
+    assert _size(fitted) <= 200 * 4
+    shown = fitted["truncated"]["data"]["shown"]
+    assert fitted["truncated"] == {"data": {"shown": shown, "total": 500}}
+    assert len(fitted["data"]["rows"]) == shown and len(fitted["types"]["rows"]) == 2
+    # One more row would not have fit.
+    assert _size(dict(fitted, data=tabulate(rows[:shown + 1]))) > 200 * 4
+
+
+def test_payloads_within_budget_are_not_truncated():
+    payload = tabulate({"data": [{"mfName": "A", "score": 1}, {"mfName": "B", "score": 2}]})
+    assert "truncated" not in fit_budget(payload, budget_tokens=200)
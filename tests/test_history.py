@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from backend.history import (CATALOG_FILE, HISTORY_DIR, OOS_PANEL_FILE, PANEL_FILE, HistoryView, check_as_of,
+                             record_snapshot)
+
+
+def scored(n, shift=0):
+    return pd.DataFrame({
+        "mfName": [f"Fund {i}" for i in range(n)],
+        "MFType": ["SH"] * n,
+        "score_0_100": np.linspace(90, 10, n) + shift,
+        "rank": (np.arange(n) + shift) % n + 1,
+    })
+
+OOS = pd.DataFrame({"MFType": ["SH", "PU"], "outofsample_oct24-oct25": [0.03, -0.01]})
+
+
+def rows(history_dir, name):
+    return len(pd.read_csv(os.path.join(history_dir, name)))
+
+
+def test_older_as_of_is_refused_before_any_output_is_written(tmp_path):
+    record_snapshot(tmp_path, scored(5), OOS, as_of="2026-10-17")
+    with pytest.raises(ValueError):
+        check_as_of(tmp_path, "2026-10-16")
+    assert check_as_of(tmp_path, "2026-10-17").isoformat() == "2026-10-17"
+
+    report = pipeline.run_pipeline(output_dir=str(tmp_path), workers=1, as_of="2026-10-16", prebuilt=False)
+    assert "append-only" in report["error"]
+    assert sorted(os.listdir(tmp_path)) == [HISTORY_DIR]
+
+
+def test_failed_run_rows_are_cut_from_both_panels(tmp_path):
+    history_dir = tmp_path / HISTORY_DIR
+    record_snapshot(tmp_path, scored(5), OOS, as_of="2026-10-17")
+    # A run that died after appending its panel rows but before its catalog row.
+    for name in (PANEL_FILE, OOS_PANEL_FILE):
+        path = history_dir / name
+        lines = path.read_text().splitlines(keepends=True)
+        path.write_text("".join(lines) + "".join("20261018T000000-dead" + l[l.index(","):] for l in lines[1:]))
+
+    record_snapshot(tmp_path, scored(5, shift=1), OOS, as_of="2026-10-18")
+    catalog = pd.read_csv(history_dir / CATALOG_FILE)
+    assert rows(history_dir, PANEL_FILE) == 10 == catalog["panel_rows"].sum()
+    oos = pd.read_csv(history_dir / OOS_PANEL_FILE)
+    assert oos["snapshot_id"].tolist() == [catalog["snapshot_id"][0]] * 2 + [catalog["snapshot_id"][1]] * 2
+
+
+def test_reloaded_view_only_reads_new_snapshots(tmp_path):
+    history_dir = tmp_path / HISTORY_DIR
+    record_snapshot(tmp_path, scored(5), OOS, as_of="2026-10-17")
+    first = HistoryView(history_dir)
+    record_snapshot(tmp_path, scored(5, shift=1), OOS, as_of="2026-10-18")
+    record_snapshot(tmp_path, scored(6, shift=2), OOS, as_of="2026-10-19")
+
+    grown = HistoryView(history_dir, previous=first)
+    full = HistoryView(history_dir)
+    assert len(grown) == 3
+    pd.testing.assert_frame_equal(grown.panel, full.panel)
+    assert {k: v.tolist() for k, v in grown._by_fund.items()} == {k: v.tolist() for k, v in full._by_fund.items()}
+    assert grown.fund_history("fund 5")["date"].tolist() == ["2026-10-19"]
+    assert grown.fund_history("Fund 0")["rank_change"].tolist()[1:] == [-1.0, -1.0]
+
+
+def test_snapshot_streamed_from_csv_matches_the_frame(tmp_path):
+    frames, streamed = tmp_path / "frames", tmp_path / "streamed"
+    for day, master in [("2026-10-17", scored(7)), ("2026-10-18", scored(7, shift=2))]:
+        path = tmp_path / "clean.csv"
+        master.to_csv(path, index=False)
+        assert (record_snapshot(frames, master, OOS, as_of=day)[-8:]
+                == record_snapshot(streamed, str(path), OOS, as_of=day, chunksize=3)[-8:])
+    expected, got = (pd.read_csv(d / HISTORY_DIR / PANEL_FILE).drop(columns="snapshot_id") for d in (frames, streamed))
+    pd.testing.assert_frame_equal(got, expected)
+    assert got["rank_change"].notna().sum() == 7
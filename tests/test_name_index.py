@@ -0,0 +1,57 @@
+import pytest
+
+from backend.name_index import EXACT, FUZZY, PREFIX, TOKENS, NameIndex, unresolved
+
+NAMES = [
+    "Simas Syariah Unggulan",
+    "Sucorinvest Maxi Fund",
+    "Bahana Likuid Plus",
+    "Bahana Income Stream",
+    "Schroder Dana Prestasi",
+    "Manulife Saham Andalan",
+]
+
+
+@pytest.fixture
+def index():
+    return NameIndex(NAMES)
+
+
+@pytest.mark.parametrize("query, pos, kind", [
+    ("simas syariah unggulan", 0, EXACT),
+    ("Sucorinvest Maxi", 1, PREFIX),
+    ("dana prestasi", 4, TOKENS),
+    ("saham andal", 5, TOKENS),
+    ("sucorinvst maxi fnd", 1, FUZZY),
+])
+def test_lookup_finds_each_kind_of_match(index, query, pos, kind):
+    best = index.lookup(query)[0]
+    assert (best.pos, best.kind) == (pos, kind)
+
+
+def test_lookup_misses_return_nothing(index):
+    assert index.lookup("xqzt") == []
+    assert index.lookup("  ?! ") == []
+
+
+def test_kinds_rank_exact_over_prefix():
+    index = NameIndex(["Bahana Likuid Plus Syariah", "Bahana Likuid Plus"])
+    assert [m.kind for m in index.lookup("bahana likuid plus")] == [EXACT, PREFIX]
+
+
+def test_resolve_reports_ambiguity_and_misses(index):
+    exact, prefix, ambiguous, fuzzy, missing = index.resolve(
+        ["Simas Syariah Unggulan", "Sucorinvest Maxi", "Bahana", "sucorinvst maxi fnd", "[x"])
+    assert (exact.pos, prefix.pos, fuzzy.pos) == (0, 1, 1)
+    assert ambiguous.pos is None
+    assert set(ambiguous.candidates) == {"Bahana Likuid Plus", "Bahana Income Stream"}
+    assert missing == (missing.query, None, ())
+    assert unresolved([exact, ambiguous, missing]) == {
+        "not_found": ["[x"], "ambiguous": {"Bahana": list(ambiguous.candidates)}}
+
+
+def test_common_tokens_score_a_bounded_number_of_rows():
+    names = [f"Dana Kas {'x' * (i % 7)} {i}" for i in range(5000)]
+    best = NameIndex(names).lookup("kas dana", limit=3)
+    # Shortest names score best; ties go to the first row.
+    assert [m.name for m in best] == ["Dana Kas  0", "Dana Kas  7", "Dana Kas  14"]
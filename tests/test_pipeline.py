@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+import pipeline
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_failed_type_fails_the_run_and_drops_its_cached_result(raw_dir, tmp_path, stream):
+    out = str(tmp_path / "out")
+    assert not pipeline.run_pipeline(raw_dir, out, workers=1, stream=stream, prebuilt=False)["failed"]
+    master = os.path.join(out, "funds_master_clean.csv")
+    with open(master, "rb") as f:
+        before = f.read()
+
+    score_file = os.path.join(raw_dir, "fund-scoring-by-type_cv_sh.csv")
+    with open(score_file) as f:
+        good = f.read()
+    with open(score_file, "w") as f:
+        f.write("mfName,MFType\nBroken Fund,SH\n")  # no score_raw column
+    report = pipeline.run_pipeline(raw_dir, out, workers=1, stream=stream, prebuilt=False)
+    assert report["failed"] == ["sh"] and "SH" in report["error"]
+    assert not os.path.exists(pipeline.cache_file_for(os.path.join(out, pipeline.CACHE_DIR), "sh", stream))
+    with open(master, "rb") as f:
+        assert f.read() == before
+
+    with open(score_file, "w") as f:
+        f.write(good)
+    report = pipeline.run_pipeline(raw_dir, out, workers=1, stream=stream, prebuilt=False)
+    assert report["processed"] == ["sh"] and "error" not in report
+    with open(master, "rb") as f:
+        assert f.read() == before
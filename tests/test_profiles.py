@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from backend.profiles import MemoryProfileBackend, ProfileStore, user_id_of
+
+
+def test_cache_keeps_the_most_recently_used_profiles():
+    backend = MemoryProfileBackend()
+    backend.put_many({f"u{i}": {"risk_profile": "Moderate"} for i in range(4)})
+    store = ProfileStore(backend, flush_interval=0, cache_ttl=60, max_users=2)
+    store.get("u0")
+    store.get("u1")
+    store.get("u0")  # u1 is now the least recently used
+    store.get("u2")
+    assert list(store._cache) == ["u0", "u2"]
+    assert store.metrics()["cached_users"] == 2 and store.stats["evictions"] == 1
+
+
+def test_evicted_users_keep_their_unflushed_writes():
+    backend = MemoryProfileBackend()
+    store = ProfileStore(backend, flush_interval=60, cache_ttl=60, max_users=1)
+    store.set("u0", "risk_profile", "Aggressive")
+    store.set("u1", "risk_profile", "Conservative")
+    assert "u0" not in store._cache
+    assert store.get("u0") == {"risk_profile": "Aggressive"}
+    store.flush()
+    assert backend.get("u0") == {"risk_profile": "Aggressive"}
+
+
+def test_user_id_comes_from_the_public_attribute():
+    assert user_id_of(SimpleNamespace(user_id="alice")) == "alice"
+    assert user_id_of(SimpleNamespace(user_id="anonymous")) is None
+    # No public user_id (and no reaching into private ADK state): anonymous.
+    assert user_id_of(SimpleNamespace(_invocation_context=SimpleNamespace(user_id="alice"))) is None
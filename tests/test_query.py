@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.query import parse_filters, parse_sort, query_funds, resolve_fund_type, resolve_fund_types
+
+
+def snapshot(master):
+    snap = SimpleNamespace(master=master)
+    snap.derived = lambda key, build: build(snap)
+    return snap
+
+
+@pytest.fixture
+def snap():
+    return snapshot(pd.DataFrame({
+        "mfName": ["A", "B", "C", "D", "E", "F"],
+        "MFType": ["SH", "sh", "PU", "PT", "SH", "PU"],
+        "score_0_100": [80.0, 90.0, 90.0, np.nan, 80.0, 70.0],
+        "rank": [2, 1, 1, 1, 3, 2],
+        "vol_ret_36m": [0.1, np.nan, 0.01, 0.02, 0.2, 0.03],
+    }))
+
+
+def names(result):
+    return [r["mfName"] for r in result["data"]]
+
+
+@pytest.mark.parametrize("raw, code", [
+    ("Saham", "SH"), ("equity", "SH"), (" pasar uang ", "PU"), ("money", "PU"),
+    ("FIXED", "PT"), ("Reksadana Pendapatan Tetap", "PT"), ("balanced", "CP"), ("crypto", None),
+])
+def test_type_aliases(raw, code):
+    assert resolve_fund_type(raw) == code
+
+
+def test_type_lists_dedupe_and_report_unknowns():
+    assert resolve_fund_types("All") == (["PU", "PT", "CP", "SH"], [])
+    assert resolve_fund_types("saham, SH, , crypto, PU") == (["SH", "PU"], ["crypto"])
+
+
+def test_filter_and_sort_parsing():
+    assert parse_filters("vol_ret_36m<0.05 and age_months >= 60; score_0_100=-1e1") == [
+        ("vol_ret_36m", "<", 0.05), ("age_months", ">=", 60.0), ("score_0_100", "=", -10.0)]
+    assert parse_sort("score_0_100 desc, rank, vol_ret_36m DESCENDING") == [
+        ("score_0_100", True), ("rank", False), ("vol_ret_36m", True)]
+    with pytest.raises(ValueError):
+        parse_filters("vol_ret_36m is low")
+
+
+def test_unknown_columns_raise_key_error(snap):
+    with pytest.raises(KeyError, match="Unknown column 'volatility'"):
+        query_funds(snap, filters="volatility<0.05")
+    with pytest.raises(KeyError):
+        query_funds(snap, sort="volatility")
+
+
+def test_nan_fails_every_filter_and_sorts_last(snap):
+    # B has no volatility: dropped by both a filter and its negation.
+    assert "B" not in names(query_funds(snap, filters="vol_ret_36m<1"))
+    assert "B" not in names(query_funds(snap, filters="vol_ret_36m>=1"))
+    # D has no score: last in both directions.
+    assert names(query_funds(snap, sort="score_0_100 desc"))[-1] == "D"
+    assert names(query_funds(snap, sort="score_0_100"))[-1] == "D"
+    assert query_funds(snap, types=["PT"])["data"][0]["score_0_100"] == 0.0  # NaN is shown as 0
+
+
+@pytest.mark.parametrize("n", [2, 3, 10])
+def test_ties_keep_file_order(snap, n):
+    # B/C tie at 90 and A/E at 80: the earlier row wins, with or without the partial sort.
+    expected = ["B", "C", "A", "E", "F", "D"][:n]
+    assert names(query_funds(snap, n=n)) == expected
+    assert names(query_funds(snap, n=n, sort="score_0_100 desc, rank")) == expected
+
+
+def test_types_and_total(snap):
+    result = query_funds(snap, types=["SH"], n=1, filters="vol_ret_36m<0.15")
+    assert result["total"] == 1 and names(result) == ["A"]
+    assert query_funds(snap, types=["SH"], n=0) == {"total": 3, "data": []}
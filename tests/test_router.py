@@ -0,0 +1,56 @@
+import pytest
+
+from backend import router
+from backend.router import Intent, detect_intent
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("top saham", Intent("top_funds", {"fund_type": "SH", "n": 5})),
+    ("Top 10 pasar uang", Intent("top_funds", {"fund_type": "PU", "n": 10})),
+    ("best balanced funds", Intent("top_funds", {"fund_type": "CP", "n": 5})),
+    ("Top 100 saham", Intent("top_funds", {"fund_type": "SH", "n": 20})),
+    ("top 0 saham", Intent("top_funds", {"fund_type": "SH", "n": 1})),
+    ("tolong top 3 reksadana saham dong", Intent("top_funds", {"fund_type": "SH", "n": 3})),
+    ("compare Simas Syariah Unggulan vs Sucorinvest Maxi Fund",
+     Intent("head_to_head", {"fund_names": "Simas Syariah Unggulan, Sucorinvest Maxi Fund"})),
+    ("promo Bibit", Intent("partner", {"partner_name": "bibit"})),
+    ("performance comparison", Intent("performance_comparison", {})),
+    ("top 10% vs rest", Intent("performance_comparison", {})),
+    ("top 10% saham vs rest", Intent("performance_comparison", {})),
+])
+def test_structured_requests_take_the_fast_path(text, expected):
+    assert detect_intent(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    # Several categories: no single-type template fits.
+    "I want top saham and pasar uang",
+    "top 5 saham dan campuran",
+    # Definitions and other free-form questions.
+    "What is alpha?",
+    "why is Principal Bond good?",
+    # 'balanced' as a risk profile, not the Campuran category.
+    "best funds for my balanced profile",
+    "I am Conservative, top pasar uang",
+    # Percentages are thresholds, not counts.
+    "top 5 saham under 5% volatility",
+    # Filters and similarity asks the top-N template would silently drop.
+    "top saham with volatility below 0.05",
+    "top saham yang tidak crowded",
+    "top saham similar to Principal",
+    "top 5 saham 2024",
+    "promo Bibit for saham funds",
+    # Head-to-head needs exact fund names, not fund houses or prefixes.
+    "Mandiri vs BNI",
+    "compare Simas Syariah vs Sucorinvest Maxi Fund",
+    "compare Simas Syariah Unggulan vs Sucorinvest Maxi Fund on fees",
+])
+def test_ambiguous_requests_go_to_the_llm(text):
+    assert detect_intent(text) is None
+
+
+def test_performance_lines_sign_negative_alpha(monkeypatch):
+    chart = {"data": {"SH": 0.034, "PU": -0.012}}
+    monkeypatch.setattr(router, "get_visualization_data", lambda *args, **kwargs: chart)
+    lines = router._performance_lines("en")
+    assert lines[1:] == ["- Saham: +3.4%", "- Pasar Uang: -1.2%"]
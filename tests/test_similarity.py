@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.similarity import VECTOR_PREFIX, SimilarityIndex
+
+
+def index(vol, crowding):
+    n = len(vol)
+    master = pd.DataFrame({"mfName": [f"Fund {i}" for i in range(n)], "MFType": ["SH"] * n,
+                           "vol_ret_36m": vol, "crowding_score": crowding})
+    vectors = pd.DataFrame({"mfName": master["mfName"], f"{VECTOR_PREFIX}x": np.arange(n, dtype=float)})
+    return SimilarityIndex(vectors, master)
+
+
+def test_safer_keeps_only_lower_volatility():
+    rows, _ = index([0.2, 0.1, 0.3, np.nan], [0.0] * 4).query(0, n=5, safer=True)
+    assert rows.tolist() == [1]
+
+
+def test_safer_refuses_a_fund_with_unknown_volatility():
+    similar = index([np.nan, 0.1, 0.3], [0.0] * 3)
+    with pytest.raises(ValueError):
+        similar.query(0, safer=True)
+    assert similar.query(0, n=5)[0].tolist() == [1, 2]
+
+
+def test_unknown_crowding_counts_as_not_crowded():
+    rows, _ = index([0.2, 0.1, 0.1], [np.nan, 0.5, -0.5]).query(0, n=5, safer=True)
+    assert rows.tolist() == [2]
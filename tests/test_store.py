@@ -0,0 +1,72 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import pipeline
+from backend.name_index import get_name_index
+from backend.store import MASTER_FILE, FundStore
+
+
+@pytest.fixture
+def data_dir(raw_dir, tmp_path):
+    out = str(tmp_path / "data")
+    pipeline.run_pipeline(raw_dir, out, workers=1, prebuilt=False)
+    return out
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "store did not reload"
+        time.sleep(0.01)
+
+
+def touch(path, ago=0.0):
+    stamp = time.time() - ago
+    os.utime(path, (stamp, stamp))
+
+
+def test_touched_but_unchanged_files_keep_the_data(data_dir):
+    store = FundStore(data_dir, check_interval=0, settle=0)
+    old = store.get()
+    touch(os.path.join(data_dir, MASTER_FILE), ago=5)
+    assert store.get() is old  # The reload runs in the background.
+    wait_for(lambda: store.peek() is not old)
+    new = store.peek()
+    assert new.version == old.version and new.master is old.master
+    assert new.signature != old.signature and store.reloads == 0
+
+
+def test_changed_data_is_swapped_in_and_old_snapshots_stay_valid(data_dir):
+    store = FundStore(data_dir, check_interval=0, settle=0)
+    old = store.get()
+    first = old.master["mfName"].iloc[0]
+    index = get_name_index(old)
+
+    path = os.path.join(data_dir, MASTER_FILE)
+    master = pd.read_csv(path)
+    master.loc[0, "mfName"] = "Renamed Fund"
+    master.to_csv(path, index=False)
+    touch(path, ago=5)
+
+    assert store.get() is old
+    wait_for(lambda: store.reloads == 1)
+    new = store.get()
+    assert new.version != old.version and new.master["mfName"].iloc[0] == "Renamed Fund"
+    # Indexes were built before the swap.
+    assert "name_index" in new._derived
+    # A reader still holding the old snapshot sees the old data and indexes.
+    assert old.master["mfName"].iloc[0] == first
+    assert index is get_name_index(old) and index.lookup(first)[0].pos == 0
+    assert get_name_index(new).lookup("Renamed Fund")[0].pos == 0
+
+
+def test_files_still_being_written_are_left_alone(data_dir):
+    store = FundStore(data_dir, check_interval=0, settle=60)
+    old = store.get()
+    touch(os.path.join(data_dir, MASTER_FILE))
+    store.get()
+    time.sleep(0.1)
+    assert store.peek() is old and not store._reload_lock.locked()
@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+
+import pipeline
+from backend.analysis import ANALYSIS_FILE
+from backend.history import HISTORY_DIR, PANEL_FILE
+from backend.recommendations import PROFILE_VIEWS_FILE
+from backend.similarity import VECTORS_FILE
+from benchmarks import synthetic
+from stream_ingest import FeatureIndex
+
+OUTPUTS = ["funds_master.csv", "funds_master_clean.csv"] + [f"funds_{t}.csv" for t in synthetic.TYPES]
+
+
+def test_stream_mode_matches_in_memory_mode(raw_dir, tmp_path):
+    memory, stream = str(tmp_path / "memory"), str(tmp_path / "stream")
+    pipeline.run_pipeline(raw_dir, memory, workers=1, prebuilt=False)
+    pipeline.run_pipeline(raw_dir, stream, workers=1, stream=True, chunksize=64, prebuilt=False)
+    for name in OUTPUTS:
+        with open(os.path.join(memory, name), "rb") as a, open(os.path.join(stream, name), "rb") as b:
+            assert a.read() == b.read(), name
+
+
+def test_duplicate_feature_rows_keep_the_first(raw_dir, tmp_path):
+    out = str(tmp_path / "out")
+    pipeline.run_pipeline(raw_dir, out, workers=1, stream=True, chunksize=64, prebuilt=False)
+    master = pd.read_csv(os.path.join(out, "funds_master_clean.csv"))
+    assert not master.duplicated(["mfName", "MFType"]).any()
+    assert (master["ret_3m"] != 9.0).all()
+
+
+def test_stream_mode_derived_outputs_match_in_memory_mode(raw_dir, tmp_path):
+    memory, stream = str(tmp_path / "memory"), str(tmp_path / "stream")
+    pipeline.run_pipeline(raw_dir, memory, workers=1, prebuilt=False, as_of="2026-10-17")
+    pipeline.run_pipeline(raw_dir, stream, workers=1, stream=True, chunksize=64, prebuilt=False, as_of="2026-10-17")
+    for name in [ANALYSIS_FILE, VECTORS_FILE, PROFILE_VIEWS_FILE, os.path.join(HISTORY_DIR, PANEL_FILE)]:
+        # The snapshot ids differ only in their timestamp.
+        expected, got = (pd.read_csv(os.path.join(d, name)).drop(columns="snapshot_id", errors="ignore")
+                         for d in (memory, stream))
+        pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-9, obj=name)
+
+
+def test_feature_rows_with_quoted_newlines(tmp_path):
+    path = tmp_path / "features.csv"
+    path.write_text('mfName,MFType,note,ret_3m\n'
+                    'Fund A,SH,"two\nlines",1.5\n'
+                    'Fund B,SH,plain,2.5\n'
+                    'Fund A,SH,"dupe\n\nrow",9.0\n')
+    index = FeatureIndex(str(path), ["mfName", "MFType"], chunksize=2)
+    assert len(index.offsets) == 2 and index.duplicates == 1
+    keys = index.keys(pd.DataFrame({"mfName": ["Fund B", "Fund A"], "MFType": ["SH", "SH"]}))
+    rows = index.gather(keys, index.dtypes)
+    assert rows["note"].tolist() == ["plain", "two\nlines"]
+    assert rows["ret_3m"].tolist() == [2.5, 1.5]